@@ -0,0 +1,91 @@
+"""Titan Control core: the data and domain layer, usable without Streamlit.
+
+Submodules are imported lazily on first attribute access, so ``import titan``
+stays cheap for worker processes, CLI jobs and benchmarks.
+"""
+import importlib
+
+_EXPORTS = {
+    "get_db": "titan.db",
+    "init_db": "titan.db",
+    "get_table_versions": "titan.db",
+    "hash_password": "titan.users",
+    "verify_user": "titan.users",
+    "create_user": "titan.users",
+    "get_user": "titan.users",
+    "get_all_users": "titan.users",
+    "delete_user": "titan.users",
+    "log_work_event": "titan.timeclock",
+    "log_work_events": "titan.timeclock",
+    "get_last_work_event": "titan.timeclock",
+    "get_live_workers": "titan.timeclock",
+    "get_work_logs": "titan.timeclock",
+    "get_companies": "titan.inventory",
+    "add_company": "titan.inventory",
+    "get_inventory": "titan.inventory",
+    "add_inventory": "titan.inventory",
+    "get_inventory_page": "titan.inventory",
+    "upsert_inventory": "titan.inventory",
+    "get_sops": "titan.inventory",
+    "add_sop": "titan.inventory",
+    "add_comment": "titan.comments",
+    "get_comments": "titan.comments",
+    "get_comments_page": "titan.comments",
+    "get_unread_counts": "titan.comments",
+    "mark_read": "titan.comments",
+    "create_gcal_link": "titan.gcal",
+    "get_tasks": "titan.tasks",
+    "get_tasks_page": "titan.tasks",
+    "get_user_tasks": "titan.tasks",
+    "get_running_task_for_user": "titan.tasks",
+    "get_task_by_id": "titan.tasks",
+    "is_task_overdue": "titan.tasks",
+    "add_task": "titan.tasks",
+    "add_tasks": "titan.tasks",
+    "update_task": "titan.tasks",
+    "bulk_update_tasks": "titan.tasks",
+    "rate_task": "titan.tasks",
+    "handle_task_timer": "titan.tasks",
+    "pause_all_running_tasks_for_user": "titan.tasks",
+    "get_load_forecast": "titan.planning",
+    "recommend_assignee": "titan.planning",
+    "build_pick_list": "titan.picking",
+    "get_rollup": "titan.projects",
+    "get_subtasks": "titan.projects",
+    "get_projects": "titan.projects",
+    "set_parent": "titan.projects",
+    "get_shipments": "titan.shipments",
+    "add_shipment": "titan.shipments",
+    "add_shipments": "titan.shipments",
+    "get_shipments_page": "titan.shipments",
+    "get_shipment_by_id": "titan.shipments",
+    "update_shipment_details": "titan.shipments",
+    "run_maintenance_sweep": "titan.scheduler",
+    "run_archive": "titan.archive",
+    "add_template": "titan.recurring",
+    "get_templates": "titan.recurring",
+    "run_materializer": "titan.recurring",
+    "snapshot": "titan.backup",
+    "restore": "titan.backup",
+    "start_background_scheduler": "titan.scheduler",
+    "ask_gemini": "titan.ai",
+    "start_writer": "titan.writer",
+    "start_replica": "titan.replica",
+    "start_dispatcher": "titan.notify",
+    "get_report_db": "titan.replica",
+    "stop_writer": "titan.writer",
+    "WriterBusy": "titan.writer",
+}
+
+__all__ = sorted(_EXPORTS)
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module 'titan' has no attribute {name!r}")
+    value = getattr(importlib.import_module(module), name)
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
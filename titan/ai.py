@@ -0,0 +1,27 @@
+"""Gemini assistant, imported lazily so the SDK is only loaded when used."""
+import time
+
+from titan import config
+from titan import metrics
+
+def ai_available():
+    try:
+        import google.generativeai  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+def ask_gemini(prompt, context="", api_key=None):
+    if not ai_available(): return "Library not installed."
+    if not api_key: return "Enter API Key."
+    t0 = time.perf_counter()
+    try:
+        import google.generativeai as genai
+        genai.configure(api_key=api_key)
+        model = genai.GenerativeModel(config.GEMINI_MODEL)
+        text = model.generate_content(f"Titan AI Context: {context}. User: {prompt}").text
+        metrics.GEMINI_SECONDS.observe(time.perf_counter() - t0, outcome="ok")
+        return text
+    except Exception as e:
+        metrics.GEMINI_SECONDS.observe(time.perf_counter() - t0, outcome="error")
+        return f"Error: {e}"
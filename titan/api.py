@@ -0,0 +1,379 @@
+"""JSON HTTP API (ASGI) over tasks, timers, the time clock, shipments and inventory.
+
+Serve with any ASGI server, e.g. ``uvicorn titan.api:app``, or ``python -m titan.api``.
+Handlers are plain synchronous functions run on a worker thread against pooled
+connections, so the event loop never blocks on SQLite; writes go through the
+single writer thread (titan.writer). GET responses carry a weak
+ETag derived from the table_versions counters of the tables they read; a matching
+If-None-Match is answered with 304 without running the query.
+"""
+import asyncio
+import hashlib
+import hmac
+import json
+import re
+import sqlite3
+from urllib.parse import parse_qs
+
+from titan import config
+from titan import metrics
+from titan.audit import get_task_history
+from titan.comments import get_comments_page
+from titan.db import get_table_versions, init_db
+from titan.inventory import get_inventory_page, upsert_inventory
+from titan.picking import ROUTES as PICK_ROUTES, build_pick_list
+from titan.projects import get_rollup, get_subtasks, set_parent
+from titan.shipments import add_shipment, add_shipments, get_shipment_by_id, get_shipments_page, update_shipment_details
+from titan.tasks import (add_task, add_tasks, get_running_task_for_user, get_task_by_id, get_tasks_page,
+                         handle_task_timer, pause_all_running_tasks_for_user, update_task)
+from titan.timeclock import get_live_workers, log_work_event, log_work_events
+from titan.users import get_user
+from titan.writer import WriterBusy, start_writer
+
+MAX_BODY_BYTES = 5 * 1024 * 1024
+CLOCK_EVENTS = {"in": "CLOCK_IN", "out": "CLOCK_OUT"}
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+class Request:
+    def __init__(self, method, path, query, headers, body, params):
+        self.method = method
+        self.path = path
+        self.query = query
+        self.headers = headers
+        self.body = body
+        self.params = params
+
+    def arg(self, name, default=None, cast=str):
+        values = self.query.get(name)
+        if not values:
+            return default
+        try:
+            return cast(values[0])
+        except ValueError:
+            raise HTTPError(400, f"Invalid value for '{name}'.")
+
+    def json(self):
+        if not self.body:
+            raise HTTPError(400, "Request body must be JSON.")
+        try:
+            data = json.loads(self.body)
+        except ValueError:
+            raise HTTPError(400, "Request body must be valid JSON.")
+        if not isinstance(data, dict):
+            raise HTTPError(400, "Request body must be a JSON object.")
+        return data
+
+def require(data, *fields):
+    missing = [f for f in fields if data.get(f) in (None, "")]
+    if missing:
+        raise HTTPError(400, f"Missing field(s): {', '.join(missing)}.")
+
+def require_assignee(username):
+    """tasks.assignee is a users.username; reject anything else (such as a display name)."""
+    if get_user(username) is None:
+        raise HTTPError(400, f"Unknown assignee '{username}'.")
+
+def page_limit(req):
+    return max(1, min(req.arg("limit", 50, int), config.API_MAX_PAGE_SIZE))
+
+# --- ROUTING ---
+ROUTES = []
+
+def route(method, pattern, tables=()):
+    """Registers a handler; `tables` lists what a GET reads, for its ETag."""
+    def decorator(fn):
+        ROUTES.append((method, re.compile(f"^{pattern}$"), fn, tuple(tables)))
+        return fn
+    return decorator
+
+def resolve(method, path):
+    allowed = False
+    for r_method, regex, fn, tables in ROUTES:
+        m = regex.match(path)
+        if m:
+            if r_method == method:
+                return fn, m.groupdict(), tables
+            allowed = True
+    raise HTTPError(405 if allowed else 404, "Method not allowed." if allowed else "Not found.")
+
+# --- TASKS & TIMERS ---
+@route("GET", "/health")
+def health(req):
+    return {"status": "ok"}
+
+@route("GET", "/tasks", tables=["tasks"])
+def list_tasks(req):
+    limit = page_limit(req)
+    rows = get_tasks_page(limit, before_id=req.arg("before_id", None, int), status=req.arg("status"),
+                          assignee=req.arg("assignee"), company=req.arg("company"))
+    return {"items": rows, "next_before_id": rows[-1]["id"] if len(rows) == limit else None}
+
+@route("POST", "/tasks")
+def create_task(req):
+    data = req.json()
+    require(data, "title")
+    if data.get("assignee"):
+        require_assignee(data["assignee"])
+    parent_id = data.get("parent_id")
+    if parent_id is not None:
+        try:
+            parent_id = int(parent_id)
+        except (TypeError, ValueError):
+            raise HTTPError(400, "parent_id must be an integer.")
+        if not get_task_by_id(parent_id):
+            raise HTTPError(400, f"Unknown parent task {parent_id}.")
+    assignee = add_task(data["title"], data.get("assignee"), data.get("company"), data.get("category"), data.get("planned_date") or "",
+                        parent_id=parent_id)
+    return 201, {"created": 1, "assignee": assignee}
+
+@route("POST", "/tasks/bulk")
+def create_tasks(req):
+    rows = req.json().get("tasks") or []
+    for r in rows:
+        require(r, "title", "assignee")
+        require_assignee(r["assignee"])
+    return 201, {"created": add_tasks(rows)}
+
+@route("GET", r"/tasks/(?P<task_id>\d+)", tables=["tasks"])
+def read_task(req):
+    task = get_task_by_id(int(req.params["task_id"]))
+    if not task:
+        raise HTTPError(404, "Task not found.")
+    return task
+
+@route("PATCH", r"/tasks/(?P<task_id>\d+)")
+def patch_task(req):
+    task = get_task_by_id(int(req.params["task_id"]))
+    if not task:
+        raise HTTPError(404, "Task not found.")
+    data = req.json()
+    if "assignee" in data:
+        require_assignee(data["assignee"])
+    merged = {k: data.get(k, task[k]) for k in ("status", "assignee", "act_time", "planned_date")}
+    update_task(task["id"], merged["status"], merged["assignee"], merged["act_time"], merged["planned_date"], actor="api")
+    return get_task_by_id(task["id"])
+
+@route("GET", r"/tasks/(?P<task_id>\d+)/history", tables=["tasks"])
+def task_history(req):
+    limit = page_limit(req)
+    rows = get_task_history(int(req.params["task_id"]), limit, before_id=req.arg("before_id", None, int))
+    return {"items": rows, "next_before_id": rows[-1]["id"] if len(rows) == limit else None}
+
+@route("GET", r"/tasks/(?P<task_id>\d+)/comments", tables=["task_comments"])
+def task_comments(req):
+    limit = page_limit(req)
+    rows = get_comments_page(int(req.params["task_id"]), limit, before_id=req.arg("before_id", None, int))
+    return {"items": rows, "next_before_id": rows[-1]["id"] if len(rows) == limit else None}
+
+@route("GET", r"/tasks/(?P<task_id>\d+)/subtasks", tables=["tasks"])
+def task_subtasks(req):
+    rollup = get_rollup(int(req.params["task_id"]))
+    if not rollup:
+        raise HTTPError(404, "Task not found.")
+    return {"rollup": rollup, "items": get_subtasks(rollup["task_id"])}
+
+@route("PUT", r"/tasks/(?P<task_id>\d+)/parent")
+def move_task(req):
+    try:
+        set_parent(int(req.params["task_id"]), req.json().get("parent_id"), actor="api")
+    except ValueError as e:
+        raise HTTPError(400, str(e))
+    return get_rollup(int(req.params["task_id"]))
+
+@route("POST", r"/tasks/(?P<task_id>\d+)/timer")
+def task_timer(req):
+    data = req.json()
+    require(data, "action", "username")
+    if data["action"] not in ("start", "pause", "stop"):
+        raise HTTPError(400, "action must be start, pause or stop.")
+    user = get_user(data["username"])
+    if not user:
+        raise HTTPError(404, f"Unknown user '{data['username']}'.")
+    messages = handle_task_timer(int(req.params["task_id"]), data["action"], user["username"])
+    return {"messages": messages}
+
+@route("GET", "/timers/running", tables=["tasks"])
+def running_timer(req):
+    username = req.arg("username")
+    if not username:
+        raise HTTPError(400, "Missing 'username'.")
+    return {"task": get_running_task_for_user(username)}
+
+# --- TIME CLOCK ---
+def clock_event(username, event):
+    if event not in CLOCK_EVENTS:
+        raise HTTPError(400, "event must be 'in' or 'out'.")
+    user = get_user(username)
+    if not user:
+        raise HTTPError(404, f"Unknown user '{username}'.")
+    if event == "out":
+        pause_all_running_tasks_for_user(user["username"])
+    return user, CLOCK_EVENTS[event]
+
+@route("POST", "/clock")
+def clock(req):
+    data = req.json()
+    require(data, "username", "event")
+    user, event_type = clock_event(data["username"], data["event"])
+    log_work_event(user["username"], event_type)
+    return 201, {"username": user["username"], "event": event_type}
+
+@route("POST", "/clock/bulk")
+def clock_bulk(req):
+    events = []
+    for e in req.json().get("events") or []:
+        require(e, "username", "event")
+        user, event_type = clock_event(e["username"], e["event"])
+        events.append((user["username"], event_type))
+    return 201, {"logged": log_work_events(events)}
+
+@route("GET", "/clock/live", tables=["work_logs", "users"])
+def live_workers(req):
+    return {"items": get_live_workers()}
+
+# --- SHIPMENTS ---
+@route("GET", "/shipments", tables=["shipments"])
+def list_shipments(req):
+    limit, offset = page_limit(req), max(0, req.arg("offset", 0, int))
+    rows = get_shipments_page(limit, offset, status=req.arg("status"))
+    return {"items": rows, "next_offset": offset + limit if len(rows) == limit else None}
+
+@route("POST", "/shipments")
+def create_shipment(req):
+    data = req.json()
+    require(data, "id", "date", "dest")
+    add_shipment(data["id"], data["date"], data.get("am"), data["dest"], data.get("skus"), data.get("qty", 0))
+    return 201, get_shipment_by_id(data["id"])
+
+@route("POST", "/shipments/bulk")
+def create_shipments(req):
+    rows = req.json().get("shipments") or []
+    for r in rows:
+        require(r, "id", "date", "dest")
+    return 201, {"created": add_shipments(rows)}
+
+@route("GET", r"/shipments/(?P<s_id>[^/]+)", tables=["shipments"])
+def read_shipment(req):
+    shipment = get_shipment_by_id(req.params["s_id"])
+    if not shipment:
+        raise HTTPError(404, "Shipment not found.")
+    return shipment
+
+@route("PATCH", r"/shipments/(?P<s_id>[^/]+)")
+def patch_shipment(req):
+    shipment = get_shipment_by_id(req.params["s_id"])
+    if not shipment:
+        raise HTTPError(404, "Shipment not found.")
+    data = req.json()
+    merged = {k: data.get(k, shipment[k]) for k in ("dest", "skus", "qty", "status")}
+    update_shipment_details(shipment["id"], merged["dest"], merged["skus"], merged["qty"], merged["status"])
+    return get_shipment_by_id(shipment["id"])
+
+# --- INVENTORY ---
+@route("POST", "/picklists")
+def create_pick_list(req):
+    data = req.json()
+    require(data, "shipment_ids")
+    if data.get("route") not in (None, *PICK_ROUTES):
+        raise HTTPError(400, f"route must be one of {', '.join(PICK_ROUTES)}.")
+    return build_pick_list(data["shipment_ids"], data.get("route"))
+
+@route("GET", "/inventory", tables=["inventory"])
+def list_inventory(req):
+    limit, offset = page_limit(req), max(0, req.arg("offset", 0, int))
+    rows = get_inventory_page(limit, offset)
+    return {"items": rows, "next_offset": offset + limit if len(rows) == limit else None}
+
+@route("POST", "/inventory/bulk")
+def upsert_inventory_items(req):
+    rows = req.json().get("items") or []
+    for r in rows:
+        require(r, "sku")
+    return {"upserted": upsert_inventory(rows)}
+
+# --- ASGI PLUMBING ---
+def make_etag(path, query_string, tables):
+    versions = get_table_versions(tables)
+    digest = hashlib.sha1(f"{path}?{query_string}|{sorted(versions.items())}".encode()).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+def dispatch(req, query_string):
+    """Runs on a worker thread. Returns (status, payload, etag)."""
+    fn, params, tables = resolve(req.method, req.path)
+    req.params = params
+    etag = None
+    if req.method == "GET" and tables:
+        etag = make_etag(req.path, query_string, tables)
+        if req.headers.get("if-none-match") == etag:
+            return 304, None, etag
+    try:
+        result = fn(req)
+    except sqlite3.IntegrityError as e:
+        raise HTTPError(409, f"Conflict: {e}")
+    except WriterBusy as e:
+        raise HTTPError(503, f"Busy, retry shortly: {e}")
+    status, payload = result if isinstance(result, tuple) else (200, result)
+    return status, payload, etag
+
+async def read_body(receive):
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if len(body) > MAX_BODY_BYTES:
+            raise HTTPError(413, "Request body too large.")
+        if not message.get("more_body"):
+            return body
+
+async def send_response(send, status, payload=None, etag=None):
+    body = b"" if payload is None else json.dumps(payload, default=str).encode()
+    headers = [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+    if etag:
+        headers.append((b"etag", etag.encode()))
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+def authorized(headers):
+    if not config.API_TOKEN:
+        return True
+    return hmac.compare_digest(headers.get("authorization", ""), f"Bearer {config.API_TOKEN}")
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await asyncio.to_thread(init_db)
+            start_writer()
+            metrics.start_exporters()
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        return await lifespan(receive, send)
+    if scope["type"] != "http":
+        return
+    headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope.get("headers", [])}
+    query_string = scope.get("query_string", b"").decode()
+    try:
+        if not authorized(headers):
+            raise HTTPError(401, "Missing or invalid bearer token.")
+        body = await read_body(receive)
+        req = Request(scope["method"], scope["path"].rstrip("/") or "/", parse_qs(query_string), headers, body, {})
+        status, payload, etag = await asyncio.to_thread(dispatch, req, query_string)
+    except HTTPError as e:
+        return await send_response(send, e.status, {"error": e.message})
+    except Exception as e:
+        return await send_response(send, 500, {"error": f"Internal error: {e}"})
+    await send_response(send, status, payload, etag)
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run("titan.api:app", host=config.API_HOST, port=config.API_PORT)
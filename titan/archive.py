@@ -0,0 +1,142 @@
+"""Hot/cold tiering: moves finished tasks (with their comments) and old work logs
+into an attached archive database.
+
+Every connection attaches the archive as schema ``archive`` (see db.connect).
+Moves run as small write ops of config.ARCHIVE_BATCH_SIZE rows, so other writes
+interleave with a long catch-up. Each archived table has
+a watermark in archive.archive_state: no row on or after it was ever moved.
+Reads that pass a date range (ranged_select) only touch the archive when the
+range reaches back past that watermark. On PostgreSQL nothing is archived
+(partition the tables there instead) and reads never leave the live tables.
+"""
+import datetime
+import json
+import sqlite3
+
+from titan import config
+from titan.db import is_postgres
+from titan.writer import write_op
+
+# table -> (date column used for reads, archive indexes)
+ARCHIVED_TABLES = {
+    "tasks": ("planned_date", ["done_at"]),
+    "task_comments": ("timestamp", ["task_id"]),
+    "work_logs": ("timestamp", ["username, id"]),
+}
+
+def _columns(conn, schema, table):
+    return [r[1] for r in conn.execute(f"PRAGMA {schema}.table_info({table})").fetchall()]
+
+def _ensure_table(conn, table):
+    """Creates archive.<table> from the live table's DDL, adding columns the live table gained since."""
+    existing = _columns(conn, "archive", table)
+    if not existing:
+        ddl = conn.execute("SELECT sql FROM main.sqlite_master WHERE type='table' AND name=?", (table,)).fetchone()[0]
+        conn.execute(ddl.replace(f"CREATE TABLE {table}", f"CREATE TABLE IF NOT EXISTS archive.{table}", 1))
+        for cols in ARCHIVED_TABLES[table][1]:
+            name = cols.replace(", ", "_")
+            conn.execute(f"CREATE INDEX IF NOT EXISTS archive.idx_{table}_{name} ON {table} ({cols})")
+        return _columns(conn, "archive", table)
+    for col in _columns(conn, "main", table):
+        if col not in existing:
+            conn.execute(f"ALTER TABLE archive.{table} ADD COLUMN {col}")
+            existing.append(col)
+    return existing
+
+def _ensure_schema(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS archive.archive_state (
+                        table_name TEXT PRIMARY KEY,
+                        archived_before TEXT
+                    )''')
+    return {table: _ensure_table(conn, table) for table in ARCHIVED_TABLES}
+
+def _raise_watermark(conn, table, cutoff):
+    conn.execute("""INSERT INTO archive.archive_state (table_name, archived_before) VALUES (?, ?)
+                    ON CONFLICT(table_name) DO UPDATE SET archived_before = MAX(archived_before, excluded.archived_before)""",
+                 (table, cutoff))
+
+def _copy(conn, table, columns, where, params):
+    cols = ", ".join(columns)
+    # INSERT OR REPLACE: a batch interrupted between the two files is safe to redo
+    conn.execute(f"INSERT OR REPLACE INTO archive.{table} ({cols}) SELECT {cols} FROM main.{table} WHERE {where}", params)
+    conn.execute(f"DELETE FROM main.{table} WHERE {where}", params)
+
+@write_op
+def archive_tasks_batch(conn, cutoff, limit):
+    """Moves up to `limit` tasks done (and planned) before `cutoff`, with their comments. Returns tasks moved."""
+    columns = _ensure_schema(conn)
+    ids = [r[0] for r in conn.execute("""SELECT id FROM main.tasks
+                                         WHERE status = 'Done' AND COALESCE(done_at, planned_date) < ? AND planned_date < ?
+                                         ORDER BY id LIMIT ?""", (cutoff, cutoff, limit)).fetchall()]
+    if ids:
+        batch = (json.dumps(ids),)
+        _copy(conn, "task_comments", columns["task_comments"], "task_id IN (SELECT value FROM json_each(?))", batch)
+        _copy(conn, "tasks", columns["tasks"], "id IN (SELECT value FROM json_each(?))", batch)
+        _raise_watermark(conn, "tasks", cutoff)
+    return len(ids)
+
+@write_op
+def archive_work_logs_batch(conn, cutoff, limit):
+    """Moves up to `limit` work_logs stamped before `cutoff`. Returns rows moved."""
+    columns = _ensure_schema(conn)
+    ids = [r[0] for r in conn.execute("SELECT id FROM main.work_logs WHERE timestamp < ? ORDER BY id LIMIT ?",
+                                      (cutoff, limit)).fetchall()]
+    if ids:
+        _copy(conn, "work_logs", columns["work_logs"], "id IN (SELECT value FROM json_each(?))", (json.dumps(ids),))
+        _raise_watermark(conn, "work_logs", cutoff)
+    return len(ids)
+
+def _drain(batch_op, cutoff, batch_size):
+    moved, total = batch_size, 0
+    while moved == batch_size:
+        moved = batch_op(cutoff, batch_size)
+        total += moved
+    return total
+
+def run_archive(task_days=None, log_days=None, batch_size=None):
+    """Archives everything past the retention windows, one batch per transaction."""
+    if is_postgres():
+        return {'tasks_archived': 0, 'work_logs_archived': 0}
+    task_days = config.ARCHIVE_TASKS_AFTER_DAYS if task_days is None else task_days
+    log_days = config.ARCHIVE_WORK_LOGS_AFTER_DAYS if log_days is None else log_days
+    batch_size = batch_size or config.ARCHIVE_BATCH_SIZE
+    today = datetime.date.today()
+    return {
+        'tasks_archived': _drain(archive_tasks_batch, str(today - datetime.timedelta(days=task_days)), batch_size),
+        'work_logs_archived': _drain(archive_work_logs_batch, str(today - datetime.timedelta(days=log_days)), batch_size),
+    }
+
+def archived_before(conn, table):
+    """The table's watermark, or None if nothing has been archived from it."""
+    if is_postgres():
+        return None
+    try:
+        row = conn.execute("SELECT archived_before FROM archive.archive_state WHERE table_name=?", (table,)).fetchone()
+    except sqlite3.OperationalError:
+        return None
+    return row[0] if row else None
+
+def ranged_select(conn, table, since=None, until=None):
+    """SELECT * over `table` limited to since <= date < the day after until.
+
+    Archived rows are included only when a range is given and reaches back past
+    the table's watermark. Returns (sql, params); append ORDER BY as needed.
+    """
+    column = ARCHIVED_TABLES[table][0]
+    clauses, params = [], []
+    if since is not None:
+        clauses.append(f"{column} >= ?"); params.append(str(since))
+    if until is not None:
+        next_day = datetime.date.fromisoformat(str(until)[:10]) + datetime.timedelta(days=1)
+        clauses.append(f"{column} < ?"); params.append(str(next_day))
+    where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+    sql = f"SELECT * FROM main.{table}{where}"
+    if clauses:
+        watermark = archived_before(conn, table)
+        if watermark is not None and (since is None or str(since) < watermark):
+            columns = _columns(conn, "main", table)
+            archived = set(_columns(conn, "archive", table))
+            cold = ", ".join(c if c in archived else f"NULL AS {c}" for c in columns)
+            sql = f"SELECT {', '.join(columns)} FROM main.{table}{where} UNION ALL SELECT {cold} FROM archive.{table}{where}"
+            params = params * 2
+    return sql, params
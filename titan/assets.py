@@ -0,0 +1,66 @@
+"""The UI theme as a static, versioned asset.
+
+    python -m titan.assets report
+
+The whole theme lives in static/titan.css. Streamlit serves the static/
+directory at config.STATIC_URL when server.enableStaticServing is on (see
+.streamlit/config.toml). Each rerun then emits only theme_tag(), a one-line
+@import of the stylesheet. The import's ?v= query is a hash of the file's
+contents, so browsers keep their cached copy until the theme actually changes.
+The Outfit variable font (Latin subset, SIL OFL 1.1) ships in static/fonts/
+and is served from the same origin, so no external font host is ever
+contacted. The stylesheet falls back to the system UI font while it loads.
+"""
+import argparse
+import functools
+import hashlib
+import os
+
+from titan import config
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "static")
+THEME_FILE = os.path.join(STATIC_DIR, "titan.css")
+FONT_FILE = os.path.join(STATIC_DIR, "fonts", "outfit-latin-wght-normal.woff2")
+
+@functools.lru_cache(maxsize=None)
+def theme_version():
+    """Short content hash of the stylesheet, read once per process."""
+    with open(THEME_FILE, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()[:12]
+
+def theme_url():
+    return f"{config.STATIC_URL}/titan.css?v={theme_version()}"
+
+def theme_tag():
+    """What each rerun sends for the theme: a style tag importing the cached stylesheet.
+
+    A style-only st.html body goes to Streamlit's event container, so it takes
+    no room in the layout.
+    """
+    return f'<style>@import url("{theme_url()}");</style>'
+
+def payload_report():
+    """Theme bytes sent per rerun when inlined vs. when imported, plus the one-off downloads."""
+    with open(THEME_FILE, encoding="utf-8") as f:
+        css = f.read()
+    return {
+        'version': theme_version(),
+        'inline_bytes': len(f"<style>{css}</style>".encode()),
+        'tag_bytes': len(theme_tag().encode()),
+        'stylesheet_bytes': os.path.getsize(THEME_FILE),
+        'font_bytes': os.path.getsize(FONT_FILE),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Static assets of the Titan UI theme.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("report", help="per-rerun theme payload, inline vs. static")
+    args = parser.parse_args(argv)
+
+    if args.command == "report":
+        r = payload_report()
+        print(f"theme v={r['version']}: {r['inline_bytes']} B per rerun inline -> {r['tag_bytes']} B imported "
+              f"(stylesheet {r['stylesheet_bytes']} B and font {r['font_bytes']} B, fetched once)")
+
+if __name__ == "__main__":
+    main()
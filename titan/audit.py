@@ -0,0 +1,76 @@
+"""Append-only audit trail of task field changes.
+
+Task mutators wrap their UPDATEs in ``with audited(conn, task_ids, actor):``.
+The audited fields (db.AUDIT_FIELDS) of those tasks are read before and after
+the block, and every field that changed becomes one task_audit row of
+(task_id, field, old, new, actor, ts), in the same transaction as the change.
+Field names are interned in audit_fields and ts is in epoch seconds, so a row
+is a few integers plus the two values. Rows are indexed by task (for the
+detail-view history) and by time (for "what changed since").
+"""
+import contextlib
+import datetime
+import json
+import sqlite3
+import threading
+import time
+
+from titan import config
+from titan.db import AUDIT_FIELDS, get_db
+
+_field_ids = {}
+_field_lock = threading.Lock()
+
+def _ids(conn):
+    """{field name: id} for the current database, read once per process."""
+    with _field_lock:
+        if config.DB_FILE not in _field_ids:
+            _field_ids[config.DB_FILE] = dict(conn.execute("SELECT name, id FROM audit_fields").fetchall())
+        return _field_ids[config.DB_FILE]
+
+def _snapshot(conn, task_ids):
+    rows = conn.execute(f"SELECT id, {', '.join(AUDIT_FIELDS)} FROM tasks WHERE id IN (SELECT value FROM json_each(?))",
+                        (json.dumps(task_ids),)).fetchall()
+    return {r[0]: r[1:] for r in rows}
+
+@contextlib.contextmanager
+def audited(conn, task_ids, actor=None):
+    """Logs every audited field of `task_ids` that the with-block changes on `conn`."""
+    task_ids = [int(i) for i in task_ids]
+    before = _snapshot(conn, task_ids) if task_ids else {}
+    yield
+    if not before:
+        return
+    after, ids, ts = _snapshot(conn, task_ids), _ids(conn), int(time.time())
+    rows = [(task_id, ids[field], old, new, actor, ts)
+            for task_id, old_row in before.items()
+            for field, old, new in zip(AUDIT_FIELDS, old_row, after.get(task_id, old_row)) if old != new]
+    if rows:
+        conn.executemany("INSERT INTO task_audit (task_id, field_id, old, new, actor, ts) VALUES (?, ?, ?, ?, ?, ?)", rows)
+
+def _rows(conn, where, params, limit):
+    conn.row_factory = sqlite3.Row
+    rows = conn.execute(f"""SELECT a.id, a.task_id, f.name AS field, a.old, a.new, a.actor, a.ts
+                            FROM task_audit a JOIN audit_fields f ON f.id = a.field_id
+                            WHERE {where} ORDER BY a.id DESC LIMIT ?""", (*params, limit)).fetchall()
+    return [dict(r, at=datetime.datetime.fromtimestamp(r['ts']).strftime("%Y-%m-%d %H:%M:%S")) for r in rows]
+
+def get_task_history(task_id, limit=20, before_id=None):
+    """One page of a task's changes, newest first. Pass the last id of a page as before_id for the next."""
+    conn = get_db()
+    where, params = ("a.task_id = ? AND a.id < ?", (task_id, before_id)) if before_id is not None else ("a.task_id = ?", (task_id,))
+    rows = _rows(conn, where, params, limit)
+    conn.close()
+    return rows
+
+def get_changes(since, until=None, limit=500):
+    """Changes to any task between two datetimes (or date strings), newest first."""
+    def epoch(value):
+        return int((datetime.datetime.fromisoformat(str(value)) if not isinstance(value, datetime.datetime) else value).timestamp())
+    conn = get_db()
+    where, params = "a.ts >= ?", [epoch(since)]
+    if until is not None:
+        where += " AND a.ts < ?"; params.append(epoch(until))
+    rows = _rows(conn, where, params, limit)
+    conn.close()
+    return rows
@@ -0,0 +1,184 @@
+"""Online snapshots of the live and archive databases via the SQLite backup API.
+
+    python -m titan.backup snapshot
+    python -m titan.backup list
+    python -m titan.backup verify titan-backups/20261019-060000
+    python -m titan.backup restore titan-backups/20261019-060000
+
+Pages are copied config.BACKUP_PAGES at a time with config.BACKUP_SLEEP_SECONDS
+between steps. The source is locked only while a step runs, so writers keep
+going during a long backup. Each snapshot is written to a temporary directory
+and must pass PRAGMA integrity_check before it is renamed into place, under
+config.BACKUP_DIR or, by default, <db>-backups/ beside the database. Only the
+newest config.BACKUP_KEEP snapshots are kept. The maintenance sweep takes a new
+one once the newest is older than config.BACKUP_INTERVAL_SECONDS. A PostgreSQL
+database is backed up with its own tools (pg_dump, base backups); the sweep
+skips it.
+"""
+import argparse
+import datetime
+import os
+import shutil
+import sqlite3
+import sys
+import time
+
+from titan import config
+from titan import metrics
+from titan.db import archive_path, is_postgres
+
+SNAPSHOT_FORMAT = "%Y%m%d-%H%M%S"
+
+def _copy(src_path, dest_path, pages, sleep, standalone=False):
+    src = sqlite3.connect(src_path)
+    dest = sqlite3.connect(dest_path)
+    try:
+        src.backup(dest, pages=pages, sleep=sleep)
+        if standalone:
+            # Snapshots inherit WAL mode from the source; make each a single self-contained file
+            dest.execute("PRAGMA journal_mode=DELETE")
+    finally:
+        dest.close()
+        src.close()
+
+def integrity_errors(path):
+    """Returns PRAGMA integrity_check problems for the database at `path`; empty means healthy."""
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        rows = [r[0] for r in conn.execute("PRAGMA integrity_check").fetchall()]
+    finally:
+        conn.close()
+    return [] if rows == ["ok"] else rows
+
+def backup_dir(db_path=None):
+    """Where snapshots of the database at `db_path` go: config.BACKUP_DIR, else <db>-backups/ beside it."""
+    if config.BACKUP_DIR:
+        return config.BACKUP_DIR
+    root, _ = os.path.splitext(os.path.abspath(db_path or config.DB_FILE))
+    return f"{root}-backups"
+
+def _files(db_path=None):
+    """(source path, file name inside a snapshot) for the live database and, if present, its archive."""
+    db_path = db_path or config.DB_FILE
+    files = [(db_path, os.path.basename(db_path))]
+    cold = archive_path(db_path)
+    if os.path.exists(cold):
+        files.append((cold, os.path.basename(cold)))
+    return files
+
+def snapshot(dest_dir=None, pages=None, sleep=None, db_path=None):
+    """Takes a verified snapshot; returns its directory."""
+    if is_postgres(db_path):
+        raise ValueError("snapshots cover SQLite databases; back up PostgreSQL with pg_dump")
+    dest_dir = dest_dir or backup_dir(db_path)
+    pages = config.BACKUP_PAGES if pages is None else pages
+    sleep = config.BACKUP_SLEEP_SECONDS if sleep is None else sleep
+    final = os.path.join(dest_dir, datetime.datetime.now().strftime(SNAPSHOT_FORMAT))
+    tmp = f"{final}.tmp"
+    os.makedirs(tmp, exist_ok=True)
+    started = time.perf_counter()
+    try:
+        for src_path, name in _files(db_path):
+            _copy(src_path, os.path.join(tmp, name), pages, sleep, standalone=True)
+            errors = integrity_errors(os.path.join(tmp, name))
+            if errors:
+                raise sqlite3.DatabaseError(f"snapshot of {name} failed integrity_check: {errors[:5]}")
+        os.replace(tmp, final)
+    except Exception:
+        shutil.rmtree(tmp, ignore_errors=True)
+        metrics.BACKUPS.inc(outcome="failed")
+        raise
+    metrics.BACKUPS.inc(outcome="ok")
+    metrics.BACKUP_SECONDS.observe(time.perf_counter() - started)
+    rotate(dest_dir)
+    return final
+
+def list_snapshots(dest_dir=None):
+    """Snapshot directories, oldest first."""
+    dest_dir = dest_dir or backup_dir()
+    if not os.path.isdir(dest_dir):
+        return []
+    names = []
+    for name in os.listdir(dest_dir):
+        try:
+            datetime.datetime.strptime(name, SNAPSHOT_FORMAT)
+        except ValueError:
+            continue
+        names.append(name)
+    return [os.path.join(dest_dir, n) for n in sorted(names)]
+
+def rotate(dest_dir=None, keep=None):
+    keep = config.BACKUP_KEEP if keep is None else keep
+    removed = list_snapshots(dest_dir)[:-keep] if keep > 0 else []
+    for path in removed:
+        shutil.rmtree(path, ignore_errors=True)
+    return removed
+
+def verify(snapshot_dir):
+    """Returns {file name: integrity problems} for every database in a snapshot."""
+    return {name: integrity_errors(os.path.join(snapshot_dir, name))
+            for name in sorted(os.listdir(snapshot_dir)) if not name.endswith(("-wal", "-shm", "-journal"))}
+
+def restore(snapshot_dir, db_path=None, pages=None, sleep=None):
+    """Copies a verified snapshot back over the live database (and archive) through the backup API.
+
+    Open connections see the restored data on their next transaction; writes
+    queued meanwhile land on top of it.
+    """
+    db_path = db_path or config.DB_FILE
+    problems = {name: errors for name, errors in verify(snapshot_dir).items() if errors}
+    if problems:
+        raise sqlite3.DatabaseError(f"refusing to restore a damaged snapshot: {problems}")
+    pages = config.BACKUP_PAGES if pages is None else pages
+    sleep = config.BACKUP_SLEEP_SECONDS if sleep is None else sleep
+    targets = {os.path.basename(db_path): db_path, os.path.basename(archive_path(db_path)): archive_path(db_path)}
+    restored = []
+    for name in sorted(os.listdir(snapshot_dir)):
+        if name in targets:
+            _copy(os.path.join(snapshot_dir, name), targets[name], pages, sleep)
+            restored.append(targets[name])
+    return restored
+
+def run_scheduled_backup():
+    """Takes a snapshot if backups are enabled and the newest one is older than the interval; returns its path or None."""
+    if config.BACKUP_INTERVAL_SECONDS <= 0 or is_postgres():
+        return None
+    existing = list_snapshots()
+    if existing:
+        newest = datetime.datetime.strptime(os.path.basename(existing[-1]), SNAPSHOT_FORMAT)
+        if (datetime.datetime.now() - newest).total_seconds() < config.BACKUP_INTERVAL_SECONDS:
+            return None
+    return snapshot()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Online backups of the Titan database.")
+    parser.add_argument("--db", default=config.DB_FILE)
+    parser.add_argument("--dir", help="snapshot directory (default: TITAN_BACKUP_DIR or <db>-backups/)")
+    parser.add_argument("--pages", type=int, default=config.BACKUP_PAGES, help="pages copied per step (-1 = all at once)")
+    parser.add_argument("--sleep", type=float, default=config.BACKUP_SLEEP_SECONDS, help="seconds between steps")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("snapshot", help="take a snapshot now")
+    sub.add_parser("list", help="list snapshots")
+    sub.add_parser("verify", help="integrity-check a snapshot").add_argument("snapshot")
+    sub.add_parser("restore", help="restore a snapshot over --db").add_argument("snapshot")
+    args = parser.parse_args(argv)
+
+    if args.command == "snapshot":
+        print(snapshot(args.dir, args.pages, args.sleep, args.db))
+    elif args.command == "list":
+        for path in list_snapshots(args.dir or backup_dir(args.db)):
+            size = sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+            print(f"{path}  {size / 1_048_576:.1f} MiB")
+    elif args.command == "verify":
+        problems = {name: errors for name, errors in verify(args.snapshot).items() if errors}
+        for name, errors in problems.items():
+            print(f"{name}: {'; '.join(errors[:10])}")
+        if problems:
+            sys.exit(1)
+        print("ok")
+    elif args.command == "restore":
+        for path in restore(args.snapshot, args.db, args.pages, args.sleep):
+            print(f"restored {path}")
+
+if __name__ == "__main__":
+    main()
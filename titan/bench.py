@@ -0,0 +1,227 @@
+"""Repeatable benchmarks for the backend functions and each page's data path.
+
+    python -m titan.bench --scale 10k --out bench-10k.json
+    python -m titan.bench --scale 10k --compare bench-10k.json
+
+Each run builds a fresh synthetic database (titan.synth) with a fixed seed, times
+every case `--repeat` times after one warm-up call, and writes JSON with the
+environment and per-case min/median/p95/mean in milliseconds. The page.* cases
+time a rerun with warm caches; their .uncached twins empty the titan.changes
+cache before every call, timing each page's full data path. --compare prints
+the median ratio against an earlier result file and exits non-zero when any case
+regressed by more than --threshold.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from titan import config
+from titan.db import get_pool
+
+def _git_version():
+    try:
+        return subprocess.check_output(["git", "describe", "--always", "--dirty"], stderr=subprocess.DEVNULL,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def _sample(rows, key):
+    return rows[len(rows) // 2][key] if rows else None
+
+def build_cases():
+    """Returns [(name, fn)], resolved against the current database contents."""
+    from titan import comments, frames, inventory, picking, planning, shipments, tasks, timeclock, users
+    from titan.changes import cached, clear_cache
+
+    all_tasks = tasks.get_tasks()
+    task_id = _sample(all_tasks, 'id')
+    assignee = _sample(all_tasks, 'assignee')
+    username = "user00000" if users.get_user("user00000") else "admin"
+    timer_state = {'action': 'start'}
+    wave = [s['id'] for s in shipments.get_shipments_page(200, status="New")]
+
+    def toggle_timer():
+        tasks.handle_task_timer(task_id, timer_state['action'], assignee)
+        timer_state['action'] = 'pause' if timer_state['action'] == 'start' else 'start'
+
+    def dashboard_page():
+        summary = tasks.get_task_summary()
+        tasks.get_task_grid("In Progress", "", tuple(summary['companies'][:3]), ("High",), "All Time")
+        timeclock.get_live_workers()
+        return summary['counts']
+
+    def task_grid_uncached():
+        where, params = tasks.task_filter_sql("All")
+        return frames.query_frame(f"SELECT {tasks.TASK_GRID_SELECT} FROM tasks {where} ORDER BY id DESC",
+                                  params, tasks.TASK_GRID_COLUMNS)
+
+    def my_desk_page():
+        mine = tasks.get_user_tasks(assignee)
+        users.get_all_users()
+        inventory.get_companies()
+        # Cards show unread counts; a thread is only fetched once its popover is opened.
+        comments.get_unread_counts(username, [t['id'] for t in mine])
+
+    def sidebar():
+        timeclock.get_last_work_event(username)
+        tasks.get_running_task_for_user(assignee)
+
+    def uncached(fn):
+        # A page right after a write: every cached read inside it goes to the database
+        def run():
+            clear_cache()
+            return fn()
+        return run
+
+    pages = [
+        ("page.sidebar", sidebar),
+        ("page.dashboard", dashboard_page),
+        ("page.my_desk", my_desk_page),
+        ("page.3pl_logistics", shipments.get_shipments),
+        ("page.team_reports", users.get_users_frame),
+        ("page.inventory", inventory.get_inventory_frame),
+    ]
+    return [
+        ("get_tasks", tasks.get_tasks),
+        ("get_tasks_page", lambda: tasks.get_tasks_page(50)),
+        ("get_task_by_id", lambda: tasks.get_task_by_id(task_id)),
+        ("get_running_task_for_user", lambda: tasks.get_running_task_for_user(assignee)),
+        ("filter_tasks.overdue", lambda: tasks.filter_tasks(all_tasks, "All", "", (), (), "Overdue")),
+        ("filter_tasks.search", lambda: tasks.filter_tasks(all_tasks, "All", "audit", (), (), "All Time")),
+        ("handle_task_timer", toggle_timer),
+        ("add_task", lambda: tasks.add_task("Bench task", assignee, "Internal", "IT", datetime.date.today())),
+        ("add_task.auto_assign", lambda: tasks.add_task("Bench task", None, "Internal", "IT", datetime.date.today())),
+        ("planning.load.uncached", planning._load),
+        ("get_load_forecast", planning.get_load_forecast),
+        ("update_task", lambda: tasks.update_task(task_id, "In Progress", assignee, 1.0, datetime.date.today())),
+        ("bulk_update_tasks.200", lambda: tasks.bulk_update_tasks([t['id'] for t in all_tasks[:200]], "priority", "High")),
+        ("get_task_grid.uncached", task_grid_uncached),
+        ("get_live_workers", timeclock.get_live_workers),
+        ("get_live_workers.cached", lambda: cached(('bench_live',), ['work_logs', 'users'], timeclock.get_live_workers)),
+        ("get_last_work_event", lambda: timeclock.get_last_work_event(username)),
+        ("log_work_event", lambda: timeclock.log_work_event(username, "CLOCK_IN")),
+        ("get_work_logs", timeclock.get_work_logs),
+        ("get_all_users", users.get_all_users),
+        ("verify_user", lambda: users.verify_user(username, "123")),
+        ("get_companies", inventory.get_companies),
+        ("get_inventory", inventory.get_inventory),
+        ("get_shipments", shipments.get_shipments),
+        ("get_shipments_page", lambda: shipments.get_shipments_page(50)),
+        ("build_pick_list.200.serpentine", lambda: picking.build_pick_list(wave, "serpentine")),
+        ("build_pick_list.200.nearest", lambda: picking.build_pick_list(wave, "nearest")),
+        ("get_comments", lambda: comments.get_comments(task_id)),
+        ("get_comments_page", lambda: comments.get_comments_page(task_id, 20)),
+        ("get_unread_counts.200", lambda: comments.get_unread_counts(username, [t['id'] for t in all_tasks[:200]])),
+        ("add_comment", lambda: comments.add_comment(task_id, username, "bench comment")),
+    ] + pages + [(f"{name}.uncached", uncached(fn)) for name, fn in pages]
+
+def time_case(fn, repeat):
+    fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000.0)
+    samples.sort()
+    return {
+        "n": repeat,
+        "min_ms": round(samples[0], 3),
+        "median_ms": round(statistics.median(samples), 3),
+        "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 3),
+        "mean_ms": round(statistics.fmean(samples), 3),
+    }
+
+def run(scale="10k", seed=42, repeat=5, only=None, db_path=None):
+    from titan.synth import generate
+
+    workdir = None
+    if db_path is None:
+        workdir = tempfile.mkdtemp(prefix="titan-bench-")
+        db_path = os.path.join(workdir, f"bench-{scale}.db")
+    config.DB_FILE = db_path
+
+    try:
+        started = time.perf_counter()
+        sizes = generate(scale, seed) if not os.path.exists(db_path) or os.path.getsize(db_path) == 0 else None
+        setup_s = time.perf_counter() - started
+
+        results = {}
+        for name, fn in build_cases():
+            if only and not any(part in name for part in only):
+                continue
+            try:
+                results[name] = time_case(fn, repeat)
+            except ImportError as e:
+                results[name] = {"skipped": f"missing dependency: {e.name}"}
+            print(f"{name:32s} {json.dumps(results[name])}", file=sys.stderr)
+    finally:
+        if workdir:
+            get_pool(db_path).close_all()
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        "meta": {
+            "version": _git_version(),
+            "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "scale": scale,
+            "seed": seed,
+            "repeat": repeat,
+            "table_sizes": sizes,
+            "setup_seconds": round(setup_s, 2),
+        },
+        "results": results,
+    }
+
+def compare(current, baseline, threshold):
+    """Prints median ratios; returns the names of cases slower than baseline by more than threshold."""
+    regressions = []
+    for name, res in current["results"].items():
+        old = baseline.get("results", {}).get(name)
+        if not old or "median_ms" not in res or "median_ms" not in old or not old["median_ms"]:
+            continue
+        ratio = res["median_ms"] / old["median_ms"]
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print(f"{name:32s} {old['median_ms']:>10.3f} -> {res['median_ms']:>10.3f} ms  x{ratio:.2f}{flag}")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark Titan backend functions on synthetic data.")
+    parser.add_argument("--scale", default="10k", help="1k, 10k, 100k, 1m or a row count")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--only", nargs="*", help="only run cases whose name contains one of these")
+    parser.add_argument("--db", help="reuse (or create) this database instead of a temporary one")
+    parser.add_argument("--out", help="write results JSON here")
+    parser.add_argument("--compare", help="earlier results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed median slowdown before flagging (0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    report = run(args.scale, args.seed, args.repeat, args.only, args.db)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
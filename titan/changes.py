@@ -0,0 +1,83 @@
+"""Cheap change detection for live views.
+
+A dedicated, never-writing connection polls ``PRAGMA data_version``, which only
+moves when another connection commits. Only then is table_versions re-read, so
+an idle database costs one pragma per poll interval for the whole process. On
+PostgreSQL, which has no such counter, table_versions is read on every poll.
+Results loaded through cached() are shared by every session and refetched only
+when one of the tables they depend on has changed.
+"""
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from titan import config
+from titan import metrics
+from titan.db import COMMIT_HOOKS, connect, is_postgres
+
+CACHE_SIZE = 256
+
+_lock = threading.Lock()
+_state = {'path': None, 'conn': None, 'data_version': None, 'versions': {}, 'checked_at': 0.0}
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+def _watch_conn():
+    if _state['path'] != config.DB_FILE:
+        if _state['conn'] is not None:
+            _state['conn'].close()
+        # Versions of one database say nothing about another's: drop what was cached for the old one
+        with _cache_lock:
+            _cache.clear()
+        _state.update(path=config.DB_FILE, data_version=None, versions={}, checked_at=0.0,
+                      conn=connect(config.DB_FILE, isolation_level=None) if is_postgres()
+                      else sqlite3.connect(config.DB_FILE, check_same_thread=False))
+    return _state['conn']
+
+def invalidate():
+    """Forces the next poll to hit the database; registered as a commit hook so in-process writes show at once."""
+    _state['checked_at'] = 0.0
+
+COMMIT_HOOKS.append(invalidate)
+
+def current_versions():
+    """Returns {table: version}, re-reading table_versions only when data_version moved."""
+    with _lock:
+        now = time.monotonic()
+        if _state['path'] == config.DB_FILE and now - _state['checked_at'] < config.CHANGE_POLL_SECONDS:
+            return _state['versions']
+        conn = _watch_conn()
+        data_version = None if is_postgres(_state['path']) else conn.execute("PRAGMA data_version").fetchone()[0]
+        if data_version is None or data_version != _state['data_version']:
+            _state['versions'] = dict(conn.execute("SELECT table_name, version FROM table_versions").fetchall())
+            _state['data_version'] = data_version
+        _state['checked_at'] = now
+        return _state['versions']
+
+def versions_of(tables):
+    versions = current_versions()
+    return tuple(versions.get(t, 0) for t in tables)
+
+def clear_cache():
+    """Drops every cached() result, so each loader hits the database on its next call."""
+    with _cache_lock:
+        _cache.clear()
+
+def cached(key, tables, loader):
+    """Returns loader()'s result, calling it again only after a write to one of `tables`."""
+    stamp = versions_of(tables)
+    with _cache_lock:
+        entry = _cache.get(key)
+        if entry is not None and entry[0] == stamp:
+            _cache.move_to_end(key)
+            metrics.CACHE_REQUESTS.inc(cache="live", result="hit")
+            return entry[1]
+    metrics.CACHE_REQUESTS.inc(cache="live", result="miss")
+    value = loader()
+    with _cache_lock:
+        _cache[key] = (stamp, value)
+        _cache.move_to_end(key)
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return value
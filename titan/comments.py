@@ -0,0 +1,74 @@
+"""Task comment threads and per-user read markers.
+
+Threads are read newest first in keyset pages (get_comments_page), served by
+idx_task_comments_task_id, so opening a task with hundreds of comments costs one
+short index range. comment_reads holds each user's last read comment id per
+task; get_unread_counts() answers "how many new comments" for a whole list of
+tasks with one grouped query.
+"""
+import datetime
+import json
+import sqlite3
+
+from titan.changes import cached
+from titan.db import get_db
+from titan.notify import enqueue_select
+from titan.writer import write_op
+
+@write_op
+def add_comment(conn, task_id, username, comment, reader=None):
+    """Posts a comment; `reader` (a users.username) has their read marker moved past it."""
+    ts = datetime.datetime.now().strftime("%Y-%m-%d %H:%M")
+    cur = conn.execute("INSERT INTO task_comments (task_id, username, comment, timestamp) VALUES (?, ?, ?, ?)",
+                       (task_id, username, comment, ts))
+    # Tell the assignee, unless they wrote it (comments carry a username or a display name)
+    enqueue_select(conn, """SELECT t.assignee AS recipient, 'comment', t.id, ? || ' on ' || t.title || ': ' || ?, NULL
+                            FROM tasks t LEFT JOIN users u ON u.username = t.assignee
+                            WHERE t.id = ? AND ? NOT IN (t.assignee, COALESCE(u.name, ''))""",
+                   (username, comment, task_id, username))
+    if reader:
+        mark_read(reader, task_id, cur.lastrowid)
+    return cur.lastrowid
+
+def get_comments(task_id):
+    """The whole thread, oldest first."""
+    conn = get_db()
+    conn.row_factory = sqlite3.Row
+    c = conn.cursor()
+    c.execute("SELECT * FROM task_comments WHERE task_id=? ORDER BY id ASC", (task_id,))
+    rows = [dict(r) for r in c.fetchall()]
+    conn.close()
+    return rows
+
+def get_comments_page(task_id, limit=20, before_id=None):
+    """One page of a thread, newest first. Pass the last id of a page as before_id for the older one."""
+    where, params = ("task_id = ? AND id < ?", (task_id, before_id)) if before_id is not None else ("task_id = ?", (task_id,))
+    conn = get_db()
+    conn.row_factory = sqlite3.Row
+    rows = [dict(r) for r in conn.execute(f"SELECT * FROM task_comments WHERE {where} ORDER BY id DESC LIMIT ?",
+                                          (*params, limit)).fetchall()]
+    conn.close()
+    return rows
+
+@write_op
+def mark_read(conn, username, task_id, last_id):
+    """Moves the user's read marker for the task up to comment `last_id` (never back)."""
+    conn.execute("""INSERT INTO comment_reads (username, task_id, last_read_id) VALUES (?, ?, ?)
+                    ON CONFLICT(username, task_id) DO UPDATE SET last_read_id = MAX(comment_reads.last_read_id, excluded.last_read_id)
+                    WHERE excluded.last_read_id > comment_reads.last_read_id""",
+                 (username, task_id, last_id))
+
+def get_unread_counts(username, task_ids):
+    """{task_id: comments newer than the user's read marker} for the given tasks; tasks with none are left out."""
+    task_ids = tuple(int(i) for i in task_ids)
+    if not task_ids:
+        return {}
+    def load():
+        conn = get_db()
+        rows = conn.execute("""SELECT c.task_id, COUNT(*) FROM task_comments c
+                               LEFT JOIN comment_reads r ON r.username = ? AND r.task_id = c.task_id
+                               WHERE c.task_id IN (SELECT value FROM json_each(?)) AND c.id > COALESCE(r.last_read_id, 0)
+                               GROUP BY c.task_id""", (username, json.dumps(task_ids))).fetchall()
+        conn.close()
+        return dict(rows)
+    return cached(('unread_comments', username, task_ids), ['task_comments', 'comment_reads'], load)
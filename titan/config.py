@@ -0,0 +1,95 @@
+"""Runtime settings for Titan Control, overridable through TITAN_* environment variables."""
+import os
+
+# --- DATABASE ---
+DB_FILE = os.environ.get("TITAN_DB", "titan.db")
+DB_POOL_SIZE = int(os.environ.get("TITAN_DB_POOL_SIZE", "8"))
+# With TITAN_DB set to a postgresql:// URL (titan.pg): pool ceiling and prepared statements kept per connection
+PG_POOL_MAX = int(os.environ.get("TITAN_PG_POOL_MAX", "32"))
+PG_PREPARED_MAX = int(os.environ.get("TITAN_PG_PREPARED_MAX", "200"))
+
+# --- WRITE QUEUE ---
+WRITE_QUEUE_DEPTH = int(os.environ.get("TITAN_WRITE_QUEUE_DEPTH", "1000"))
+WRITE_BATCH_SIZE = int(os.environ.get("TITAN_WRITE_BATCH_SIZE", "64"))
+WRITE_QUEUE_TIMEOUT_SECONDS = float(os.environ.get("TITAN_WRITE_QUEUE_TIMEOUT", "5"))
+
+# --- BACKGROUND MAINTENANCE ---
+MAINTENANCE_INTERVAL_SECONDS = int(os.environ.get("TITAN_MAINTENANCE_INTERVAL", "300"))
+TIMER_CAP_HOURS = float(os.environ.get("TITAN_TIMER_CAP_HOURS", "12"))
+SHIFT_CAP_HOURS = float(os.environ.get("TITAN_SHIFT_CAP_HOURS", "14"))
+
+# --- RECURRING TASKS ---
+RECURRING_HORIZON_DAYS = int(os.environ.get("TITAN_RECURRING_HORIZON_DAYS", "14"))
+RECURRING_BATCH_SIZE = int(os.environ.get("TITAN_RECURRING_BATCH_SIZE", "200"))
+
+# --- ARCHIVE ---
+ARCHIVE_DB = os.environ.get("TITAN_ARCHIVE_DB", "")
+ARCHIVE_TASKS_AFTER_DAYS = int(os.environ.get("TITAN_ARCHIVE_TASKS_AFTER_DAYS", "90"))
+ARCHIVE_WORK_LOGS_AFTER_DAYS = int(os.environ.get("TITAN_ARCHIVE_WORK_LOGS_AFTER_DAYS", "180"))
+ARCHIVE_BATCH_SIZE = int(os.environ.get("TITAN_ARCHIVE_BATCH_SIZE", "500"))
+
+# --- BACKUPS ---
+# Empty: <db>-backups/ next to the database file (see titan.backup.backup_dir)
+BACKUP_DIR = os.environ.get("TITAN_BACKUP_DIR", "")
+BACKUP_INTERVAL_SECONDS = int(os.environ.get("TITAN_BACKUP_INTERVAL", "21600"))
+BACKUP_KEEP = int(os.environ.get("TITAN_BACKUP_KEEP", "7"))
+BACKUP_PAGES = int(os.environ.get("TITAN_BACKUP_PAGES", "256"))
+BACKUP_SLEEP_SECONDS = float(os.environ.get("TITAN_BACKUP_SLEEP", "0.05"))
+
+# --- REPORT REPLICA ---
+REPLICA_MAX_STALENESS_SECONDS = float(os.environ.get("TITAN_REPLICA_MAX_STALENESS", "0"))
+
+# --- SESSIONS ---
+SESSION_SECRET = os.environ.get("TITAN_SESSION_SECRET", "")
+SESSION_TTL_HOURS = float(os.environ.get("TITAN_SESSION_TTL_HOURS", "12"))
+
+# --- NOTIFICATIONS ---
+NOTIFY_SMTP_HOST = os.environ.get("TITAN_SMTP_HOST", "")
+NOTIFY_SMTP_PORT = int(os.environ.get("TITAN_SMTP_PORT", "25"))
+NOTIFY_SMTP_USER = os.environ.get("TITAN_SMTP_USER", "")
+NOTIFY_SMTP_PASSWORD = os.environ.get("TITAN_SMTP_PASSWORD", "")
+NOTIFY_SMTP_STARTTLS = os.environ.get("TITAN_SMTP_STARTTLS", "") == "1"
+NOTIFY_FROM = os.environ.get("TITAN_NOTIFY_FROM", "titan@localhost")
+NOTIFY_INTERVAL_SECONDS = float(os.environ.get("TITAN_NOTIFY_INTERVAL", "60"))
+NOTIFY_BATCH_SIZE = int(os.environ.get("TITAN_NOTIFY_BATCH_SIZE", "500"))
+NOTIFY_MAX_PER_MINUTE = int(os.environ.get("TITAN_NOTIFY_MAX_PER_MINUTE", "60"))
+NOTIFY_MAX_ATTEMPTS = int(os.environ.get("TITAN_NOTIFY_MAX_ATTEMPTS", "5"))
+NOTIFY_DUE_SOON_DAYS = int(os.environ.get("TITAN_NOTIFY_DUE_SOON_DAYS", "1"))
+NOTIFY_KEEP_DAYS = int(os.environ.get("TITAN_NOTIFY_KEEP_DAYS", "30"))
+
+# --- CAPACITY PLANNING ---
+PLAN_DAILY_HOURS = float(os.environ.get("TITAN_PLAN_DAILY_HOURS", "8"))
+PLAN_HORIZON_DAYS = int(os.environ.get("TITAN_PLAN_HORIZON_DAYS", "14"))
+PLAN_DEFAULT_TASK_HOURS = float(os.environ.get("TITAN_PLAN_DEFAULT_TASK_HOURS", "1"))
+PLAN_HISTORY_TASKS = int(os.environ.get("TITAN_PLAN_HISTORY_TASKS", "20000"))
+
+# --- PICKING ---
+PICK_ROUTE = os.environ.get("TITAN_PICK_ROUTE", "serpentine")
+PICK_AISLE_SPACING = float(os.environ.get("TITAN_PICK_AISLE_SPACING", "3"))
+PICK_BIN_SPACING = float(os.environ.get("TITAN_PICK_BIN_SPACING", "1"))
+
+# --- LIVE VIEWS ---
+CHANGE_POLL_SECONDS = float(os.environ.get("TITAN_CHANGE_POLL_SECONDS", "1"))
+LIVE_REFRESH_SECONDS = float(os.environ.get("TITAN_LIVE_REFRESH_SECONDS", "5"))
+
+# --- UI THEME ---
+STATIC_URL = os.environ.get("TITAN_STATIC_URL", "app/static")
+
+# --- DIAGNOSTICS ---
+SLOW_QUERY_MS = float(os.environ.get("TITAN_SLOW_QUERY_MS", "50"))
+N_PLUS_ONE_THRESHOLD = int(os.environ.get("TITAN_N_PLUS_ONE_THRESHOLD", "10"))
+
+# --- METRICS ---
+METRICS_HOST = os.environ.get("TITAN_METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.environ.get("TITAN_METRICS_PORT", "0"))
+METRICS_FILE = os.environ.get("TITAN_METRICS_FILE", "")
+METRICS_INTERVAL_SECONDS = float(os.environ.get("TITAN_METRICS_INTERVAL", "15"))
+
+# --- GEMINI AI ---
+GEMINI_MODEL = os.environ.get("TITAN_GEMINI_MODEL", "gemini-2.5-flash-preview-09-2025")
+
+# --- HTTP API ---
+API_HOST = os.environ.get("TITAN_API_HOST", "127.0.0.1")
+API_PORT = int(os.environ.get("TITAN_API_PORT", "8600"))
+API_TOKEN = os.environ.get("TITAN_API_TOKEN", "")
+API_MAX_PAGE_SIZE = int(os.environ.get("TITAN_API_MAX_PAGE_SIZE", "500"))
@@ -0,0 +1,327 @@
+"""One behaviour suite for every storage backend.
+
+    python -m titan.conformance
+    python -m titan.conformance --db scratch.db --db postgresql://localhost/titan_scratch
+
+Each --db target (default: a fresh temporary SQLite file) gets init_db() twice,
+since migrations must be safe to re-run. Every check then goes through the
+public module functions, with the writer thread running as in the app, so the
+SQL exercised is the SQL the app sends. Checks add rows under names unique to
+the run, but the maintenance sweep and the outbox dispatch they also run act on
+the whole database: point it at a scratch one. Prints one line per check and
+exits non-zero when any check fails on any target.
+"""
+import argparse
+import datetime
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import traceback
+import uuid
+
+from titan import config
+
+CHECKS = []
+
+def check(fn):
+    CHECKS.append(fn)
+    return fn
+
+def expect(actual, expected, what):
+    if actual != expected:
+        raise AssertionError(f"{what}: expected {expected!r}, got {actual!r}")
+
+class Run:
+    """Names unique to one run, plus ids the checks hand on to each other."""
+
+    def __init__(self):
+        self.tag = uuid.uuid4().hex[:8]
+        self.alice, self.bob = f"cf-{self.tag}-a", f"cf-{self.tag}-b"
+        self.company = f"Conformance {self.tag}"
+        self.today = datetime.date.today()
+
+    def day(self, offset):
+        return str(self.today + datetime.timedelta(days=offset))
+
+def new_task(title, assignee, company, planned_date, parent_id=None):
+    """add_task() then the new task's id (add_task returns the assignee)."""
+    from titan.db import get_db
+    from titan.tasks import add_task
+    add_task(title, assignee, company, "QA", planned_date, parent_id)
+    conn = get_db()
+    task_id = conn.execute("SELECT MAX(id) FROM tasks WHERE title = ?", (title,)).fetchone()[0]
+    conn.close()
+    return task_id
+
+@check
+def schema(run):
+    from titan.db import VERSIONED_TABLES, get_table_versions
+    expect(sorted(get_table_versions(VERSIONED_TABLES)), sorted(VERSIONED_TABLES), "versioned tables")
+
+@check
+def users(run):
+    from titan import users
+    from titan.writer import write_op
+    expect(users.create_user(run.alice, "pw", "Alice Conf", "Tester", True, f"{run.alice}@example.com"), True, "new user")
+    expect(users.create_user(run.alice, "pw", "Alice Again", "Tester", False, "x@example.com"), False, "duplicate user")
+    expect(users.create_user(run.bob, "pw", "Bob Conf", "Tester", False, f"{run.bob}@example.com"), True, "second user")
+    expect(users.verify_user(f"{run.alice}@example.com", "pw")['username'], run.alice, "login by email")
+    expect(users.verify_user(run.alice, "wrong"), None, "wrong password")
+    expect(bool(users.get_user(run.alice)['is_admin']), True, "is_admin")
+    expect(run.bob in set(users.get_all_users()['username']), True, "get_all_users")
+    frame = users.get_users_frame()
+    expect(str(frame['is_admin'].dtype), "boolean", "roster is_admin dtype")
+    expect(run.bob in set(frame['username']), True, "roster lists the new user")
+    touch = write_op(lambda conn, username: conn.execute("UPDATE users SET name = name WHERE username = ?", (username,)))
+    before = list(users.get_all_users()['username'])
+    touch(before[0])
+    expect(list(users.get_all_users()['username']), before, "user order survives an update")
+
+@check
+def companies_and_inventory(run):
+    from titan import inventory
+    expect(inventory.add_company(run.company), True, "new company")
+    expect(inventory.add_company(run.company), False, "duplicate company")
+    expect(run.company in inventory.get_companies(), True, "get_companies")
+    sku = f"CF-{run.tag}"
+    expect(inventory.add_inventory(sku, "Widget", 3, "B7"), True, "new SKU")
+    expect(inventory.add_inventory(sku, "Widget", 3, "B7"), False, "duplicate SKU")
+    expect(int(inventory.get_inventory().set_index('sku').loc[sku, 'stock']), 3, "stock")
+
+@check
+def tasks(run):
+    from titan import tasks
+    run.task = new_task(f"Conf task {run.tag}", run.alice, run.company, run.day(-2))
+    task = tasks.get_task_by_id(run.task)
+    expect((task['title'], task['assignee_name'], task['status']), (f"Conf task {run.tag}", "Alice Conf", "To Do"), "stored task")
+    tasks.update_task(run.task, "In Progress", run.alice, 1.5, run.day(-2), actor=run.alice)
+    expect(tasks.get_task_by_id(run.task)['act_time'], 1.5, "act_time after update")
+    grid = tasks.get_task_grid(search=f"conf task {run.tag}", companies=(run.company,))
+    expect(list(grid['id']), [run.task], "grid search")
+    from titan.scheduler import refresh_overdue_flags
+    refresh_overdue_flags()
+    overdue = tasks.get_task_grid(timing="Overdue", companies=(run.company,))
+    expect(list(overdue['id']), [run.task], "overdue filter")
+    expect(tasks.get_task_summary()['companies'].count(run.company), 1, "summary companies")
+
+@check
+def bulk_actions(run):
+    from titan import tasks
+    ids = [new_task(f"Bulk {run.tag} {i}", run.alice, run.company, run.day(3) if i else "") for i in range(3)]
+    expect(tasks.bulk_update_tasks(ids, "reassign", run.bob, actor=run.alice), 3, "bulk reassign")
+    expect(tasks.bulk_update_tasks(ids, "shift", -5, actor=run.alice), 2, "bulk shift skips undated tasks")
+    moved = tasks.get_task_by_id(ids[1])
+    expect((moved['planned_date'], moved['is_overdue']), (run.day(-2), 1), "shifted date and overdue flag")
+    expect(tasks.bulk_update_tasks(ids, "status", "Done", actor=run.alice), 3, "bulk status")
+    done = tasks.get_task_by_id(ids[1])
+    expect((done['is_overdue'], done['done_at'] is not None), (0, True), "done bookkeeping")
+    expect(tasks.bulk_update_tasks(ids, "rate", 4, "ok", actor=run.alice), 3, "bulk rate")
+
+@check
+def timers(run):
+    from titan import tasks
+    tasks.handle_task_timer(run.task, "start", run.alice)
+    expect(tasks.get_running_task_for_user(run.alice)['id'], run.task, "running task")
+    tasks.handle_task_timer(run.task, "stop", run.alice)
+    expect(tasks.get_running_task_for_user(run.alice), None, "timer stopped")
+    redo = new_task(f"Reopened {run.tag}", run.alice, run.company, run.day(0))
+    tasks.handle_task_timer(redo, "start", run.alice)
+    tasks.handle_task_timer(redo, "stop", run.alice)
+    tasks.handle_task_timer(redo, "start", run.alice)
+    expect(tasks.get_task_by_id(redo)['done_at'], None, "restarting a done task clears done_at")
+    tasks.handle_task_timer(redo, "pause", run.alice)
+
+@check
+def change_detection(run):
+    from titan import tasks
+    from titan.changes import versions_of
+    from titan.db import get_table_versions
+    before, seen = get_table_versions(['tasks'])['tasks'], versions_of(['tasks'])
+    tasks.rate_task(run.task, 5, "great", actor=run.alice)
+    expect(get_table_versions(['tasks'])['tasks'] > before, True, "tasks version moved")
+    expect(versions_of(['tasks']) != seen, True, "cache sees the write")
+    expect(tasks.get_task_by_id(run.task)['rating'], 5, "rating")
+
+@check
+def comments(run):
+    from titan import comments
+    first = comments.add_comment(run.task, run.bob, "hello", reader=run.bob)
+    second = comments.add_comment(run.task, run.bob, "again", reader=run.bob)
+    expect(second > first, True, "comment ids increase")
+    expect(comments.get_unread_counts(run.alice, [run.task]), {run.task: 2}, "unread for the other user")
+    expect(comments.get_unread_counts(run.bob, [run.task]), {}, "nothing unread for the writer")
+    comments.mark_read(run.alice, run.task, second)
+    comments.mark_read(run.alice, run.task, first)
+    expect(comments.get_unread_counts(run.alice, [run.task]), {}, "read marker never moves back")
+
+@check
+def audit(run):
+    from titan.audit import get_task_history
+    fields = {(r['field'], str(r['new'])) for r in get_task_history(run.task, limit=50)}
+    expect(("status", "In Progress") in fields and ("rating", "5") in fields, True, "history records the changes")
+
+@check
+def projects(run):
+    from titan import projects, tasks
+    root = new_task(f"Project {run.tag}", run.alice, run.company, run.day(5))
+    child = new_task(f"Phase {run.tag}", run.alice, run.company, run.day(5), parent_id=root)
+    leaf = new_task(f"Step {run.tag}", run.bob, run.company, run.day(5), parent_id=child)
+    tasks.update_task(leaf, "Done", run.bob, 2.0, run.day(5))
+    rollup = projects.get_rollup(root)
+    expect((rollup['task_count'], rollup['done'], rollup['hours']), (3, 1, 2.0), "rollup after insert/update")
+    try:
+        projects.set_parent(root, leaf)
+        raise AssertionError("moving a task under its own subtask was allowed")
+    except ValueError:
+        pass
+    projects.set_parent(leaf, None)
+    expect(projects.get_rollup(root)['task_count'], 2, "rollup after moving a subtree out")
+    expect(projects.get_ancestors(child), [(root, f"Project {run.tag}")], "ancestors")
+
+@check
+def recurring(run):
+    from titan import recurring
+    recurring.add_template(f"Daily {run.tag}", run.alice, run.company, "QA", "FREQ=DAILY", starts_on=run.today)
+    first = recurring.run_materializer(horizon_days=2)
+    expect(first >= 3, True, "occurrences created")
+    expect(recurring.run_materializer(horizon_days=2), 0, "materializer is idempotent")
+
+@check
+def notifications(run):
+    from titan import notify
+    from titan.writer import write_op
+    enqueue = write_op(notify.enqueue)
+    enqueue(run.alice, "test", run.task, "hello", dedupe_key=f"cf:{run.tag}")
+    enqueue(run.alice, "test", run.task, "hello", dedupe_key=f"cf:{run.tag}")
+    notify.queue_due_reminders()
+    expect(notify.queue_due_reminders(), 0, "reminders are queued once")
+    from titan.db import get_db
+    conn = get_db()
+    n = conn.execute("SELECT COUNT(*) FROM notifications WHERE dedupe_key = ?", (f"cf:{run.tag}",)).fetchone()[0]
+    conn.close()
+    expect(n, 1, "dedupe_key")
+
+@check
+def dispatch(run):
+    from titan import notify
+    sink = notify.SinkServer(port=0)
+    threading.Thread(target=sink.serve_forever, daemon=True).start()
+    saved = config.NOTIFY_SMTP_HOST, config.NOTIFY_SMTP_PORT, config.NOTIFY_MAX_PER_MINUTE
+    config.NOTIFY_SMTP_HOST, config.NOTIFY_SMTP_PORT = sink.server_address
+    config.NOTIFY_MAX_PER_MINUTE = 1_000_000
+    try:
+        while notify.dispatch_once()['events_sent']:
+            pass
+    finally:
+        config.NOTIFY_SMTP_HOST, config.NOTIFY_SMTP_PORT, config.NOTIFY_MAX_PER_MINUTE = saved
+        sink.shutdown()
+        sink.server_close()
+    expect(any(f"{run.alice}@example.com" in recipients for _, recipients, _ in sink.messages), True, "digest delivered")
+    from titan.db import get_db
+    conn = get_db()
+    status = conn.execute("SELECT status FROM notifications WHERE dedupe_key = ?", (f"cf:{run.tag}",)).fetchone()[0]
+    conn.close()
+    expect(status, "sent", "event marked sent")
+
+@check
+def planning(run):
+    from titan import planning
+    forecast = planning.get_load_forecast(days=7)
+    expect(run.alice in forecast.index, True, "forecast rows per user")
+    expect(planning.recommend_assignee("QA", candidates=[run.alice, run.bob]) in (run.alice, run.bob), True, "recommendation")
+    expect(run.alice in (planning.assignable_users() or []), False, "admins are not auto-assigned")
+
+@check
+def picking(run):
+    from titan import inventory, picking, shipments
+    sku = f"CF-{run.tag}"
+    inventory.add_inventory(f"{sku}-2", "Gadget", 1, "A2")
+    shipments.add_shipment(f"SHP-{run.tag}", str(run.today), run.alice, "Dock", f"{sku}:2, {sku}-2:2", 4)
+    pick = picking.build_pick_list([f"SHP-{run.tag}"])
+    expect([(p['sku'], p['qty'], p['short']) for p in pick['picks']], [(f"{sku}-2", 2, True), (sku, 2, False)], "walk order")
+
+@check
+def sessions(run):
+    from titan import sessions
+    token = sessions.issue(run.alice)
+    expect(sessions.verify(token)[0]['username'], run.alice, "valid session")
+    renewed = sessions.renew(token, run.alice)
+    expect(sessions.verify(token), (None, None), "renewal revokes the old session")
+    expect(sessions.verify(renewed)[0]['username'], run.alice, "renewed session")
+    expect(sessions.revoke(renewed), True, "revoke")
+    expect(sessions.verify(renewed), (None, None), "revoked session")
+
+@check
+def timeclock(run):
+    from titan import timeclock
+    timeclock.log_work_event(run.bob, "CLOCK_IN")
+    expect(timeclock.get_last_work_event(run.bob)[0], "CLOCK_IN", "last event")
+    expect(run.bob in set(timeclock.get_work_logs(since=run.today)['username']), True, "work log frame")
+    from titan.scheduler import close_stale_shifts
+    expect(close_stale_shifts(max_hours=-1) >= 1, True, "stale shift closed")
+    expect(timeclock.get_last_work_event(run.bob)[0], "AUTO_CLOCK_OUT", "auto clock-out")
+
+@check
+def maintenance_sweep(run):
+    from titan.scheduler import run_maintenance_sweep
+    run_maintenance_sweep()
+    second = run_maintenance_sweep()
+    expect((second['recurring_created'], second['reminders_queued'], second['shifts_closed']), (0, 0, 0), "second sweep is a no-op")
+
+def run_target(db):
+    """Runs every check against `db`; returns [(check name, error or None)]."""
+    from titan.db import get_pool, init_db
+    from titan.writer import start_writer, stop_writer
+    config.DB_FILE = db
+    results = []
+    try:
+        init_db()
+        init_db()
+        start_writer()
+        run = Run()
+        for fn in CHECKS:
+            try:
+                fn(run)
+                results.append((fn.__name__, None))
+            except Exception as e:
+                results.append((fn.__name__, e))
+    finally:
+        stop_writer()
+        get_pool(db).close_all()
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the storage backend conformance checks.")
+    parser.add_argument("--db", action="append", help="SQLite file or postgresql:// URL (repeatable); default a temporary SQLite file")
+    parser.add_argument("-v", "--verbose", action="store_true", help="print tracebacks of failures")
+    args = parser.parse_args(argv)
+
+    workdir = None
+    targets = args.db
+    if not targets:
+        workdir = tempfile.mkdtemp(prefix="titan-conformance-")
+        targets = [os.path.join(workdir, "conformance.db")]
+    failed = 0
+    try:
+        for db in targets:
+            print(db)
+            started = time.perf_counter()
+            for name, error in run_target(db):
+                print(f"  {'ok  ' if error is None else 'FAIL'} {name}{f': {error}' if error else ''}")
+                if error is not None:
+                    failed += 1
+                    if args.verbose:
+                        traceback.print_exception(error)
+            print(f"  ({time.perf_counter() - started:.1f}s)")
+    finally:
+        if workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+    if failed:
+        print(f"{failed} check(s) failed")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,533 @@
+"""Connection pooling and schema management.
+
+config.DB_FILE names the database: a SQLite file path, or a postgresql:// URL
+served by titan.pg. Both backends expose the sqlite3 connection API and run the
+same init_db(); the SQL the app writes is SQLite's, translated by titan.pg.
+"""
+import sqlite3
+import hashlib
+import os
+import queue
+import threading
+import time
+
+from titan import config
+from titan import metrics
+from titan import profiler
+
+# Tables whose writes bump a row in table_versions (used for ETags and change detection)
+VERSIONED_TABLES = ["users", "tasks", "task_comments", "comment_reads", "work_logs", "shipments", "inventory", "companies",
+                    "sops", "revoked_sessions", "task_templates"]
+
+# Task fields whose changes titan.audit records, interned into audit_fields in this order
+AUDIT_FIELDS = ["title", "assignee", "company", "category", "priority", "status", "planned_date", "timer_start",
+                "act_time", "rating", "feedback", "parent_id"]
+
+# task_rollups column -> one task's contribution to it ({r} is NEW or OLD inside the tasks triggers)
+ROLLUP_COLUMNS = {"task_count": "1", "todo": "(CASE WHEN {r}.status = 'To Do' THEN 1 ELSE 0 END)",
+                  "in_progress": "(CASE WHEN {r}.status = 'In Progress' THEN 1 ELSE 0 END)",
+                  "done": "(CASE WHEN {r}.status = 'Done' THEN 1 ELSE 0 END)", "hours": "COALESCE({r}.act_time, 0)",
+                  "rated": "(CASE WHEN {r}.rating IS NOT NULL THEN 1 ELSE 0 END)", "rating_sum": "COALESCE({r}.rating, 0)"}
+
+# Callables run after every commit on a pooled connection (e.g. change-detection invalidation)
+COMMIT_HOOKS = []
+
+QUERY_KINDS = ("select", "insert", "update", "delete")
+
+# Raised by either backend (titan.pg maps PostgreSQL's errors onto these)
+IntegrityError = sqlite3.IntegrityError
+OperationalError = sqlite3.OperationalError
+
+def is_postgres(target=None):
+    """True when `target` (default config.DB_FILE) is a PostgreSQL URL rather than a SQLite file."""
+    return str(target or config.DB_FILE).startswith(("postgres://", "postgresql://"))
+
+def is_busy_error(e):
+    msg = str(e).lower()
+    return "locked" in msg or "busy" in msg
+
+def _count_busy(e):
+    if is_busy_error(e):
+        metrics.DB_BUSY.inc(outcome="error")
+
+def record_query(sql, t0, rowcount):
+    """Reports a statement started at perf_counter() t0; returns the (key, entry) to pass to count_rows."""
+    ms = (time.perf_counter() - t0) * 1000.0
+    kind = sql.lstrip()[:6].lower()
+    metrics.DB_QUERY_SECONDS.observe(ms / 1000.0, kind=kind if kind in QUERY_KINDS else "other")
+    return profiler.normalize_sql(sql), profiler.record_query(sql, ms, rowcount)
+
+def count_rows(key, entry, n):
+    profiler.add_rows(entry, key, n)
+
+class TimedCursor(sqlite3.Cursor):
+    """Cursor that reports every statement's duration and row count to titan.profiler."""
+    _entry = None
+    _key = None
+
+    def execute(self, sql, params=()):
+        t0 = time.perf_counter()
+        try:
+            return super().execute(sql, params)
+        except sqlite3.OperationalError as e:
+            _count_busy(e)
+            raise
+        finally:
+            self._record(sql, t0)
+
+    def executemany(self, sql, seq_of_params):
+        t0 = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_params)
+        except sqlite3.OperationalError as e:
+            _count_busy(e)
+            raise
+        finally:
+            self._record(sql, t0)
+
+    def _record(self, sql, t0):
+        self._key, self._entry = record_query(sql, t0, self.rowcount)
+
+    def fetchone(self):
+        row = super().fetchone()
+        if row is not None:
+            count_rows(self._key, self._entry, 1)
+        return row
+
+    def fetchmany(self, size=None):
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        count_rows(self._key, self._entry, len(rows))
+        return rows
+
+    def fetchall(self):
+        rows = super().fetchall()
+        count_rows(self._key, self._entry, len(rows))
+        return rows
+
+class SQLiteDialect:
+    """Where init_db() differs per backend; titan.pg.PostgresDialect overrides these."""
+    name = "sqlite"
+
+    def prepare(self, c):
+        # WAL lets readers keep going while the writer thread (titan.writer) commits
+        c.execute("PRAGMA journal_mode=WAL")
+        c.execute("PRAGMA archive.journal_mode=WAL")
+
+    def schema_version(self, c):
+        return c.execute("PRAGMA user_version").fetchone()[0]
+
+    def set_schema_version(self, c, version):
+        c.execute(f"PRAGMA user_version = {int(version)}")
+
+    def has_archive(self, c, table):
+        return c.execute("SELECT 1 FROM archive.sqlite_master WHERE name=?", (table,)).fetchone() is not None
+
+    def create_trigger(self, c, name, event, table, body, when=None):
+        c.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {event} ON {table} {f'WHEN {when} ' if when else ''}BEGIN {body} END")
+
+    def abort_if(self, condition, message):
+        """Trigger statement failing the write with IntegrityError(message) when `condition` holds."""
+        return f"SELECT RAISE(ABORT, '{message}') WHERE {condition};"
+
+class PooledConnection(sqlite3.Connection):
+    """sqlite3 connection whose close() hands it back to its pool instead of closing it."""
+    pool = None
+    dialect = SQLiteDialect()
+
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        return self.cursor().executemany(sql, seq_of_params)
+
+    def commit(self):
+        sqlite3.Connection.commit(self)
+        for hook in COMMIT_HOOKS:
+            hook()
+
+    def close(self):
+        if self.pool is None or not self.pool.release(self):
+            sqlite3.Connection.close(self)
+
+def archive_path(path):
+    """The archive database (see titan.archive) that belongs to the database at `path`."""
+    if config.ARCHIVE_DB:
+        return config.ARCHIVE_DB
+    if path == ":memory:":
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}-archive{ext or '.db'}"
+
+def connect(path, **kwargs):
+    """Opens an instrumented connection with the archive attached as schema "archive"."""
+    if is_postgres(path):
+        from titan import pg
+        return pg.connect(path, **kwargs)
+    conn = sqlite3.connect(path, factory=PooledConnection, check_same_thread=False, **kwargs)
+    conn.execute("ATTACH DATABASE ? AS archive", (archive_path(path),))
+    return conn
+
+class ConnectionPool:
+    def __init__(self, path, size):
+        self.path = path
+        self._idle = queue.LifoQueue(maxsize=size)
+
+    def acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            conn = connect(self.path)
+            conn.pool = self
+            return conn
+
+    def release(self, conn):
+        """Returns True if the connection was kept for reuse."""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            conn.row_factory = None
+            self._idle.put_nowait(conn)
+            return True
+        except (queue.Full, sqlite3.Error):
+            return False
+
+    def close_all(self):
+        while True:
+            try:
+                sqlite3.Connection.close(self._idle.get_nowait())
+            except queue.Empty:
+                return
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def get_pool(path=None):
+    path = path or config.DB_FILE
+    pool = _pools.get(path)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(path)
+            if pool is None:
+                if is_postgres(path):
+                    from titan import pg
+                    pool = _pools[path] = pg.ConnectionPool(path, config.DB_POOL_SIZE, config.PG_POOL_MAX)
+                else:
+                    pool = _pools[path] = ConnectionPool(path, config.DB_POOL_SIZE)
+    return pool
+
+def get_db():
+    """Borrows a connection from the pool for config.DB_FILE; conn.close() returns it."""
+    return get_pool().acquire()
+
+def get_table_versions(tables=None):
+    """Returns {table: version}; a table's version increases on every write to it."""
+    conn = get_db()
+    rows = conn.execute("SELECT table_name, version FROM table_versions").fetchall()
+    conn.close()
+    versions = dict(rows)
+    if tables is None:
+        return versions
+    return {t: versions.get(t, 0) for t in tables}
+
+def init_db():
+    conn = get_db()
+    c = conn.cursor()
+    dialect = conn.dialect
+    dialect.prepare(c)
+    
+    # 1. Users (Added email column)
+    c.execute('''CREATE TABLE IF NOT EXISTS users (
+                    username TEXT PRIMARY KEY,
+                    password TEXT,
+                    name TEXT,
+                    role TEXT,
+                    avatar TEXT,
+                    is_admin BOOLEAN,
+                    email TEXT
+                )''')
+    
+    # DB Migration checks (Graceful updates for existing DBs)
+    try: c.execute("ALTER TABLE users ADD COLUMN email TEXT")
+    except: pass
+    
+    try: c.execute("ALTER TABLE tasks ADD COLUMN company TEXT")
+    except: pass
+    try: c.execute("ALTER TABLE tasks ADD COLUMN timer_start TEXT")
+    except: pass
+    try: c.execute("ALTER TABLE tasks ADD COLUMN rating INTEGER")
+    except: pass
+    try: c.execute("ALTER TABLE tasks ADD COLUMN feedback TEXT")
+    except: pass
+    try: c.execute("ALTER TABLE tasks ADD COLUMN is_overdue INTEGER DEFAULT 0")
+    except: pass
+    try: c.execute("ALTER TABLE tasks ADD COLUMN done_at TEXT")
+    except: pass
+    try: c.execute("ALTER TABLE tasks ADD COLUMN template_key TEXT")
+    except: pass
+    try: c.execute("ALTER TABLE tasks ADD COLUMN parent_id INTEGER")
+    except: pass
+                
+    # 2. Tasks
+    c.execute('''CREATE TABLE IF NOT EXISTS tasks (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    title TEXT,
+                    assignee TEXT REFERENCES users (username),
+                    company TEXT,
+                    category TEXT,
+                    priority TEXT,
+                    status TEXT,
+                    planned_date TEXT,
+                    timer_start TEXT,
+                    act_time REAL,
+                    notes TEXT,
+                    rating INTEGER,
+                    feedback TEXT,
+                    is_overdue INTEGER DEFAULT 0,
+                    done_at TEXT,
+                    template_key TEXT,
+                    parent_id INTEGER
+                )''')
+                
+    c.execute("CREATE INDEX IF NOT EXISTS idx_tasks_assignee_status_date ON tasks (assignee, status, planned_date)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_tasks_planned_date ON tasks (planned_date)")
+    # One task per recurring template occurrence (titan.recurring)
+    c.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_tasks_template_key ON tasks (template_key) WHERE template_key IS NOT NULL")
+
+    # 3. Shipments
+    c.execute('''CREATE TABLE IF NOT EXISTS shipments (
+                    id TEXT PRIMARY KEY,
+                    date TEXT,
+                    am TEXT,
+                    dest TEXT,
+                    skus TEXT,
+                    qty INTEGER,
+                    status TEXT,
+                    tracking TEXT
+                )''')
+
+    # 4. Work Logs
+    c.execute('''CREATE TABLE IF NOT EXISTS work_logs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    username TEXT,
+                    event_type TEXT,
+                    timestamp TEXT
+                )''')
+    
+    c.execute("CREATE INDEX IF NOT EXISTS idx_work_logs_username_id ON work_logs (username, id)")
+    
+    # 5. Companies
+    c.execute('''CREATE TABLE IF NOT EXISTS companies (
+                    name TEXT PRIMARY KEY
+                )''')
+
+    # 6. Inventory
+    c.execute('''CREATE TABLE IF NOT EXISTS inventory (
+                    sku TEXT PRIMARY KEY,
+                    name TEXT,
+                    stock INTEGER,
+                    location TEXT
+                )''')
+
+    # 7. SOPs
+    c.execute('''CREATE TABLE IF NOT EXISTS sops (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    title TEXT,
+                    content TEXT,
+                    category TEXT
+                )''')
+
+    # 8. Task Comments
+    c.execute('''CREATE TABLE IF NOT EXISTS task_comments (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    task_id INTEGER,
+                    username TEXT,
+                    comment TEXT,
+                    timestamp TEXT
+                )''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_task_comments_task_id ON task_comments (task_id, id)")
+    # Per-user read marker of each thread (titan.comments)
+    c.execute('''CREATE TABLE IF NOT EXISTS comment_reads (
+                    username TEXT,
+                    task_id INTEGER,
+                    last_read_id INTEGER NOT NULL,
+                    PRIMARY KEY (username, task_id)
+                ) WITHOUT ROWID''')
+    
+    # 9. Sessions (titan.sessions): signing key and logged-out session ids
+    c.execute('''CREATE TABLE IF NOT EXISTS app_secrets (
+                    name TEXT PRIMARY KEY,
+                    value TEXT
+                )''')
+    c.execute('''CREATE TABLE IF NOT EXISTS revoked_sessions (
+                    sid TEXT PRIMARY KEY,
+                    expires_at INTEGER
+                )''')
+
+    # 10. Notification outbox (titan.notify): filled by task writes and sweeps, drained by the dispatcher
+    c.execute('''CREATE TABLE IF NOT EXISTS notifications (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    recipient TEXT,
+                    kind TEXT,
+                    task_id INTEGER,
+                    message TEXT,
+                    dedupe_key TEXT UNIQUE,
+                    created_at TEXT,
+                    status TEXT DEFAULT 'pending',
+                    attempts INTEGER DEFAULT 0,
+                    next_attempt_at TEXT,
+                    claimed_until TEXT,
+                    sent_at TEXT,
+                    last_error TEXT
+                )''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_notifications_status_next ON notifications (status, next_attempt_at)")
+
+    # 11. Task audit trail (titan.audit): append-only field diffs, field names interned, ts in epoch seconds
+    c.execute('''CREATE TABLE IF NOT EXISTS audit_fields (
+                    id INTEGER PRIMARY KEY,
+                    name TEXT UNIQUE
+                )''')
+    c.executemany("INSERT OR IGNORE INTO audit_fields (name) VALUES (?)", [(f,) for f in AUDIT_FIELDS])
+    c.execute('''CREATE TABLE IF NOT EXISTS task_audit (
+                    id INTEGER PRIMARY KEY,
+                    task_id INTEGER NOT NULL,
+                    field_id INTEGER NOT NULL,
+                    old BLOB,
+                    new BLOB,
+                    actor TEXT,
+                    ts INTEGER NOT NULL
+                )''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_task_audit_task_id ON task_audit (task_id, id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_task_audit_ts ON task_audit (ts)")
+
+    # 12. Recurring task templates (titan.recurring), materialized into tasks by the maintenance sweep
+    c.execute('''CREATE TABLE IF NOT EXISTS task_templates (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    title TEXT,
+                    assignee TEXT REFERENCES users (username),
+                    company TEXT,
+                    category TEXT,
+                    priority TEXT,
+                    rule TEXT NOT NULL,
+                    starts_on TEXT NOT NULL,
+                    until TEXT,
+                    active INTEGER DEFAULT 1,
+                    materialized_through TEXT
+                )''')
+
+    # 13. Task hierarchy (titan.projects): closure table plus per-subtree totals, both kept current by triggers
+    c.execute("CREATE INDEX IF NOT EXISTS idx_tasks_parent_id ON tasks (parent_id) WHERE parent_id IS NOT NULL")
+    c.execute('''CREATE TABLE IF NOT EXISTS task_tree (
+                    ancestor INTEGER NOT NULL,
+                    descendant INTEGER NOT NULL,
+                    depth INTEGER NOT NULL,
+                    PRIMARY KEY (ancestor, descendant)
+                ) WITHOUT ROWID''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_task_tree_descendant ON task_tree (descendant, depth)")
+    c.execute(f'''CREATE TABLE IF NOT EXISTS task_rollups (
+                    task_id INTEGER PRIMARY KEY,
+                    {", ".join(f"{col} REAL NOT NULL DEFAULT 0" if col == "hours" else f"{col} INTEGER NOT NULL DEFAULT 0" for col in ROLLUP_COLUMNS)}
+                )''')
+    ancestors = "SELECT ancestor FROM task_tree WHERE descendant = NEW.id"
+    add_new = ", ".join(f"{col} = {col} + {expr.format(r='NEW')}" for col, expr in ROLLUP_COLUMNS.items())
+    dialect.create_trigger(c, "tree_tasks_insert", "AFTER INSERT", "tasks", f'''
+                      INSERT OR IGNORE INTO task_tree (ancestor, descendant, depth)
+                          SELECT NEW.id, NEW.id, 0 UNION ALL SELECT ancestor, NEW.id, depth + 1 FROM task_tree WHERE descendant = NEW.parent_id;
+                      INSERT OR IGNORE INTO task_rollups (task_id) VALUES (NEW.id);
+                      UPDATE task_rollups SET {add_new} WHERE task_id IN ({ancestors});''')
+    delta = ", ".join(f"{col} = {col} + {expr.format(r='NEW')} - {expr.format(r='OLD')}" for col, expr in ROLLUP_COLUMNS.items() if col != "task_count")
+    dialect.create_trigger(c, "tree_tasks_update", "AFTER UPDATE OF status, act_time, rating", "tasks", f'''
+                      UPDATE task_rollups SET {delta} WHERE task_id IN ({ancestors});''',
+                           when="NEW.status IS NOT OLD.status OR NEW.act_time IS NOT OLD.act_time OR NEW.rating IS NOT OLD.rating")
+    dialect.create_trigger(c, "tree_tasks_no_cycle", "BEFORE UPDATE OF parent_id", "tasks",
+                           dialect.abort_if("EXISTS (SELECT 1 FROM task_tree WHERE ancestor = NEW.id AND descendant = NEW.parent_id)",
+                                            "a task cannot be moved under itself or its own subtasks"),
+                           when="NEW.parent_id IS NOT NULL")
+    # Moving a subtree: take its totals off the old ancestors, relink it, then add them to the new ones
+    subtree = {col: f"(SELECT s.{col} FROM task_rollups s WHERE s.task_id = NEW.id)" for col in ROLLUP_COLUMNS}
+    dialect.create_trigger(c, "tree_tasks_move", "AFTER UPDATE OF parent_id", "tasks", f'''
+                      UPDATE task_rollups SET {", ".join(f"{col} = {col} - {q}" for col, q in subtree.items())}
+                          WHERE task_id IN ({ancestors} AND depth > 0);
+                      DELETE FROM task_tree WHERE descendant IN (SELECT descendant FROM task_tree WHERE ancestor = NEW.id)
+                                              AND ancestor IN ({ancestors} AND depth > 0);
+                      INSERT INTO task_tree (ancestor, descendant, depth)
+                          SELECT a.ancestor, d.descendant, a.depth + d.depth + 1 FROM task_tree a, task_tree d
+                          WHERE a.descendant = NEW.parent_id AND d.ancestor = NEW.id;
+                      UPDATE task_rollups SET {", ".join(f"{col} = {col} + {q}" for col, q in subtree.items())}
+                          WHERE task_id IN ({ancestors} AND depth > 0);''',
+                           when="NEW.parent_id IS NOT OLD.parent_id")
+    # Deleting (archiving) a task unlinks it; its ancestors keep its share of their totals
+    dialect.create_trigger(c, "tree_tasks_delete", "AFTER DELETE", "tasks", '''
+                     DELETE FROM task_tree WHERE descendant = OLD.id;
+                     DELETE FROM task_tree WHERE ancestor = OLD.id;
+                     DELETE FROM task_rollups WHERE task_id = OLD.id;''')
+
+    # 14. Per-table write counters, bumped by triggers so every writer is covered
+    c.execute('''CREATE TABLE IF NOT EXISTS table_versions (
+                    table_name TEXT PRIMARY KEY,
+                    version INTEGER NOT NULL DEFAULT 0
+                )''')
+    for table in VERSIONED_TABLES:
+        c.execute("INSERT OR IGNORE INTO table_versions (table_name, version) VALUES (?, 0)", (table,))
+        for op in ("INSERT", "UPDATE", "DELETE"):
+            dialect.create_trigger(c, f"bump_{table}_{op.lower()}", f"AFTER {op}", table,
+                                   f"UPDATE table_versions SET version = version + 1 WHERE table_name = '{table}';")
+
+    # Seed Default Data (with default emails)
+    c.execute("SELECT * FROM users WHERE username = 'admin'")
+    if not c.fetchone():
+        pwd_hash = hashlib.sha256("123".encode()).hexdigest()
+        c.execute("INSERT INTO users (username, password, name, role, avatar, is_admin, email) VALUES (?, ?, ?, ?, ?, ?, ?)", 
+                  ('admin', pwd_hash, 'Big Boss', 'CEO', '🦁', True, 'admin@titan.com'))
+    
+    c.execute("SELECT * FROM users WHERE username = 'alex'")
+    if not c.fetchone():
+        pwd_hash = hashlib.sha256("123".encode()).hexdigest()
+        c.execute("INSERT INTO users (username, password, name, role, avatar, is_admin, email) VALUES (?, ?, ?, ?, ?, ?, ?)", 
+                  ('alex', pwd_hash, 'Alex', 'Account Manager', '👨‍💻', False, 'alex@titan.com'))
+
+    c.execute("SELECT * FROM users WHERE username = 'sarah'")
+    if not c.fetchone():
+        pwd_hash = hashlib.sha256("123".encode()).hexdigest()
+        c.execute("INSERT INTO users (username, password, name, role, avatar, is_admin, email) VALUES (?, ?, ?, ?, ?, ?, ?)", 
+                  ('sarah', pwd_hash, 'Sarah', 'Researcher', '🔎', False, 'sarah@titan.com'))
+
+    c.execute("SELECT * FROM users WHERE username = 'mike'")
+    if not c.fetchone():
+        pwd_hash = hashlib.sha256("123".encode()).hexdigest()
+        c.execute("INSERT INTO users (username, password, name, role, avatar, is_admin, email) VALUES (?, ?, ?, ?, ?, ?, ?)", 
+                  ('mike', pwd_hash, 'Mike', 'Warehouse Labour', '📦', False, 'mike@titan.com'))
+    
+    # Backfill missing emails for older DB versions
+    c.execute("UPDATE users SET email = username || '@titan.com' WHERE email IS NULL")
+    
+    # One-off data migrations, numbered by the schema version (PRAGMA user_version on SQLite)
+    version = dialect.schema_version(c)
+    if version < 1:
+        # tasks.assignee used to hold users.name; key it on users.username (live and archived rows)
+        tables = ["tasks"] + (["archive.tasks"] if dialect.has_archive(c, "tasks") else [])
+        for table in tables:
+            c.execute(f"""UPDATE {table} SET assignee = (SELECT MIN(username) FROM users WHERE users.name = {table}.assignee)
+                          WHERE assignee NOT IN (SELECT username FROM users) AND assignee IN (SELECT name FROM users)""")
+        dialect.set_schema_version(c, 1)
+    if version < 2:
+        # Tasks that predate the hierarchy: every one is its own single-node tree
+        c.execute("INSERT OR IGNORE INTO task_tree (ancestor, descendant, depth) SELECT id, id, 0 FROM tasks")
+        c.execute(f"""INSERT OR IGNORE INTO task_rollups (task_id, {', '.join(ROLLUP_COLUMNS)})
+                      SELECT id, {', '.join(expr.format(r='tasks') for expr in ROLLUP_COLUMNS.values())} FROM tasks""")
+        dialect.set_schema_version(c, 2)
+
+    # Default Companies & Inventory
+    c.execute("INSERT OR IGNORE INTO companies VALUES ('Internal')")
+    c.execute("INSERT OR IGNORE INTO companies VALUES ('Client A')")
+    c.execute("INSERT OR IGNORE INTO inventory VALUES ('SKU-001', 'Wireless Mouse', 500, 'A1')")
+    
+    c.execute("SELECT * FROM sops")
+    if not c.fetchone():
+        c.execute("INSERT INTO sops (title, content, category) VALUES (?, ?, ?)", 
+                 ('How to Pack Fragile Items', '1. Wrap in bubble wrap (2 layers).\n2. Use double-walled box.', 'Logistics'))
+        
+    conn.commit()
+    conn.close()
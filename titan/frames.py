@@ -0,0 +1,64 @@
+"""Typed columnar fetches for st.dataframe.
+
+fetch_frame() goes straight from the cursor's row tuples to one typed pandas
+array per column. No per-row dicts or sqlite3.Row objects are built, and no
+column needs dtype inference. Text columns use the Arrow-backed string dtype
+when pyarrow is installed (Streamlit ships with it), so handing the frame to
+st.dataframe needs no further per-value conversion. Queries should select only
+the columns that are displayed. cached_frame() keeps the result until one of
+its tables changes (titan.changes).
+"""
+import functools
+
+from titan.changes import cached
+from titan.db import get_db
+from titan.replica import current_generation, get_report_db
+
+# Logical column types -> pandas extension dtypes (all nullable)
+DTYPES = {"int": "Int64", "float": "Float64", "bool": "boolean", "text": "string"}
+
+@functools.lru_cache(maxsize=None)
+def _dtype(kind):
+    if kind == "text":
+        try:
+            import pyarrow  # noqa: F401
+            return "string[pyarrow]"
+        except ImportError:
+            pass
+    return DTYPES[kind]
+
+def fetch_frame(conn, sql, params=(), schema=None):
+    """Runs `sql` and returns a DataFrame whose columns carry the dtypes named in `schema` (default text)."""
+    import pandas as pd
+    schema = schema or {}
+    cur = conn.execute(sql, params)
+    names = [d[0] for d in cur.description]
+    rows = cur.fetchall()
+    columns = zip(*rows) if rows else [()] * len(names)
+    data = {}
+    for name, values in zip(names, columns):
+        kind = schema.get(name, "text")
+        if kind == "text":
+            # SQLite columns are loosely typed; a stray number must not break the string array
+            values = [v if v is None or isinstance(v, str) else str(v) for v in values]
+        data[name] = pd.array(list(values), dtype=_dtype(kind))
+    return pd.DataFrame(data)
+
+def read_frame(conn, sql, params=()):
+    """pd.read_sql() for either backend: the rows as a DataFrame, dtypes inferred by pandas."""
+    import pandas as pd
+    cur = conn.execute(sql, params)
+    return pd.DataFrame.from_records(cur.fetchall(), columns=[d[0] for d in cur.description], coerce_float=True)
+
+def query_frame(sql, params=(), schema=None, replica=False):
+    conn = get_report_db() if replica else get_db()
+    try:
+        return fetch_frame(conn, sql, params, schema)
+    finally:
+        conn.close()
+
+def cached_frame(key, tables, sql, params=(), schema=None, replica=False):
+    """query_frame() memoized per data version of `tables` (and per replica copy when replica=True)."""
+    if replica:
+        key = (key, current_generation())
+    return cached(('frame', key, tuple(params)), tables, lambda: query_frame(sql, params, schema, replica))
@@ -0,0 +1,14 @@
+"""Google Calendar helpers."""
+import datetime
+from urllib.parse import quote
+
+def create_gcal_link(title, date_str, desc=""):
+    try:
+        dt = datetime.datetime.strptime(date_str, "%Y-%m-%d")
+        start = dt.replace(hour=9, minute=0).strftime("%Y%m%dT%H%M%S")
+        end = dt.replace(hour=10, minute=0).strftime("%Y%m%dT%H%M%S")
+        base = "https://www.google.com/calendar/render?action=TEMPLATE"
+        link = f"{base}&text={quote(title)}&dates={start}/{end}&details={quote(desc)}"
+        return link
+    except:
+        return "#"
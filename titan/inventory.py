@@ -0,0 +1,56 @@
+"""Companies, inventory and SOP library."""
+import sqlite3
+
+from titan.db import get_db
+from titan.frames import cached_frame, read_frame
+from titan.writer import write_op
+
+def get_companies():
+    conn = get_db()
+    df = read_frame(conn, "SELECT name FROM companies")
+    conn.close()
+    return df['name'].tolist()
+
+@write_op
+def add_company(conn, name):
+    return conn.execute("INSERT OR IGNORE INTO companies VALUES (?)", (name,)).rowcount == 1
+
+def get_inventory():
+    conn = get_db()
+    df = read_frame(conn, "SELECT * FROM inventory")
+    conn.close()
+    return df
+
+def get_inventory_frame():
+    """Inventory for display, typed and cached until inventory changes."""
+    return cached_frame('inventory', ['inventory'], "SELECT sku, name, stock, location FROM inventory ORDER BY sku",
+                        schema={'stock': 'int'})
+
+@write_op
+def add_inventory(conn, sku, name, stock, location):
+    return conn.execute("INSERT OR IGNORE INTO inventory VALUES (?, ?, ?, ?)", (sku, name, stock, location)).rowcount == 1
+
+def get_inventory_page(limit=50, offset=0):
+    conn = get_db()
+    conn.row_factory = sqlite3.Row
+    rows = [dict(r) for r in conn.execute("SELECT * FROM inventory ORDER BY sku LIMIT ? OFFSET ?", (limit, offset)).fetchall()]
+    conn.close()
+    return rows
+
+@write_op
+def upsert_inventory(conn, rows):
+    """Bulk insert-or-update of inventory dicts (sku, name, stock, location) in one transaction."""
+    conn.executemany("""INSERT INTO inventory (sku, name, stock, location) VALUES (?, ?, ?, ?)
+                        ON CONFLICT(sku) DO UPDATE SET name=excluded.name, stock=excluded.stock, location=excluded.location""",
+                     [(r['sku'], r.get('name'), r.get('stock', 0), r.get('location')) for r in rows])
+    return len(rows)
+
+def get_sops():
+    conn = get_db()
+    df = read_frame(conn, "SELECT * FROM sops")
+    conn.close()
+    return df
+
+@write_op
+def add_sop(conn, title, content, category):
+    conn.execute("INSERT INTO sops (title, content, category) VALUES (?, ?, ?)", (title, content, category))
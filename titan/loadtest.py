@@ -0,0 +1,252 @@
+"""Concurrent-session load test for the Streamlit UI.
+
+    python -m titan.loadtest --scale 10k --users 1 5 10 25 --duration 60 --out load.json
+
+Each virtual user is a streamlit.testing AppTest session of titan_app.py in its
+own process. AppTest installs a process-global Streamlit runtime for every
+rerun and tears it down afterwards, so sessions sharing a process would pull it
+out from under each other. With one process per user the load looks like that
+many Titan replicas behind a load balancer on one database: each has its own
+caches, pools and writer thread, and they contend for the database, not a GIL.
+Every user logs in, then cycles through: clock in/out, My Desk, a timer
+start/pause, dashboard filters and creating a shipment. Every script rerun is
+timed. For each user count the report gives reruns per second plus p50/p95/p99
+latency, overall and per action, on a fresh synthetic database (titan.synth).
+Exceptions shown by the app, uncaught exceptions in any thread of a user's
+process (including the script thread) and rerun timeouts all count as errors.
+"""
+import argparse
+import datetime
+import json
+import multiprocessing
+import os
+import queue
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+from titan import config
+from titan.bench import _git_version
+from titan.db import get_pool
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "titan_app.py")
+
+def _percentile(samples, q):
+    return samples[min(len(samples) - 1, int(len(samples) * q))] if samples else None
+
+def summarize(samples):
+    samples = sorted(samples)
+    return {
+        "n": len(samples),
+        "p50_ms": round(_percentile(samples, 0.50), 1) if samples else None,
+        "p95_ms": round(_percentile(samples, 0.95), 1) if samples else None,
+        "p99_ms": round(_percentile(samples, 0.99), 1) if samples else None,
+        "max_ms": round(samples[-1], 1) if samples else None,
+    }
+
+def _find(widgets, label=None, key_prefix=None):
+    for w in widgets:
+        if label is not None and label in (w.label or ""):
+            return w
+        if key_prefix is not None and (w.key or "").startswith(key_prefix):
+            return w
+    return None
+
+class VirtualUser:
+    """One simulated browser session driving titan_app.py through AppTest."""
+
+    def __init__(self, username, timeout):
+        from streamlit.testing.v1 import AppTest
+
+        self.username = username
+        self.at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+        self.samples = {}
+        self.errors = []
+
+    def _rerun(self, action, widget=None):
+        """Reruns the script (through `widget`'s pending change if given) and records the latency."""
+        started = time.perf_counter()
+        (widget or self.at).run()
+        self.samples.setdefault(action, []).append((time.perf_counter() - started) * 1000.0)
+        if self.at.exception:
+            self.errors.append(f"{action}: {self.at.exception[0].message}")
+
+    def _navigate(self, page):
+        nav = _find(self.at.radio, label="Navigation")
+        if nav is not None and nav.value != page:
+            self._rerun(f"nav.{page}", nav.set_value(page))
+
+    def login(self):
+        from titan import sessions
+
+        self._rerun("open")
+        _find(self.at.text_input, label="Email Address or Username").input(self.username)
+        _find(self.at.text_input, label="Password").input("123")
+        self._rerun("login", _find(self.at.button, label="LOGIN").click())
+        # The login form sets ?session=; set it here too in case AppTest does not carry it over
+        self.at.query_params["session"] = sessions.issue(self.username)
+
+    def clock(self):
+        button = _find(self.at.button, label="CLOCK IN") or _find(self.at.button, label="CLOCK OUT")
+        if button is not None:
+            self._rerun("clock", button.click())
+
+    def toggle_timer(self):
+        self._navigate("My Desk")
+        button = _find(self.at.button, key_prefix="pause_") or _find(self.at.button, key_prefix="start_")
+        if button is not None:
+            self._rerun("timer", button.click())
+
+    def filter_dashboard(self):
+        self._navigate("Dashboard")
+        timing = _find(self.at.selectbox, label="Timing")
+        if timing is not None:
+            self._rerun("dashboard.filter", timing.set_value("Overdue" if timing.value != "Overdue" else "All Time"))
+
+    def create_shipment(self):
+        self._navigate("3PL Logistics")
+        sku = _find(self.at.text_input, label="SKU")
+        if sku is not None:
+            sku.input("SKU-000001")
+            self._rerun("shipment.create", _find(self.at.button, label="Submit").click())
+
+    def cycle(self):
+        self.clock()
+        self.toggle_timer()
+        self.filter_dashboard()
+        self.create_shipment()
+
+def _drive(username, timeout, ready, deadline, results):
+    """Body of one virtual user's process: log in, wait for the others, then cycle until the deadline."""
+    crashes = []
+    threading.excepthook = lambda args: crashes.append(
+        f"thread {args.thread.name if args.thread else '?'}: {args.exc_type.__name__}: {args.exc_value}")
+    vu = VirtualUser(username, timeout)
+    try:
+        vu.login()
+    except Exception as e:
+        vu.errors.append(f"login: {e}")
+    try:
+        ready.wait(timeout * 4)
+    except threading.BrokenBarrierError:
+        vu.errors.append("start: not every user logged in in time")
+    while time.time() < deadline.value:
+        try:
+            vu.cycle()
+        except Exception as e:
+            # AppTest raises on a rerun timeout
+            vu.errors.append(f"cycle: {e}")
+    results.put({"samples": vu.samples, "errors": vu.errors + crashes})
+
+def run_level(usernames, duration, timeout):
+    """Runs len(usernames) concurrent users, one process each, for `duration` seconds after they have all logged in."""
+    ctx = multiprocessing.get_context("spawn")
+    ready = ctx.Barrier(len(usernames) + 1)
+    deadline = ctx.Value("d", float("inf"))
+    results = ctx.Queue()
+    procs = [ctx.Process(target=_drive, args=(u, timeout, ready, deadline, results), name=f"vu-{u}", daemon=True)
+             for u in usernames]
+    for p in procs:
+        p.start()
+    try:
+        ready.wait(timeout * 4)
+    except threading.BrokenBarrierError:
+        pass
+    started = time.time()
+    deadline.value = started + duration
+
+    reports, errors = [], []
+    for _ in procs:
+        try:
+            reports.append(results.get(timeout=duration + timeout * 4))
+        except queue.Empty:
+            break
+    elapsed = time.time() - started
+    for p in procs:
+        p.join(timeout)
+        if p.is_alive():
+            p.terminate()
+    if len(reports) < len(procs):
+        errors.append(f"{len(procs) - len(reports)} user process(es) died or hung without reporting")
+
+    by_action, steady = {}, []
+    for report in reports:
+        errors.extend(report["errors"])
+        for action, samples in report["samples"].items():
+            by_action.setdefault(action, []).extend(samples)
+            if action not in ("open", "login"):
+                steady.extend(samples)
+    return {
+        "users": len(usernames),
+        "seconds": round(elapsed, 1),
+        "reruns": len(steady),
+        "reruns_per_second": round(len(steady) / elapsed, 2) if elapsed else None,
+        "latency": summarize(steady),
+        "by_action": {action: summarize(samples) for action, samples in sorted(by_action.items())},
+        "errors": len(errors),
+        "error_samples": errors[:10],
+    }
+
+def run(scale="10k", seed=42, levels=(1, 5, 10), duration=30, timeout=60, db_path=None):
+    from titan.synth import generate
+
+    workdir = None
+    if db_path is None:
+        workdir = tempfile.mkdtemp(prefix="titan-load-")
+        db_path = os.path.join(workdir, f"load-{scale}.db")
+    config.DB_FILE = db_path
+    config.BACKUP_INTERVAL_SECONDS = 0
+    # User processes read their settings from the environment
+    os.environ["TITAN_DB"] = db_path
+    os.environ["TITAN_BACKUP_INTERVAL"] = "0"
+
+    try:
+        sizes = generate(scale, seed) if not os.path.exists(db_path) or os.path.getsize(db_path) == 0 else None
+        results = []
+        for n in levels:
+            result = run_level([f"user{i:05d}" for i in range(n)], duration, timeout)
+            print(f"{n:4d} users  {result['reruns_per_second']} reruns/s  {json.dumps(result['latency'])}", file=sys.stderr)
+            results.append(result)
+    finally:
+        if workdir:
+            get_pool(db_path).close_all()
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        "meta": {
+            "version": _git_version(),
+            "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+            "scale": scale,
+            "seed": seed,
+            "duration_seconds": duration,
+            "table_sizes": sizes,
+        },
+        "levels": results,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the Titan Streamlit app with concurrent AppTest sessions, one process each.")
+    parser.add_argument("--scale", default="10k", help="synthetic data scale (see titan.synth)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--users", type=int, nargs="+", default=[1, 5, 10], help="concurrent user counts to test")
+    parser.add_argument("--duration", type=float, default=30, help="seconds of steady load per user count")
+    parser.add_argument("--timeout", type=float, default=60, help="per-rerun timeout in seconds")
+    parser.add_argument("--db", help="reuse (or create) this database instead of a temporary one")
+    parser.add_argument("--out", help="write results JSON here")
+    args = parser.parse_args(argv)
+
+    from titan.synth import parse_scale, table_sizes
+    if table_sizes(parse_scale(args.scale))["users"] < max(args.users):
+        parser.error(f"scale {args.scale} has fewer than {max(args.users)} synthetic users")
+
+    report = run(args.scale, args.seed, args.users, args.duration, args.timeout, args.db)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
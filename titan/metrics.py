@@ -0,0 +1,207 @@
+"""Operational metrics in Prometheus text format.
+
+Counters and histograms keep one private shard per thread, so the hot path
+(inc / observe) is a plain dict update with no locking. Shards are merged only
+when the metrics are rendered; shards of finished threads are folded into a
+base value at that point, so per-rerun threads don't accumulate.
+
+Exposed either by a small HTTP endpoint (TITAN_METRICS_PORT) or by periodically
+writing a textfile for node_exporter's textfile collector (TITAN_METRICS_FILE).
+"""
+import bisect
+import http.server
+import logging
+import os
+import threading
+
+from titan import config
+
+log = logging.getLogger("titan.metrics")
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+REGISTRY = []
+_exporters_lock = threading.Lock()
+_exporters = {}
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names, values, extra=()):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)] + [f'{n}="{v}"' for n, v in extra]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _fmt(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards = []
+        self._base = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _shard(self):
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = {}
+            with self._lock:
+                self._shards.append((threading.current_thread(), shard))
+        return shard
+
+    def _key(self, labels):
+        return tuple(labels[n] for n in self.labelnames)
+
+    def _merge(self, into, key, values):
+        raise NotImplementedError
+
+    def collect(self):
+        """Returns {label values: merged value}, retiring shards of finished threads."""
+        with self._lock:
+            live = []
+            for thread, shard in self._shards:
+                if thread.is_alive():
+                    live.append((thread, shard))
+                else:
+                    for key, values in list(shard.items()):
+                        self._merge(self._base, key, values)
+            self._shards = live
+            merged = {}
+            for key, values in self._base.items():
+                self._merge(merged, key, values)
+            for _, shard in live:
+                for key, values in list(shard.items()):
+                    self._merge(merged, key, values)
+        return merged
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._render_samples(self.collect()))
+        return lines
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        shard = self._shard()
+        key = self._key(labels)
+        shard[key] = shard.get(key, 0) + amount
+
+    def _merge(self, into, key, value):
+        into[key] = into.get(key, 0) + value
+
+    def _render_samples(self, merged):
+        for key, value in sorted(merged.items()):
+            yield f"{self.name}{_labels(self.labelnames, key)} {_fmt(value)}"
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        shard = self._shard()
+        key = self._key(labels)
+        counts = shard.get(key)
+        if counts is None:
+            # One slot per bucket, one for +Inf, then the running sum.
+            counts = shard[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    def _merge(self, into, key, values):
+        current = into.get(key)
+        into[key] = list(values) if current is None else [a + b for a, b in zip(current, values)]
+
+    def _render_samples(self, merged):
+        for key, values in sorted(merged.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), values[:-1]):
+                cumulative += count
+                yield f"{self.name}_bucket{_labels(self.labelnames, key, [('le', _fmt(bound))])} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, key)} {_fmt(values[-1])}"
+            yield f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}"
+
+# --- TITAN METRICS ---
+LOGINS = Counter("titan_logins_total", "Login attempts by result.", ["result"])
+CLOCK_EVENTS = Counter("titan_clock_events_total", "Time clock events written.", ["event"])
+TIMER_ACTIONS = Counter("titan_timer_actions_total", "Task timer start/pause/stop actions.", ["action"])
+TASK_WRITES = Counter("titan_task_writes_total", "Task rows written by operation.", ["op"])
+SHIPMENT_WRITES = Counter("titan_shipment_writes_total", "Shipment rows written by operation.", ["op"])
+DB_QUERY_SECONDS = Histogram("titan_db_query_seconds", "SQLite statement latency.", ["kind"])
+DB_BUSY = Counter("titan_db_busy_total", "Statements that failed or were retried because SQLite was busy/locked.", ["outcome"])
+WRITE_BATCH_OPS = Histogram("titan_write_batch_ops", "Write operations group-committed per writer transaction.",
+                            buckets=(1, 2, 4, 8, 16, 32, 64, 128))
+WRITES_REJECTED = Counter("titan_writes_rejected_total", "Writes refused because the write queue stayed full.")
+BACKUPS = Counter("titan_backups_total", "Database snapshots by outcome.", ["outcome"])
+BACKUP_SECONDS = Histogram("titan_backup_seconds", "Time to take and verify a snapshot.",
+                           buckets=(1.0, 5.0, 15.0, 60.0, 300.0, 900.0, 3600.0))
+NOTIFICATIONS = Counter("titan_notifications_total", "Outbox events by delivery outcome.", ["outcome"])
+CACHE_REQUESTS = Counter("titan_cache_requests_total", "Lookups in Titan's in-process caches.", ["cache", "result"])
+GEMINI_SECONDS = Histogram("titan_gemini_request_seconds", "Gemini request latency.", ["outcome"],
+                           buckets=(0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 16.0, 32.0))
+
+def render():
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+# --- EXPORTERS ---
+class _MetricsHandler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_http_server(port, host="127.0.0.1"):
+    server = http.server.ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="titan-metrics-http", daemon=True).start()
+    return server
+
+def write_textfile(path):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        f.write(render())
+    os.replace(tmp, path)
+
+def start_textfile_writer(path, interval):
+    stop = threading.Event()
+
+    def loop():
+        while not stop.wait(interval):
+            try:
+                write_textfile(path)
+            except OSError:
+                log.exception("could not write metrics to %s", path)
+
+    threading.Thread(target=loop, name="titan-metrics-file", daemon=True).start()
+    return stop
+
+def start_exporters():
+    """Starts whichever exporters are configured, once per process."""
+    with _exporters_lock:
+        if config.METRICS_PORT and "http" not in _exporters:
+            _exporters["http"] = start_http_server(config.METRICS_PORT, config.METRICS_HOST)
+        if config.METRICS_FILE and "file" not in _exporters:
+            _exporters["file"] = start_textfile_writer(config.METRICS_FILE, config.METRICS_INTERVAL_SECONDS)
+        return dict(_exporters)
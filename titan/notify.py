@@ -0,0 +1,297 @@
+"""Notification outbox and the SMTP digest dispatcher that drains it.
+
+Task writes (titan.tasks, titan.comments) queue assignment and comment events
+in the notifications table, inside the transaction that makes the change. The
+maintenance sweep queues due-soon and overdue reminders. Nothing is sent in
+the request path. A background dispatcher claims pending events and merges
+them into one digest per recipient. It sends the digests over a single SMTP
+connection, at most config.NOTIFY_MAX_PER_MINUTE per minute. A failed digest is
+retried with exponential backoff and dropped after config.NOTIFY_MAX_ATTEMPTS.
+
+Without config.NOTIFY_SMTP_HOST the outbox still fills but nothing is sent.
+To try it locally, run the bundled SMTP stand-in and point Titan at it:
+
+    python -m titan.notify sink --port 1025
+    TITAN_SMTP_HOST=localhost TITAN_SMTP_PORT=1025 python -m titan.notify dispatch
+"""
+import argparse
+import datetime
+import logging
+import smtplib
+import socketserver
+import threading
+import time
+from email.message import EmailMessage
+
+from titan import config
+from titan import metrics
+from titan.writer import write_op
+
+log = logging.getLogger("titan.notify")
+
+TS_FORMAT = "%Y-%m-%d %H:%M:%S"
+CLAIM_SECONDS = 300
+MAX_BACKOFF_SECONDS = 3600
+KIND_TITLES = {"assigned": "Assigned to you", "comment": "New comments", "due_soon": "Due soon", "overdue": "Overdue"}
+
+_dispatcher_lock = threading.Lock()
+_dispatcher_stop = None
+_bucket = None
+
+def _now(offset_seconds=0):
+    return (datetime.datetime.now() + datetime.timedelta(seconds=offset_seconds)).strftime(TS_FORMAT)
+
+# --- QUEUEING (called on the writer's connection, inside the caller's transaction) ---
+def enqueue(conn, recipient, kind, task_id, message, dedupe_key=None):
+    """Queues one event for `recipient` (a username); a repeated dedupe_key is ignored."""
+    if recipient:
+        now = _now()
+        conn.execute("""INSERT OR IGNORE INTO notifications (recipient, kind, task_id, message, dedupe_key, created_at, next_attempt_at)
+                        VALUES (?, ?, ?, ?, ?, ?, ?)""", (recipient, kind, task_id, message, dedupe_key, now, now))
+
+def enqueue_select(conn, select_sql, params=()):
+    """Queues every (recipient, kind, task_id, message, dedupe_key) row of `select_sql`; returns how many were new.
+
+    The first column must be named recipient.
+    """
+    now = _now()
+    return conn.execute(f"""INSERT OR IGNORE INTO notifications (recipient, kind, task_id, message, dedupe_key, created_at, next_attempt_at)
+                            SELECT q.*, ?, ? FROM ({select_sql}) q WHERE q.recipient IS NOT NULL AND q.recipient != ''""",
+                        (now, now, *params)).rowcount
+
+@write_op
+def queue_due_reminders(conn, due_soon_days=None):
+    """Queues one due-soon and one overdue reminder per open task and planned date (re-planning re-arms them).
+
+    Only tasks that went overdue within the last week are reminded, so old backlogs do not flood inboxes.
+    """
+    due_soon_days = config.NOTIFY_DUE_SOON_DAYS if due_soon_days is None else due_soon_days
+    today = datetime.date.today()
+    queued = enqueue_select(conn, """SELECT assignee AS recipient, 'due_soon', id, title || ' (due ' || planned_date || ')',
+                                            'due_soon:' || id || ':' || planned_date
+                                     FROM tasks WHERE planned_date BETWEEN ? AND ? AND status != 'Done'""",
+                            (str(today), str(today + datetime.timedelta(days=due_soon_days))))
+    queued += enqueue_select(conn, """SELECT assignee AS recipient, 'overdue', id, title || ' (was due ' || planned_date || ')',
+                                             'overdue:' || id || ':' || planned_date
+                                      FROM tasks WHERE planned_date >= ? AND planned_date < ? AND status != 'Done'""",
+                             (str(today - datetime.timedelta(days=7)), str(today)))
+    return queued
+
+@write_op
+def purge_notifications(conn, keep_days=None):
+    """Deletes sent and abandoned events older than keep_days."""
+    keep_days = config.NOTIFY_KEEP_DAYS if keep_days is None else keep_days
+    return conn.execute("DELETE FROM notifications WHERE status != 'pending' AND created_at < ?",
+                        (_now(-keep_days * 86400),)).rowcount
+
+# --- DISPATCH ---
+class RateLimiter:
+    """Token bucket: allows `per_minute` sends per minute, with bursts up to one minute's worth."""
+
+    def __init__(self, per_minute):
+        self.per_minute = per_minute
+        self.tokens = float(per_minute)
+        self.stamp = time.monotonic()
+
+    def take(self):
+        now = time.monotonic()
+        self.tokens = min(self.per_minute, self.tokens + (now - self.stamp) * self.per_minute / 60.0)
+        self.stamp = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+@write_op
+def _claim(conn, limit):
+    """Leases up to `limit` due events (with the recipient's email and name) so no other process sends them."""
+    now = _now()
+    rows = conn.execute("""SELECT n.id, n.recipient, n.kind, n.message, n.attempts, u.email, u.name
+                           FROM notifications n LEFT JOIN users u ON u.username = n.recipient
+                           WHERE n.status = 'pending' AND n.next_attempt_at <= ? AND (n.claimed_until IS NULL OR n.claimed_until < ?)
+                           ORDER BY n.id LIMIT ?""", (now, now, limit)).fetchall()
+    conn.executemany("UPDATE notifications SET claimed_until=? WHERE id=?", [(_now(CLAIM_SECONDS), r[0]) for r in rows])
+    return rows
+
+@write_op
+def _settle(conn, sent, failed, deferred):
+    """Records a dispatch round: sent ids, failed [(row, error)] and deferred (rate-limited) ids."""
+    now = _now()
+    conn.executemany("UPDATE notifications SET status='sent', sent_at=?, claimed_until=NULL WHERE id=?", [(now, i) for i in sent])
+    conn.executemany("UPDATE notifications SET claimed_until=NULL WHERE id=?", [(i,) for i in deferred])
+    for row, error in failed:
+        attempts = row[4] + 1
+        if attempts >= config.NOTIFY_MAX_ATTEMPTS:
+            conn.execute("UPDATE notifications SET status='failed', attempts=?, last_error=?, claimed_until=NULL WHERE id=?",
+                         (attempts, error, row[0]))
+            metrics.NOTIFICATIONS.inc(outcome="failed")
+        else:
+            conn.execute("UPDATE notifications SET attempts=?, last_error=?, next_attempt_at=?, claimed_until=NULL WHERE id=?",
+                         (attempts, error, _now(min(MAX_BACKOFF_SECONDS, 30 * 2 ** attempts)), row[0]))
+            metrics.NOTIFICATIONS.inc(outcome="retry")
+    metrics.NOTIFICATIONS.inc(len(sent), outcome="sent")
+
+def build_digest(email, name, rows):
+    """One message summarising all of a recipient's events, grouped by kind."""
+    msg = EmailMessage()
+    msg["From"] = config.NOTIFY_FROM
+    msg["To"] = email
+    msg["Subject"] = f"Titan: {len(rows)} update{'s' if len(rows) != 1 else ''}"
+    lines = [f"Hi {name or 'there'},", ""]
+    for kind, title in KIND_TITLES.items():
+        messages = [r[3] for r in rows if r[2] == kind]
+        if messages:
+            lines += [f"{title}:"] + [f"  - {m}" for m in messages] + [""]
+    msg.set_content("\n".join(lines))
+    return msg
+
+def _smtp():
+    smtp = smtplib.SMTP(config.NOTIFY_SMTP_HOST, config.NOTIFY_SMTP_PORT, timeout=30)
+    if config.NOTIFY_SMTP_STARTTLS:
+        smtp.starttls()
+    if config.NOTIFY_SMTP_USER:
+        smtp.login(config.NOTIFY_SMTP_USER, config.NOTIFY_SMTP_PASSWORD)
+    return smtp
+
+def dispatch_once(limit=None):
+    """Sends one round of digests; returns counts, or None when no SMTP host is configured."""
+    global _bucket
+    if not config.NOTIFY_SMTP_HOST:
+        return None
+    if _bucket is None or _bucket.per_minute != config.NOTIFY_MAX_PER_MINUTE:
+        _bucket = RateLimiter(config.NOTIFY_MAX_PER_MINUTE)
+    rows = _claim(config.NOTIFY_BATCH_SIZE if limit is None else limit)
+    by_recipient = {}
+    for r in rows:
+        by_recipient.setdefault(r[1], []).append(r)
+
+    sent, failed, deferred, digests = [], [], [], 0
+    smtp, down = None, None
+    try:
+        for recipient, batch in by_recipient.items():
+            email, name = batch[0][5], batch[0][6]
+            if not email or down:
+                failed += [(r, down or "no email address") for r in batch]
+                continue
+            if not _bucket.take():
+                deferred += [r[0] for r in batch]
+                continue
+            try:
+                smtp = smtp or _smtp()
+                smtp.send_message(build_digest(email, name, batch))
+            except (smtplib.SMTPException, OSError) as e:
+                error = str(e) or type(e).__name__
+                failed += [(r, error) for r in batch]
+                if isinstance(e, (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError)) or not isinstance(e, smtplib.SMTPException):
+                    # The server is gone: retry everyone else later instead of reconnecting per recipient
+                    smtp, down = None, error
+                continue
+            sent += [r[0] for r in batch]
+            digests += 1
+    finally:
+        if smtp is not None:
+            try:
+                smtp.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+        _settle(sent, failed, deferred)
+    return {'digests_sent': digests, 'events_sent': len(sent), 'failed': len(failed), 'deferred': len(deferred)}
+
+def start_dispatcher(interval=None):
+    """Starts the dispatcher loop once per process (no-op without an SMTP host)."""
+    global _dispatcher_stop
+    if not config.NOTIFY_SMTP_HOST:
+        return None
+    interval = config.NOTIFY_INTERVAL_SECONDS if interval is None else interval
+    with _dispatcher_lock:
+        if _dispatcher_stop is not None:
+            return _dispatcher_stop
+        stop = _dispatcher_stop = threading.Event()
+
+    def loop():
+        while not stop.wait(interval):
+            try:
+                dispatch_once()
+            except Exception:
+                log.exception("notification dispatch failed")
+
+    threading.Thread(target=loop, name="titan-notify", daemon=True).start()
+    return stop
+
+def stop_dispatcher():
+    global _dispatcher_stop
+    with _dispatcher_lock:
+        if _dispatcher_stop is not None:
+            _dispatcher_stop.set()
+            _dispatcher_stop = None
+
+# --- LOCAL SMTP STAND-IN ---
+class _SinkHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        self.reply("220 titan-sink")
+        sender, recipients = None, []
+        for raw in self.rfile:
+            command = raw.decode("utf-8", "replace").strip()
+            verb = command[:4].upper()
+            if verb in ("HELO", "EHLO"):
+                self.reply("250 titan-sink")
+            elif verb == "MAIL":
+                sender, recipients = command[10:].strip("<> "), []
+                self.reply("250 OK")
+            elif verb == "RCPT":
+                recipients.append(command[8:].strip("<> "))
+                self.reply("250 OK")
+            elif verb == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                lines = []
+                for data in self.rfile:
+                    data = data.decode("utf-8", "replace").rstrip("\r\n")
+                    if data == ".":
+                        break
+                    lines.append(data[1:] if data.startswith("..") else data)
+                self.server.messages.append((sender, recipients, "\n".join(lines)))
+                if self.server.echo:
+                    print(f"--- {sender} -> {', '.join(recipients)}\n" + "\n".join(lines), flush=True)
+                self.reply("250 OK")
+            elif verb in ("RSET", "NOOP"):
+                self.reply("250 OK")
+            elif verb == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+class SinkServer(socketserver.ThreadingTCPServer):
+    """Minimal SMTP server that accepts everything and keeps (sender, recipients, message) in .messages."""
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host="127.0.0.1", port=1025, echo=False):
+        super().__init__((host, port), _SinkHandler)
+        self.messages = []
+        self.echo = echo
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Titan notification outbox.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sink = sub.add_parser("sink", help="run a local SMTP stand-in that prints what it receives")
+    sink.add_argument("--host", default="127.0.0.1")
+    sink.add_argument("--port", type=int, default=1025)
+    sub.add_parser("dispatch", help="queue due reminders and send one round of digests now")
+    args = parser.parse_args(argv)
+
+    if args.command == "sink":
+        with SinkServer(args.host, args.port, echo=True) as server:
+            print(f"SMTP sink listening on {args.host}:{args.port}")
+            server.serve_forever()
+    else:
+        from titan.db import init_db
+        init_db()
+        print(f"{queue_due_reminders()} reminders queued")
+        print(dispatch_once() or "TITAN_SMTP_HOST is not set; nothing sent")
+
+if __name__ == "__main__":
+    main()
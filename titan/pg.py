@@ -0,0 +1,388 @@
+"""PostgreSQL backend: pooled psycopg 3 connections behind the sqlite3 API the app uses.
+
+Set TITAN_DB to a ``postgresql://`` URL instead of a file path and
+get_db(), @write_op, init_db() and every module on top of them run against
+PostgreSQL unchanged. psycopg (``pip install "psycopg[binary,pool]"``) is only
+imported once such a URL is configured.
+
+Connections come from a psycopg_pool.ConnectionPool holding
+config.DB_POOL_SIZE idle connections and growing to config.PG_POOL_MAX. Every
+statement is prepared server-side the first time a connection runs it
+(prepare_threshold=0), keeping up to config.PG_PREPARED_MAX plans per
+connection, so the hot queries are parsed and planned once per connection. As
+with the sqlite3 module, reads run in autocommit and a transaction is opened
+before the first INSERT/UPDATE/DELETE; the writer thread opens its own with BEGIN.
+
+Statements stay in the SQLite dialect. translate() rewrites the idioms this
+codebase uses:
+
+- ``?`` placeholders -> ``%s``
+- ``x IN (SELECT value FROM json_each(?))`` -> ``x = ANY(%s)``, the JSON list decoded into an array
+- ``INSERT OR IGNORE`` -> ``INSERT ... ON CONFLICT DO NOTHING``
+- ``a IS b`` / ``a IS NOT b`` -> ``IS [NOT] DISTINCT FROM``
+- scalar ``MAX(a, b)`` / ``MIN(a, b)`` -> ``GREATEST`` / ``LEAST``, ``instr`` -> ``strpos``
+- ``main.`` prefixes dropped, ``BEGIN IMMEDIATE`` -> ``BEGIN``
+- DDL: rowid keys -> identity columns, REAL -> DOUBLE PRECISION, BOOLEAN -> INTEGER,
+  BLOB -> TEXT, WITHOUT ROWID dropped, ADD COLUMN -> ADD COLUMN IF NOT EXISTS
+
+Python bools are bound as 0/1, as sqlite3 stores them. cursor.lastrowid comes
+from a RETURNING clause added to single-row INSERTs into tables with an identity
+key. Database errors are re-raised as titan.db.IntegrityError /
+OperationalError (the sqlite3 classes), so callers catch one set of exceptions
+for either backend. PostgreSQL aborts the rest of a transaction after a failed
+statement, so write ops must let database errors propagate (the writer rolls
+back to the op's savepoint) instead of catching them and carrying on; use
+INSERT OR IGNORE and rowcount for expected conflicts. There is no stand-in for
+SQLite's rowid (ctid moves on every UPDATE), so queries order by real columns.
+"""
+import functools
+import json
+import re
+import time
+
+import psycopg
+import psycopg_pool
+
+from titan import config
+from titan import db
+
+_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_JSON_IN = re.compile(r"([\w.]+)\s+IN\s*\(\s*SELECT\s+value\s+FROM\s+json_each\(\s*\?\s*\)\s*\)", re.IGNORECASE)
+_OR_IGNORE = re.compile(r"\bINSERT\s+OR\s+IGNORE\s+INTO\b", re.IGNORECASE)
+_IS = re.compile(r"\bIS\s+(NOT\s+)?(?!NULL\b|NOT\b|DISTINCT\b|TRUE\b|FALSE\b)", re.IGNORECASE)
+_MINMAX = re.compile(r"\b(MAX|MIN)\s*\(", re.IGNORECASE)
+_INSERT_VALUES = re.compile(r"\s*INSERT\s+(?:OR\s+\w+\s+)?INTO\s+(\w+)\s*\([^)]*\)\s*VALUES\b", re.IGNORECASE)
+_JSON_SLOT = "\x00"
+_DML = ("INSERT", "UPDATE", "DELETE", "REPLACE")
+
+# (pattern, replacement) applied outside string literals
+_REWRITES = [
+    (re.compile(r"\bBEGIN\s+IMMEDIATE\b", re.IGNORECASE), "BEGIN"),
+    (re.compile(r"\bmain\.(?=\w)", re.IGNORECASE), ""),
+    (re.compile(r"\binstr\s*\(", re.IGNORECASE), "strpos("),
+]
+_DDL_REWRITES = [
+    (re.compile(r"\b(?:INTEGER PRIMARY KEY AUTOINCREMENT|(?<=\bid )INTEGER PRIMARY KEY)\b", re.IGNORECASE),
+     "BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY"),
+    (re.compile(r"\bREAL\b", re.IGNORECASE), "DOUBLE PRECISION"),
+    (re.compile(r"\bBOOLEAN\b", re.IGNORECASE), "INTEGER"),
+    (re.compile(r"\bBLOB\b", re.IGNORECASE), "TEXT"),
+    (re.compile(r"\)\s*WITHOUT\s+ROWID\b", re.IGNORECASE), ")"),
+    (re.compile(r"\bADD\s+COLUMN\s+(?!IF\b)", re.IGNORECASE), "ADD COLUMN IF NOT EXISTS "),
+]
+
+def _split_literals(sql):
+    """[(is_literal, text)] covering sql."""
+    parts, pos = [], 0
+    for m in _LITERAL.finditer(sql):
+        parts.append((False, sql[pos:m.start()]))
+        parts.append((True, m.group()))
+        pos = m.end()
+    parts.append((False, sql[pos:]))
+    return parts
+
+def _outside_literals(sql, fn):
+    return "".join(text if literal else fn(text) for literal, text in _split_literals(sql))
+
+def _scalar_minmax(sql):
+    """MAX(a, b) -> GREATEST(a, b) (and MIN -> LEAST); one-argument aggregates are left alone."""
+    for m in reversed(list(_MINMAX.finditer(sql))):
+        depth, i, scalar = 0, m.end() - 1, False
+        while i < len(sql):
+            ch = sql[i]
+            if ch == "'":
+                i = sql.index("'", i + 1)
+                while sql.startswith("''", i):
+                    i = sql.index("'", i + 2)
+            elif ch == "(":
+                depth += 1
+            elif ch == ")":
+                depth -= 1
+                if depth == 0:
+                    break
+            elif ch == "," and depth == 1:
+                scalar = True
+            i += 1
+        if scalar:
+            name = "GREATEST" if m.group(1).upper() == "MAX" else "LEAST"
+            sql = sql[:m.start()] + name + "(" + sql[m.end():]
+    return sql
+
+def _rewrite_statement(stmt):
+    if _OR_IGNORE.search(stmt):
+        stmt = _OR_IGNORE.sub("INSERT INTO", stmt).rstrip() + " ON CONFLICT DO NOTHING"
+    head = stmt.lstrip()[:12].upper()
+    rules = (_DDL_REWRITES if head.startswith(("CREATE TABLE", "ALTER TABLE")) else []) + _REWRITES
+
+    def rewrite(text):
+        text = _IS.sub(lambda m: "IS DISTINCT FROM " if m.group(1) else "IS NOT DISTINCT FROM ", text)
+        for pattern, repl in rules:
+            text = pattern.sub(repl, text)
+        return text
+    return _scalar_minmax(_outside_literals(stmt, rewrite))
+
+def rewrite(sql):
+    """The SQLite-dialect statement(s) in PostgreSQL syntax, placeholders untouched."""
+    statements, current = [], []
+    for literal, text in _split_literals(sql):
+        if literal:
+            current.append(text)
+            continue
+        pieces = text.split(";")
+        for piece in pieces[:-1]:
+            current.append(piece)
+            statements.append("".join(current))
+            current = []
+        current.append(pieces[-1])
+    statements.append("".join(current))
+    return ";".join(_rewrite_statement(s) if s.strip() else s for s in statements)
+
+@functools.lru_cache(maxsize=1024)
+def translate(sql):
+    """Returns (postgres sql, indexes of the parameters that are JSON lists to pass as arrays)."""
+    sql = rewrite(_JSON_IN.sub(lambda m: f"{m.group(1)} = ANY({_JSON_SLOT})", sql))
+    out, json_params, n = [], [], 0
+    for literal, text in _split_literals(sql):
+        text = text.replace("%", "%%")
+        if not literal:
+            pieces = re.split(f"(\\?|{_JSON_SLOT})", text)
+            for i in range(1, len(pieces), 2):
+                if pieces[i] == _JSON_SLOT:
+                    json_params.append(n)
+                pieces[i] = "%s"
+                n += 1
+            text = "".join(pieces)
+        out.append(text)
+    return "".join(out), tuple(json_params)
+
+def _bind(params, json_params):
+    params = [int(p) if isinstance(p, bool) else p for p in params]
+    for i in json_params:
+        params[i] = json.loads(params[i])
+    return params
+
+def _reraise(e):
+    if isinstance(e, psycopg.IntegrityError):
+        raise db.IntegrityError(str(e)) from e
+    raise db.OperationalError(str(e)) from e
+
+class Row(tuple):
+    """sqlite3.Row stand-in: a tuple that can also be indexed by column name."""
+    __slots__ = ()
+    _index = {}
+
+    def __getitem__(self, key):
+        return tuple.__getitem__(self, self._index[key] if isinstance(key, str) else key)
+
+    def keys(self):
+        return list(self._index)
+
+@functools.lru_cache(maxsize=512)
+def _row_class(names):
+    return type("Row", (Row,), {"__slots__": (), "_index": {name: i for i, name in enumerate(names)}})
+
+def _row_factory(cursor):
+    return _row_class(tuple(c.name for c in cursor.description or ()))
+
+_identity_columns = {}
+
+class Cursor:
+    """psycopg cursor with the sqlite3.Cursor surface and titan.db's query instrumentation."""
+
+    def __init__(self, conn):
+        self.connection = conn
+        self._cur = conn.raw.cursor()
+        self._entry = self._key = None
+        self._results = False
+        self.lastrowid = None
+        self.arraysize = 1
+
+    def _run(self, sql, run):
+        self.connection._begin_for(sql)
+        if self.connection.row_factory is not None:
+            self._cur.row_factory = _row_factory
+        t0 = time.perf_counter()
+        try:
+            return run()
+        except psycopg.Error as e:
+            _reraise(e)
+        finally:
+            self._key, self._entry = db.record_query(sql, t0, self._cur.rowcount)
+
+    def execute(self, sql, params=()):
+        text, json_params = translate(sql)
+        # Queries are prepared; DDL and transaction control are not worth a slot
+        prepare = sql.lstrip()[:6].upper() in ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH")
+        # lastrowid: single-row INSERTs into a table with an identity key hand the new id back
+        m = _INSERT_VALUES.match(sql)
+        key = self.connection._identity_column(m.group(1)) if m else None
+        if key:
+            text = f"{text} RETURNING {key}"
+        self._run(sql, lambda: self._cur.execute(text, _bind(params, json_params), prepare=prepare))
+        if key:
+            row = self._cur.fetchone()
+            if row is not None:
+                self.lastrowid = row[0]
+        self._results = self._cur.description is not None and not key
+        return self
+
+    def executemany(self, sql, seq_of_params):
+        text, json_params = translate(sql)
+        self._run(sql, lambda: self._cur.executemany(text, [_bind(p, json_params) for p in seq_of_params]))
+        self._results = False
+        return self
+
+    @property
+    def rowcount(self):
+        return self._cur.rowcount
+
+    @property
+    def description(self):
+        return self._cur.description if self._results else None
+
+    def _fetch(self, rows):
+        db.count_rows(self._key, self._entry, len(rows))
+        return rows
+
+    def fetchone(self):
+        if not self._results:
+            return None
+        row = self._cur.fetchone()
+        if row is not None:
+            db.count_rows(self._key, self._entry, 1)
+        return row
+
+    def fetchmany(self, size=None):
+        return self._fetch(self._cur.fetchmany(self.arraysize if size is None else size)) if self._results else []
+
+    def fetchall(self):
+        return self._fetch(self._cur.fetchall()) if self._results else []
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+    def close(self):
+        self._cur.close()
+
+class Connection:
+    """A psycopg connection with the sqlite3.Connection surface; close() hands it back to its pool."""
+    dialect = None
+
+    def __init__(self, raw, pool=None, isolation_level=""):
+        self.raw = raw
+        self.pool = pool
+        self.isolation_level = isolation_level
+        self.row_factory = None
+
+    @property
+    def in_transaction(self):
+        return self.raw.info.transaction_status != psycopg.pq.TransactionStatus.IDLE
+
+    def _identity_column(self, table):
+        """The table's identity (auto-increment) column, looked up once per database and table."""
+        key = (self.raw.info.host, self.raw.info.port, self.raw.info.dbname, table)
+        if key not in _identity_columns:
+            row = self.raw.execute("""SELECT column_name FROM information_schema.columns
+                                      WHERE table_schema = current_schema() AND table_name = %s AND is_identity = 'YES'""",
+                                   (table,)).fetchone()
+            _identity_columns[key] = row[0] if row else None
+        return _identity_columns[key]
+
+    def _begin_for(self, sql):
+        # sqlite3's implicit transactions: opened before the first write, never for reads
+        if self.isolation_level is not None and not self.in_transaction and sql.lstrip()[:7].upper().startswith(_DML):
+            self.raw.execute("BEGIN")
+
+    def cursor(self):
+        return Cursor(self)
+
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        return self.cursor().executemany(sql, seq_of_params)
+
+    def executescript(self, sql):
+        """Runs raw PostgreSQL (no translation or parameters), e.g. function bodies."""
+        try:
+            self.raw.execute(sql)
+        except psycopg.Error as e:
+            _reraise(e)
+
+    def commit(self):
+        try:
+            self.raw.commit()
+        except psycopg.Error as e:
+            _reraise(e)
+        for hook in db.COMMIT_HOOKS:
+            hook()
+
+    def rollback(self):
+        self.raw.rollback()
+
+    def close(self):
+        if self.pool is None or not self.pool.release(self):
+            self.raw.close()
+
+def _configure(raw):
+    raw.prepare_threshold = 0
+    raw.prepared_max = config.PG_PREPARED_MAX
+
+def connect(url, isolation_level=""):
+    """One unpooled connection (the writer thread's and change detection's)."""
+    raw = psycopg.connect(url, autocommit=True)
+    _configure(raw)
+    return Connection(raw, isolation_level=isolation_level)
+
+class ConnectionPool:
+    def __init__(self, url, size, max_size):
+        self.url = url
+        self._pool = psycopg_pool.ConnectionPool(url, min_size=min(size, max_size), max_size=max_size,
+                                                 kwargs={"autocommit": True}, configure=_configure,
+                                                 name="titan", open=True)
+
+    def acquire(self):
+        return Connection(self._pool.getconn(), self)
+
+    def release(self, conn):
+        """Returns True; the pool rolls back anything left open and keeps or discards the connection."""
+        if conn.in_transaction:
+            conn.rollback()
+        self._pool.putconn(conn.raw)
+        return True
+
+    def close_all(self):
+        self._pool.close()
+
+class PostgresDialect(db.SQLiteDialect):
+    """Schema hooks of init_db() for PostgreSQL."""
+    name = "postgres"
+
+    def prepare(self, c):
+        c.execute("CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)")
+        c.execute("INSERT INTO schema_version (version) SELECT 0 WHERE NOT EXISTS (SELECT 1 FROM schema_version)")
+        c.connection.commit()
+
+    def schema_version(self, c):
+        return c.execute("SELECT version FROM schema_version").fetchone()[0]
+
+    def set_schema_version(self, c, version):
+        c.execute("UPDATE schema_version SET version = ?", (version,))
+
+    def has_archive(self, c, table):
+        return False
+
+    def create_trigger(self, c, name, event, table, body, when=None):
+        # One trigger function per trigger; a BEFORE trigger must hand the row back to let the write go ahead
+        result = "NEW" if event.upper().startswith("BEFORE") else "NULL"
+        c.connection.executescript(f"""CREATE OR REPLACE FUNCTION {name}() RETURNS trigger LANGUAGE plpgsql AS $$
+                                       BEGIN {rewrite(body)} RETURN {result}; END $$""")
+        # DROP + CREATE rather than CREATE OR REPLACE TRIGGER, which needs PostgreSQL 14
+        c.connection.executescript(f"DROP TRIGGER IF EXISTS {name} ON {table}")
+        c.connection.executescript(f"""CREATE TRIGGER {name} {event} ON {table} FOR EACH ROW
+                                       {f"WHEN ({rewrite(when)})" if when else ""} EXECUTE FUNCTION {name}()""")
+
+    def abort_if(self, condition, message):
+        return f"IF {condition} THEN RAISE EXCEPTION '{message}' USING ERRCODE = 'integrity_constraint_violation'; END IF;"
+
+Connection.dialect = PostgresDialect()
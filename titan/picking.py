@@ -0,0 +1,138 @@
+"""Pick lists for shipments: one merged, walk-ordered list per wave of shipments.
+
+A wave merges the SKU lines of every selected shipment, so a SKU wanted by
+several orders is picked once with the summed quantity. Each SKU is resolved to
+its bin through the inventory primary key in a single query. Bin codes such as
+'A1' or 'C-12' map onto a floor grid: the letters name the aisle, spaced
+config.PICK_AISLE_SPACING apart, and the number names the bin along it, spaced
+config.PICK_BIN_SPACING apart. Picks are then ordered by one of two routes:
+
+- ``serpentine``: aisle by aisle, walking every other aisle in reverse.
+- ``nearest``: greedy nearest neighbour from the depot at the grid origin.
+
+Distances are Manhattan distances on that grid, out from and back to the depot.
+"""
+import json
+import re
+import sqlite3
+
+from titan import config
+from titan.db import get_db
+
+ROUTES = ("serpentine", "nearest")
+
+_LOCATION = re.compile(r"^\s*([A-Za-z]+)\s*-?\s*(\d+)")
+_LINE_QTY = re.compile(r"^(.*?)(?:\s*[:*]|\s+x)\s*(\d+)$", re.IGNORECASE)
+
+def parse_location(code):
+    """'A1' -> (0, 1), 'AB-12' -> (27, 12); None for codes outside the aisle+bin scheme."""
+    m = _LOCATION.match(code or "")
+    if not m:
+        return None
+    aisle = 0
+    for ch in m.group(1).upper():
+        aisle = aisle * 26 + ord(ch) - 64
+    return aisle - 1, int(m.group(2))
+
+def shipment_lines(skus, qty):
+    """[(sku, qty)] for a shipment's comma-separated skus.
+
+    An entry may carry its own quantity ('SKU-1:4', 'SKU-1 x4'); the shipment's
+    qty is split evenly over the entries that don't, remainder to the first.
+    """
+    lines, open_skus = [], []
+    for entry in (skus or "").split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        m = _LINE_QTY.match(entry)
+        if m and m.group(1):
+            lines.append((m.group(1).strip(), int(m.group(2))))
+        else:
+            open_skus.append(entry)
+    if open_skus:
+        share, extra = divmod(int(qty or 0), len(open_skus))
+        lines += [(sku, share + (extra if i == 0 else 0)) for i, sku in enumerate(open_skus)]
+    return [(sku, n) for sku, n in lines if n > 0]
+
+def _coords(cells):
+    return [(aisle * config.PICK_AISLE_SPACING, bin_no * config.PICK_BIN_SPACING) for aisle, bin_no in cells]
+
+def _serpentine(cells):
+    aisles = sorted({a for a, _ in cells})
+    turn = {a: i % 2 for i, a in enumerate(aisles)}
+    return sorted(range(len(cells)), key=lambda i: (cells[i][0], -cells[i][1] if turn[cells[i][0]] else cells[i][1]))
+
+def _nearest(cells):
+    import numpy as np
+    xy = np.array(_coords(cells), dtype=float).reshape(-1, 2)
+    left = np.ones(len(cells), dtype=bool)
+    here, order = np.zeros(2), []
+    for _ in range(len(cells)):
+        dist = np.abs(xy - here).sum(axis=1)
+        dist[~left] = np.inf
+        i = int(dist.argmin())
+        order.append(i)
+        left[i] = False
+        here = xy[i]
+    return order
+
+def order_picks(cells, route=None):
+    """Visiting order (indexes into `cells`, a list of (aisle, bin)) for the route."""
+    route = route or config.PICK_ROUTE
+    if route not in ROUTES:
+        raise ValueError(f"unknown pick route {route!r}")
+    if not cells:
+        return []
+    return _serpentine(cells) if route == "serpentine" else _nearest(cells)
+
+def walk_distance(cells):
+    """Depot -> every cell in order -> depot."""
+    points = [(0.0, 0.0)] + _coords(cells) + [(0.0, 0.0)]
+    return sum(abs(x1 - x0) + abs(y1 - y0) for (x0, y0), (x1, y1) in zip(points, points[1:]))
+
+def build_pick_list(shipment_ids, route=None):
+    """One wave's pick list for the given shipments.
+
+    Returns {'route', 'shipments', 'picks', 'missing', 'distance'}. Each pick is
+    {seq, location, sku, name, qty, stock, short, orders: {shipment id: qty}} in
+    walking order; picks whose bin can't be placed on the grid come last, by
+    location code. 'missing' lists SKUs with no inventory row or no location.
+    """
+    route = route or config.PICK_ROUTE
+    conn = get_db()
+    conn.row_factory = sqlite3.Row
+    shipments = conn.execute("SELECT id, skus, qty FROM shipments WHERE id IN (SELECT value FROM json_each(?)) ORDER BY id",
+                             (json.dumps([str(s) for s in shipment_ids]),)).fetchall()
+    wanted = {}
+    for s in shipments:
+        for sku, n in shipment_lines(s['skus'], s['qty']):
+            orders = wanted.setdefault(sku, {})
+            orders[s['id']] = orders.get(s['id'], 0) + n
+    items = conn.execute("SELECT sku, name, stock, location FROM inventory WHERE sku IN (SELECT value FROM json_each(?))",
+                         (json.dumps(list(wanted)),)).fetchall()
+    conn.close()
+
+    placed, unplaced, missing = [], [], set(wanted)
+    for item in items:
+        if not item['location']:
+            continue
+        missing.discard(item['sku'])
+        orders = wanted[item['sku']]
+        qty = sum(orders.values())
+        pick = {'location': item['location'], 'sku': item['sku'], 'name': item['name'], 'qty': qty,
+                'stock': item['stock'], 'short': (item['stock'] or 0) < qty, 'orders': orders}
+        cell = parse_location(item['location'])
+        if cell:
+            placed.append((cell, pick))
+        else:
+            unplaced.append(pick)
+
+    placed.sort(key=lambda p: (p[0], p[1]['sku']))
+    cells = [cell for cell, _ in placed]
+    order = order_picks(cells, route)
+    picks = [placed[i][1] for i in order] + sorted(unplaced, key=lambda p: (p['location'], p['sku']))
+    for seq, pick in enumerate(picks, 1):
+        pick['seq'] = seq
+    return {'route': route, 'shipments': [s['id'] for s in shipments], 'picks': picks, 'missing': sorted(missing),
+            'distance': walk_distance([cells[i] for i in order])}
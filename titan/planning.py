@@ -0,0 +1,110 @@
+"""Capacity planning: per-person daily load forecasts and assignee recommendations.
+
+Every open task is charged its expected remaining hours on its planned date
+(undated and overdue tasks on today). A task's expected hours are the median
+act_time of the latest config.PLAN_HISTORY_TASKS finished tasks with the same
+assignee and category. Without such history the category median is used, then
+the median of all of them, then config.PLAN_DEFAULT_TASK_HOURS. Tasks already
+past their estimate keep a quarter of it. All of this is done with pandas/NumPy
+column operations over two typed fetches, and the result is cached until tasks
+or users change (titan.changes), so forecasts and recommendations stay cheap on
+large histories.
+"""
+import datetime
+
+from titan import config
+from titan.changes import cached
+from titan.frames import query_frame
+
+def _load():
+    import numpy as np
+    import pandas as pd
+    users = query_frame("SELECT username, name, is_admin FROM users ORDER BY username", schema={"is_admin": "bool"})
+    history = query_frame("""SELECT assignee, COALESCE(category, '') AS category, act_time AS hours FROM tasks
+                             WHERE status = 'Done' AND act_time > 0 ORDER BY id DESC LIMIT ?""",
+                          (config.PLAN_HISTORY_TASKS,), {"hours": "float"})
+    pending = query_frame("""SELECT assignee, COALESCE(category, '') AS category, planned_date, COALESCE(act_time, 0) AS spent
+                             FROM tasks WHERE status IS NOT 'Done'""", schema={"spent": "float"})
+    by_pair = history.groupby(["assignee", "category"])["hours"].median()
+    by_category = history.groupby("category")["hours"].median()
+    overall = float(history["hours"].median()) if len(history) else config.PLAN_DEFAULT_TASK_HOURS
+
+    assignee = pending["assignee"].to_numpy(dtype=object, na_value=None)
+    category = pending["category"].to_numpy(dtype=object, na_value="")
+    estimate = by_pair.reindex(pd.MultiIndex.from_arrays([assignee, category])).to_numpy(dtype=float, na_value=np.nan)
+    estimate = np.where(np.isnan(estimate), by_category.reindex(category).to_numpy(dtype=float, na_value=np.nan), estimate)
+    estimate = np.where(np.isnan(estimate), overall, estimate)
+    remaining = np.maximum(estimate - pending["spent"].to_numpy(dtype=float, na_value=0.0), estimate * 0.25)
+
+    today = np.datetime64(datetime.date.today(), "ns")
+    day = pd.to_datetime(pending["planned_date"].to_numpy(dtype=object, na_value=None), errors="coerce",
+                         format="%Y-%m-%d").to_numpy(dtype="datetime64[ns]")
+    day = np.where(np.isnat(day) | (day < today), today, day)
+    load = pd.DataFrame({"assignee": assignee, "day": day, "hours": remaining})
+    return {"users": users, "load": load, "by_pair": by_pair, "by_category": by_category, "overall": overall}
+
+def _model():
+    return cached(("planning", str(datetime.date.today())), ["tasks", "users"], _load)
+
+def get_load_forecast(days=None):
+    """Expected hours per user (rows, by username) and day (columns, today onwards) over `days` days."""
+    import pandas as pd
+    days = days or config.PLAN_HORIZON_DAYS
+    model = _model()
+    columns = pd.date_range(datetime.date.today(), periods=days, freq="D")
+    load = model["load"]
+    grid = (load.groupby(["assignee", "day"])["hours"].sum().unstack(fill_value=0.0)
+            if len(load) else pd.DataFrame(dtype=float))
+    grid = grid.reindex(index=model["users"]["username"].to_numpy(dtype=object), columns=columns, fill_value=0.0)
+    grid.columns = [d.date() for d in grid.columns]
+    grid.index.name = "username"
+    return grid
+
+def estimate_hours(category, usernames):
+    """Expected hours of a `category` task for each of `usernames`, from the same history as the forecast."""
+    import numpy as np
+    import pandas as pd
+    model = _model()
+    pairs = pd.MultiIndex.from_arrays([list(usernames), [category or ""] * len(usernames)])
+    est = model["by_pair"].reindex(pairs).to_numpy(dtype=float)
+    fallback = model["by_category"].get(category or "", np.nan)
+    est = np.where(np.isnan(est), fallback, est)
+    return np.where(np.isnan(est), model["overall"], est)
+
+def rank_assignees(category, planned_date=None, candidates=None):
+    """Candidates (default: every user) ordered from least to most loaded for a new task.
+
+    A candidate's utilization is their booked hours from today through the
+    planned date, plus this task's estimate for them, over their capacity for those
+    days (config.PLAN_DAILY_HOURS each). Returns a DataFrame of username, name,
+    booked_hours, estimate_hours and utilization.
+    """
+    import numpy as np
+    model = _model()
+    users = model["users"]
+    if candidates is not None:
+        users = users[users["username"].isin(list(candidates))]
+    usernames = users["username"].to_numpy(dtype=object)
+    today = datetime.date.today()
+    try:
+        due = datetime.date.fromisoformat(str(planned_date)[:10]) if planned_date else today
+    except ValueError:
+        due = today
+    days = max((due - today).days + 1, 1)
+    forecast = get_load_forecast(max(days, config.PLAN_HORIZON_DAYS))
+    booked = forecast.iloc[:, :days].sum(axis=1).reindex(usernames, fill_value=0.0).to_numpy(dtype=float)
+    estimate = estimate_hours(category, usernames)
+    ranked = users.assign(booked_hours=booked, estimate_hours=estimate,
+                          utilization=(booked + estimate) / (days * config.PLAN_DAILY_HOURS))
+    return ranked.iloc[np.lexsort((usernames, ranked["utilization"].to_numpy()))].reset_index(drop=True)
+
+def assignable_users():
+    """Usernames auto-assignment picks from: the non-admin users, or None (everyone) when there are only admins."""
+    users = _model()["users"]
+    workers = users.loc[~users["is_admin"].fillna(False).astype(bool), "username"].tolist()
+    return workers or None
+
+def recommend_assignee(category, planned_date=None, candidates=None):
+    """The least loaded candidate's username for a new task, or None when there is nobody to pick."""
+    ranked = rank_assignees(category, planned_date, candidates)
+    return ranked["username"].iloc[0] if len(ranked) else None
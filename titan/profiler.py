@@ -0,0 +1,149 @@
+"""Per-rerun profiling and SQL query instrumentation.
+
+Every statement run on a pooled connection (see titan.db.TimedCursor) is timed
+and folded into process-wide per-statement totals. While a run is open on the
+current thread (begin_run ... end_run, one per Streamlit rerun) queries and named
+sections are also recorded against that run, which is what the admin
+Diagnostics page shows. Statements slower than config.SLOW_QUERY_MS are logged
+to the "titan.sql" logger.
+"""
+import functools
+import logging
+import re
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+
+from titan import config
+
+log = logging.getLogger("titan.sql")
+
+RECENT_RUNS = 200
+RECENT_SLOW = 200
+
+_local = threading.local()
+_lock = threading.Lock()
+_totals = {}
+_recent_runs = deque(maxlen=RECENT_RUNS)
+_slow_log = deque(maxlen=RECENT_SLOW)
+
+@functools.lru_cache(maxsize=2048)
+def normalize_sql(sql):
+    """Collapses whitespace and literals so the same statement shape groups together."""
+    sql = re.sub(r"'(?:[^']|'')*'", "?", sql)
+    sql = re.sub(r"\b\d+(?:\.\d+)?\b", "?", sql)
+    return re.sub(r"\s+", " ", sql).strip()
+
+def begin_run(label):
+    """Opens a run on this thread; an earlier run left open (e.g. by st.rerun) is closed as interrupted."""
+    if getattr(_local, "run", None) is not None:
+        end_run(interrupted=True)
+    _local.run = {'label': label, 'started': time.time(), 't0': time.perf_counter(),
+                  'sections': {}, 'queries': [], 'interrupted': False}
+    return _local.run
+
+def end_run(interrupted=False):
+    run = getattr(_local, "run", None)
+    if run is None:
+        return None
+    _local.run = None
+    now_ms = time.perf_counter() * 1000.0
+    for name, value in run['sections'].items():
+        if value < 0:
+            # Section still open (the run was cut short); close it now
+            run['sections'][name] = now_ms + value
+    run['total_ms'] = now_ms - run.pop('t0') * 1000.0
+    run['interrupted'] = interrupted
+    run['sql_ms'] = sum(q['ms'] for q in run['queries'])
+    with _lock:
+        _recent_runs.append(run)
+    return run
+
+def current_run():
+    return getattr(_local, "run", None)
+
+def set_run_label(label):
+    run = current_run()
+    if run is not None:
+        run['label'] = label
+
+def start_section(name):
+    run = current_run()
+    if run is not None:
+        run['sections'][name] = run['sections'].get(name, 0.0) - time.perf_counter() * 1000.0
+
+def end_section(name):
+    run = current_run()
+    if run is not None and name in run['sections']:
+        run['sections'][name] += time.perf_counter() * 1000.0
+
+@contextmanager
+def section(name):
+    start_section(name)
+    try:
+        yield
+    finally:
+        end_section(name)
+
+def record_query(sql, ms, rows):
+    """Called by TimedCursor after each statement; returns the per-run entry (or None) so rows can be added later."""
+    key = normalize_sql(sql)
+    with _lock:
+        t = _totals.get(key)
+        if t is None:
+            t = _totals[key] = {'sql': key, 'calls': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'rows': 0}
+        t['calls'] += 1
+        t['total_ms'] += ms
+        t['max_ms'] = max(t['max_ms'], ms)
+        t['rows'] += max(rows, 0)
+        if ms >= config.SLOW_QUERY_MS:
+            _slow_log.append({'sql': key, 'ms': ms, 'at': time.time()})
+    if ms >= config.SLOW_QUERY_MS:
+        log.warning("slow query (%.1f ms): %s", ms, key)
+    run = current_run()
+    if run is None:
+        return None
+    entry = {'sql': key, 'ms': ms, 'rows': max(rows, 0)}
+    run['queries'].append(entry)
+    return entry
+
+def add_rows(entry, key, n):
+    """Adds n fetched rows to a query's per-run entry and to its process totals."""
+    if entry is not None:
+        entry['rows'] += n
+    with _lock:
+        t = _totals.get(key)
+        if t is not None:
+            t['rows'] += n
+
+def recent_runs():
+    with _lock:
+        return list(_recent_runs)
+
+def slow_queries():
+    with _lock:
+        return list(_slow_log)
+
+def top_queries(n=20, order_by='total_ms'):
+    with _lock:
+        rows = [dict(t, mean_ms=t['total_ms'] / t['calls']) for t in _totals.values()]
+    return sorted(rows, key=lambda r: r[order_by], reverse=True)[:n]
+
+def n_plus_one(runs=None, threshold=None):
+    """Statements executed at least `threshold` times within a single run: likely per-row lookups."""
+    threshold = config.N_PLUS_ONE_THRESHOLD if threshold is None else threshold
+    findings = []
+    for run in (recent_runs() if runs is None else runs):
+        counts = Counter(q['sql'] for q in run['queries'])
+        for sql, calls in counts.items():
+            if calls >= threshold:
+                findings.append({'run': run['label'], 'started': run['started'], 'sql': sql, 'calls': calls,
+                                 'total_ms': sum(q['ms'] for q in run['queries'] if q['sql'] == sql)})
+    return sorted(findings, key=lambda f: f['calls'], reverse=True)
+
+def reset():
+    with _lock:
+        _totals.clear()
+        _recent_runs.clear()
+        _slow_log.clear()
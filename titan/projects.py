@@ -0,0 +1,72 @@
+"""Projects: tasks grouped under parent tasks, with rolled-up hours, progress and ratings.
+
+tasks.parent_id links a subtask to its parent. task_tree is the closure table
+(one row per ancestor/descendant pair, with depth), and task_rollups holds each
+task's subtree totals: task count, To Do / In Progress / Done counts, hours,
+and rating count and sum. Triggers on tasks (db.init_db) keep both current on
+every insert, status, timer or rating change and move, whichever module makes
+it. Reading a project's totals is therefore one primary-key lookup, never a
+walk over the tree. Archived subtasks stay counted in their project's totals.
+"""
+import sqlite3
+
+from titan.audit import audited
+from titan.db import ROLLUP_COLUMNS, get_db
+from titan.writer import write_op
+
+def _with_derived(row):
+    row = dict(row)
+    row['progress'] = row['done'] / row['task_count'] if row['task_count'] else 0.0
+    row['avg_rating'] = row['rating_sum'] / row['rated'] if row['rated'] else None
+    return row
+
+def get_rollup(task_id):
+    """Subtree totals of a task (itself included), plus progress (share Done) and avg_rating; None if unknown."""
+    conn = get_db()
+    conn.row_factory = sqlite3.Row
+    row = conn.execute("SELECT * FROM task_rollups WHERE task_id=?", (task_id,)).fetchone()
+    conn.close()
+    return _with_derived(row) if row else None
+
+def get_subtasks(task_id):
+    """Direct children, oldest first, each with its own subtree totals and the assignee's display name."""
+    conn = get_db()
+    conn.row_factory = sqlite3.Row
+    rows = conn.execute(f"""SELECT t.*, COALESCE(u.name, t.assignee) AS assignee_name, {', '.join(f'r.{c}' for c in ROLLUP_COLUMNS)}
+                            FROM tasks t JOIN task_rollups r ON r.task_id = t.id LEFT JOIN users u ON u.username = t.assignee
+                            WHERE t.parent_id = ? ORDER BY t.id""", (task_id,)).fetchall()
+    conn.close()
+    return [_with_derived(r) for r in rows]
+
+def get_ancestors(task_id):
+    """[(id, title)] from the root project down to the task's parent."""
+    conn = get_db()
+    rows = conn.execute("""SELECT t.id, t.title FROM task_tree p JOIN tasks t ON t.id = p.ancestor
+                           WHERE p.descendant = ? AND p.depth > 0 ORDER BY p.depth DESC""", (task_id,)).fetchall()
+    conn.close()
+    return [tuple(r) for r in rows]
+
+def get_projects():
+    """Top-level tasks that have subtasks, newest first, with their totals."""
+    conn = get_db()
+    conn.row_factory = sqlite3.Row
+    rows = conn.execute(f"""SELECT t.id, t.title, t.company, t.status, {', '.join(f'r.{c}' for c in ROLLUP_COLUMNS)}
+                            FROM tasks t JOIN task_rollups r ON r.task_id = t.id
+                            WHERE t.parent_id IS NULL AND t.id IN (SELECT parent_id FROM tasks WHERE parent_id IS NOT NULL)
+                            ORDER BY t.id DESC""").fetchall()
+    conn.close()
+    return [_with_derived(r) for r in rows]
+
+@write_op
+def set_parent(conn, task_id, parent_id, actor=None):
+    """Moves a task (with its subtasks) under parent_id, or to the top level when None.
+
+    Raises ValueError for an unknown parent or a move under the task's own subtree.
+    """
+    if parent_id is not None and not conn.execute("SELECT 1 FROM tasks WHERE id=?", (parent_id,)).fetchone():
+        raise ValueError(f"no task {parent_id}")
+    try:
+        with audited(conn, [task_id], actor):
+            conn.execute("UPDATE tasks SET parent_id=? WHERE id=?", (parent_id, task_id))
+    except sqlite3.IntegrityError as e:
+        raise ValueError(str(e))
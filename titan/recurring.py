@@ -0,0 +1,140 @@
+"""Recurring task templates and the materializer that turns them into tasks.
+
+A template holds a task (title, assignee, company, category, priority) plus an
+RRULE-style schedule, e.g. ``FREQ=DAILY;BYDAY=MO,TU,WE,TH,FR``,
+``FREQ=WEEKLY;INTERVAL=2;BYDAY=MO`` or ``FREQ=MONTHLY;BYMONTHDAY=1,-1``.
+The maintenance sweep calls run_materializer(), which creates every occurrence
+up to config.RECURRING_HORIZON_DAYS ahead. It works through
+config.RECURRING_BATCH_SIZE templates per write op, each batch one executemany.
+Every generated task carries template_key = 'tpl:<template id>:<date>' under a
+unique index, and rows are inserted with INSERT OR IGNORE. Re-running a batch,
+or two processes materializing at once, therefore never duplicates a task.
+Occurrences before today are never backfilled.
+"""
+import calendar
+import datetime
+import json
+import sqlite3
+
+from titan import config
+from titan import metrics
+from titan.db import get_db
+from titan.notify import enqueue_select
+from titan.writer import write_op
+
+FREQUENCIES = ("DAILY", "WEEKLY", "MONTHLY")
+WEEKDAYS = ("MO", "TU", "WE", "TH", "FR", "SA", "SU")
+
+def parse_rule(rule):
+    """'FREQ=WEEKLY;BYDAY=MO,TH' -> {'freq', 'interval', 'byday', 'bymonthday'}; ValueError if unsupported."""
+    parts = {}
+    for part in (rule or "").upper().replace(" ", "").split(";"):
+        if part:
+            key, _, value = part.partition("=")
+            parts[key] = value
+    freq = parts.pop("FREQ", "")
+    if freq not in FREQUENCIES:
+        raise ValueError(f"FREQ must be one of {', '.join(FREQUENCIES)}")
+    try:
+        interval = int(parts.pop("INTERVAL", "1"))
+        byday = [WEEKDAYS.index(d) for d in parts.pop("BYDAY", "").split(",") if d]
+        bymonthday = [int(d) for d in parts.pop("BYMONTHDAY", "").split(",") if d]
+    except ValueError:
+        raise ValueError(f"invalid recurrence rule {rule!r}")
+    if interval < 1 or any(d == 0 or abs(d) > 31 for d in bymonthday):
+        raise ValueError(f"invalid recurrence rule {rule!r}")
+    if parts:
+        raise ValueError(f"unsupported rule part(s): {', '.join(parts)}")
+    return {'freq': freq, 'interval': interval, 'byday': byday, 'bymonthday': bymonthday}
+
+def _matches(rule, start, day):
+    freq, interval = rule['freq'], rule['interval']
+    if freq == "DAILY":
+        return (day - start).days % interval == 0 and (not rule['byday'] or day.weekday() in rule['byday'])
+    if freq == "WEEKLY":
+        weeks = ((day - datetime.timedelta(days=day.weekday())) - (start - datetime.timedelta(days=start.weekday()))).days // 7
+        return weeks % interval == 0 and day.weekday() in (rule['byday'] or [start.weekday()])
+    months = (day.year - start.year) * 12 + day.month - start.month
+    last = calendar.monthrange(day.year, day.month)[1]
+    return months % interval == 0 and any(d == day.day or last + d + 1 == day.day for d in rule['bymonthday'] or [start.day])
+
+def occurrences(rule, starts_on, first, last):
+    """Dates from `first` to `last` (inclusive, and not before starts_on) on which the rule fires."""
+    rule = parse_rule(rule) if isinstance(rule, str) else rule
+    start = datetime.date.fromisoformat(str(starts_on)[:10])
+    day = max(first, start)
+    out = []
+    while day <= last:
+        if _matches(rule, start, day):
+            out.append(day)
+        day += datetime.timedelta(days=1)
+    return out
+
+@write_op
+def add_template(conn, title, assignee, company, category, rule, starts_on=None, until=None, priority="Medium"):
+    """Saves a recurring template; occurrences appear at the next materializer run. Returns its id."""
+    parse_rule(rule)
+    cur = conn.execute("""INSERT INTO task_templates (title, assignee, company, category, priority, rule, starts_on, until)
+                          VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+                       (title, assignee, company, category, priority, rule.upper().replace(" ", ""),
+                        str(starts_on or datetime.date.today()), str(until) if until else None))
+    return cur.lastrowid
+
+@write_op
+def set_template_active(conn, template_id, active):
+    """Pauses or resumes a template; tasks it already created are left alone."""
+    conn.execute("UPDATE task_templates SET active=? WHERE id=?", (1 if active else 0, template_id))
+
+def get_templates(company=None):
+    where, params = ("WHERE company = ?", (company,)) if company else ("", ())
+    conn = get_db()
+    conn.row_factory = sqlite3.Row
+    rows = [dict(r) for r in conn.execute(f"SELECT * FROM task_templates {where} ORDER BY id", params).fetchall()]
+    conn.close()
+    return rows
+
+@write_op
+def materialize_batch(conn, after_id, through, limit):
+    """Creates the occurrences up to `through` of the next `limit` active templates after `after_id`.
+
+    Returns (last template id seen or None, tasks created).
+    """
+    templates = conn.execute("""SELECT id, title, assignee, company, category, priority, rule, starts_on, until, materialized_through
+                                FROM task_templates WHERE active = 1 AND id > ? ORDER BY id LIMIT ?""",
+                             (after_id, limit)).fetchall()
+    if not templates:
+        return None, 0
+    today = datetime.date.today()
+    rows = []
+    for t_id, title, assignee, company, category, priority, rule, starts_on, until, done_through in templates:
+        first = today if not done_through else max(today, datetime.date.fromisoformat(done_through) + datetime.timedelta(days=1))
+        last = min(through, datetime.date.fromisoformat(until)) if until else through
+        try:
+            dates = occurrences(rule, starts_on, first, last)
+        except ValueError:
+            continue
+        rows += [(title, assignee, company, category, priority or "Medium", "To Do", str(d), 0.0, 0, f"tpl:{t_id}:{d}")
+                 for d in dates]
+    last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM tasks").fetchone()[0]
+    created = conn.executemany("""INSERT OR IGNORE INTO tasks (title, assignee, company, category, priority, status, planned_date,
+                                                               act_time, is_overdue, template_key)
+                                  VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""", rows).rowcount if rows else 0
+    conn.execute("""UPDATE task_templates SET materialized_through = MAX(COALESCE(materialized_through, ''), ?)
+                    WHERE id IN (SELECT value FROM json_each(?))""",
+                 (str(through), json.dumps([t[0] for t in templates])))
+    if created:
+        enqueue_select(conn, """SELECT assignee AS recipient, 'assigned', id, title || ' (due ' || planned_date || ')', NULL
+                                FROM tasks WHERE id > ? AND template_key IS NOT NULL""", (last_id,))
+        metrics.TASK_WRITES.inc(created, op="recurring")
+    return templates[-1][0], created
+
+def run_materializer(horizon_days=None, batch_size=None):
+    """Materializes every active template through today + horizon_days, one batch per transaction."""
+    horizon_days = config.RECURRING_HORIZON_DAYS if horizon_days is None else horizon_days
+    batch_size = batch_size or config.RECURRING_BATCH_SIZE
+    through = datetime.date.today() + datetime.timedelta(days=horizon_days)
+    after_id, total = 0, 0
+    while after_id is not None:
+        after_id, created = materialize_batch(after_id, through, batch_size)
+        total += created
+    return total
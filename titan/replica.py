@@ -0,0 +1,159 @@
+"""In-memory read replica for report and dashboard queries.
+
+With config.REPLICA_MAX_STALENESS_SECONDS > 0, get_report_db() serves
+connections to an in-memory copy of the primary database. The copy is taken
+with the backup API in a single step, which in WAL mode is a plain read and
+never blocks the writer. A background thread re-takes it every half staleness
+bound, skipping the copy when table_versions has not moved. Each copy is a new
+shared-cache memory database: a refresh swaps in the new one, and the old one
+is freed when its last borrowed connection closes. Readers therefore never
+wait on a refresh. A reader that picks up a copy just as it is retired gets
+None from acquire() and moves on to the new one, rather than opening an empty
+memory database.
+
+A copy older than the bound (e.g. the refresher fell behind) is refreshed
+inline before it is served. With the bound at 0 (default), or on PostgreSQL
+(whose own streaming replicas take this role), get_report_db() is just get_db().
+"""
+import itertools
+import logging
+import queue
+import sqlite3
+import threading
+import time
+
+from titan import config
+from titan.db import PooledConnection, archive_path, get_db, get_table_versions, is_postgres
+
+log = logging.getLogger("titan.replica")
+
+_lock = threading.Lock()
+_names = itertools.count()
+_current = None
+_refresher_stop = None
+
+class Snapshot:
+    """One in-memory copy of the primary; lends out read-only connections to it."""
+
+    def __init__(self, source_path):
+        self.source_path = source_path
+        self.uri = f"file:titan-replica-{next(_names)}?mode=memory&cache=shared"
+        self._idle = queue.LifoQueue()
+        # Guards retired/_idle, so no connection is opened or parked after retire()
+        self._lock = threading.Lock()
+        self.retired = False
+        # Holds the memory database open for as long as this snapshot is current
+        self._anchor = sqlite3.connect(self.uri, uri=True, check_same_thread=False)
+        self.versions = get_table_versions()
+        src = sqlite3.connect(source_path)
+        try:
+            src.backup(self._anchor)
+        finally:
+            src.close()
+        self.taken_at = time.monotonic()
+
+    def age(self):
+        return time.monotonic() - self.taken_at
+
+    def acquire(self):
+        """A connection to this copy, or None once it has been retired."""
+        with self._lock:
+            if self.retired:
+                return None
+            try:
+                return self._idle.get_nowait()
+            except queue.Empty:
+                # Opened while the anchor is still open, so it sees the copy and keeps it alive
+                conn = sqlite3.connect(self.uri, uri=True, factory=PooledConnection, check_same_thread=False)
+        conn.execute("ATTACH DATABASE ? AS archive", (archive_path(self.source_path),))
+        conn.execute("PRAGMA query_only = ON")
+        conn.pool = self
+        return conn
+
+    def release(self, conn):
+        """Same contract as ConnectionPool.release: False means the caller should really close it."""
+        with self._lock:
+            if self.retired:
+                return False
+            conn.row_factory = None
+            self._idle.put_nowait(conn)
+            return True
+
+    def retire(self):
+        with self._lock:
+            self.retired = True
+            while True:
+                try:
+                    sqlite3.Connection.close(self._idle.get_nowait())
+                except queue.Empty:
+                    break
+            self._anchor.close()
+
+def refresh(force=False):
+    """Re-copies the primary unless nothing changed since the current copy; returns the current Snapshot."""
+    global _current
+    with _lock:
+        old = _current
+        if old is not None and old.source_path == config.DB_FILE and not force:
+            if get_table_versions() == old.versions:
+                old.taken_at = time.monotonic()
+                return old
+        _current = Snapshot(config.DB_FILE)
+    if old is not None:
+        old.retire()
+    return _current
+
+def current_generation():
+    """Identifies the replica copy reads are currently served from (None when the replica is off)."""
+    snapshot = _current
+    return snapshot.uri if config.REPLICA_MAX_STALENESS_SECONDS > 0 and snapshot is not None else None
+
+def catch_up():
+    """Re-copies the primary now (replica enabled only), so the caller's own writes show on its next read."""
+    if config.REPLICA_MAX_STALENESS_SECONDS > 0 and _current is not None:
+        refresh()
+
+def get_report_db():
+    """Connection for report/dashboard reads: the replica when enabled, otherwise the primary pool."""
+    bound = config.REPLICA_MAX_STALENESS_SECONDS
+    if bound <= 0 or is_postgres():
+        return get_db()
+    while True:
+        snapshot = _current
+        if snapshot is None or snapshot.age() > bound or snapshot.source_path != config.DB_FILE:
+            snapshot = refresh()
+        conn = snapshot.acquire()
+        if conn is not None:
+            return conn
+
+def start_replica():
+    """Starts the background refresher once per process (no-op while the replica is disabled)."""
+    global _refresher_stop
+    bound = config.REPLICA_MAX_STALENESS_SECONDS
+    if bound <= 0 or is_postgres():
+        return None
+    with _lock:
+        if _refresher_stop is not None:
+            return _refresher_stop
+        stop = _refresher_stop = threading.Event()
+
+    def loop():
+        while not stop.wait(bound / 2):
+            try:
+                refresh()
+            except sqlite3.Error:
+                log.exception("replica refresh failed")
+
+    refresh()
+    threading.Thread(target=loop, name="titan-replica", daemon=True).start()
+    return stop
+
+def stop_replica():
+    global _refresher_stop, _current
+    with _lock:
+        if _refresher_stop is not None:
+            _refresher_stop.set()
+            _refresher_stop = None
+        old, _current = _current, None
+    if old is not None:
+        old.retire()
@@ -0,0 +1,115 @@
+"""Background maintenance: stale timers, forgotten shifts, overdue flags and reminders, recurring tasks,
+archiving and backups.
+
+The scheduler runs in a single daemon thread per process so none of this work
+happens in the request path.
+"""
+import datetime
+import logging
+import threading
+
+from titan import config
+from titan import metrics
+from titan.archive import run_archive
+from titan.audit import audited
+from titan.backup import run_scheduled_backup
+from titan.notify import purge_notifications, queue_due_reminders
+from titan.recurring import run_materializer
+from titan.sessions import purge_expired_revocations
+from titan.writer import write_op
+
+log = logging.getLogger("titan.scheduler")
+
+_scheduler_lock = threading.Lock()
+_scheduler_stop = None
+
+@write_op
+def cap_stale_timers(conn, max_hours=None):
+    """Stops timers left running longer than max_hours, crediting exactly max_hours."""
+    max_hours = config.TIMER_CAP_HOURS if max_hours is None else max_hours
+    cutoff = (datetime.datetime.now() - datetime.timedelta(hours=max_hours)).strftime("%Y-%m-%d %H:%M:%S")
+    stale = [r[0] for r in conn.execute("SELECT id FROM tasks WHERE timer_start IS NOT NULL AND timer_start < ?", (cutoff,)).fetchall()]
+    with audited(conn, stale, "system"):
+        cur = conn.execute("UPDATE tasks SET act_time = COALESCE(act_time, 0) + ?, timer_start = NULL WHERE timer_start IS NOT NULL AND timer_start < ?",
+                           (max_hours, cutoff))
+    metrics.TIMER_ACTIONS.inc(cur.rowcount, action="auto_cap")
+    return cur.rowcount
+
+@write_op
+def close_stale_shifts(conn, max_hours=None):
+    """Closes CLOCK_INs still open after max_hours with an AUTO_CLOCK_OUT at the cap."""
+    max_hours = config.SHIFT_CAP_HOURS if max_hours is None else max_hours
+    cutoff = (datetime.datetime.now() - datetime.timedelta(hours=max_hours)).strftime("%Y-%m-%d %H:%M:%S")
+    stale = conn.execute("""SELECT w.username, w.timestamp FROM work_logs w
+                            JOIN (SELECT MAX(id) AS last_id FROM work_logs GROUP BY username) l ON l.last_id = w.id
+                            WHERE w.event_type = 'CLOCK_IN' AND w.timestamp < ?""", (cutoff,)).fetchall()
+    cap = datetime.timedelta(seconds=int(max_hours * 3600))
+    rows = [(username, (datetime.datetime.fromisoformat(ts) + cap).strftime("%Y-%m-%d %H:%M:%S")) for username, ts in stale]
+    if rows:
+        conn.executemany("INSERT INTO work_logs (username, event_type, timestamp) VALUES (?, 'AUTO_CLOCK_OUT', ?)", rows)
+    metrics.CLOCK_EVENTS.inc(len(rows), event="AUTO_CLOCK_OUT")
+    return len(rows)
+
+@write_op
+def refresh_overdue_flags(conn):
+    """Recomputes tasks.is_overdue, touching only rows whose flag actually changes."""
+    today_str = str(datetime.date.today())
+    overdue = "CASE WHEN planned_date < ? AND status != 'Done' THEN 1 ELSE 0 END"
+    cur = conn.execute(f"UPDATE tasks SET is_overdue = {overdue} WHERE is_overdue IS NOT {overdue}", (today_str, today_str))
+    return cur.rowcount
+
+SWEEP_STEPS = [
+    ('timers_capped', cap_stale_timers),
+    ('shifts_closed', close_stale_shifts),
+    ('overdue_updated', refresh_overdue_flags),
+    ('recurring_created', run_materializer),
+    ('reminders_queued', queue_due_reminders),
+    ('notifications_purged', purge_notifications),
+    ('revocations_purged', purge_expired_revocations),
+    ('archive', run_archive),
+    ('snapshot', run_scheduled_backup),
+]
+
+def run_maintenance_sweep():
+    """Runs every step in turn. A failing step is logged and reported as None; the steps after it still run."""
+    result = {}
+    for name, step in SWEEP_STEPS:
+        try:
+            value = step()
+        except Exception:
+            log.exception("maintenance step %s failed", name)
+            value = None
+        if isinstance(value, dict):
+            result.update(value)
+        else:
+            result[name] = value
+    return result
+
+def start_background_scheduler(interval=None):
+    """Starts the maintenance loop once per process; later calls return the running loop's stop event."""
+    global _scheduler_stop
+    with _scheduler_lock:
+        if _scheduler_stop is not None:
+            return _scheduler_stop
+        interval = config.MAINTENANCE_INTERVAL_SECONDS if interval is None else interval
+        stop = threading.Event()
+
+        def loop():
+            while True:
+                try:
+                    run_maintenance_sweep()
+                except Exception:
+                    log.exception("maintenance sweep failed")
+                if stop.wait(interval):
+                    break
+
+        threading.Thread(target=loop, name="titan-scheduler", daemon=True).start()
+        _scheduler_stop = stop
+        return stop
+
+def stop_background_scheduler():
+    global _scheduler_stop
+    with _scheduler_lock:
+        if _scheduler_stop is not None:
+            _scheduler_stop.set()
+            _scheduler_stop = None
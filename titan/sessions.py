@@ -0,0 +1,138 @@
+"""Signed, expiring session tokens, so any Titan process can serve any user.
+
+A token is ``<base64 payload>.<base64 HMAC-SHA256>``, where the payload holds
+the username, a random session id and an expiry time. The signing key is
+config.SESSION_SECRET, or else a random key stored once in the database, which
+is shared by every process on that database. Logging out puts the session id
+in revoked_sessions.
+
+Verified tokens are cached in-process together with the versions of the users
+and revoked_sessions tables (titan.changes). A rerun with a known token
+therefore costs neither a signature check nor a query. Any revocation or user
+change, made from any process, re-verifies cached tokens within one change
+poll.
+"""
+import base64
+import hashlib
+import hmac
+import json
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+from titan import config
+from titan import metrics
+from titan.changes import versions_of
+from titan.db import get_db
+from titan.users import get_user
+from titan.writer import write_op
+
+CACHE_SIZE = 10_000
+DEPENDS_ON = ["users", "revoked_sessions"]
+
+_secret_lock = threading.Lock()
+_secret = {}
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+def _b64(data):
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+def _unb64(text):
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+@write_op
+def _stored_secret(conn):
+    conn.execute("INSERT OR IGNORE INTO app_secrets (name, value) VALUES ('session', ?)", (secrets.token_hex(32),))
+    return conn.execute("SELECT value FROM app_secrets WHERE name='session'").fetchone()[0]
+
+def _key():
+    if config.SESSION_SECRET:
+        return config.SESSION_SECRET.encode()
+    with _secret_lock:
+        if config.DB_FILE not in _secret:
+            _secret[config.DB_FILE] = _stored_secret().encode()
+        return _secret[config.DB_FILE]
+
+def _sign(body):
+    return _b64(hmac.new(_key(), body.encode(), hashlib.sha256).digest())
+
+def issue(username, ttl_hours=None):
+    """Returns a new signed token for `username`."""
+    ttl_hours = config.SESSION_TTL_HOURS if ttl_hours is None else ttl_hours
+    payload = {'u': username, 'sid': secrets.token_urlsafe(12), 'exp': int(time.time() + ttl_hours * 3600)}
+    body = _b64(json.dumps(payload, separators=(",", ":")).encode())
+    return f"{body}.{_sign(body)}"
+
+def _decode(token):
+    """Payload of a well-formed, correctly signed, unexpired token, else None."""
+    try:
+        body, signature = token.split(".")
+        if not hmac.compare_digest(signature, _sign(body)):
+            return None
+        payload = json.loads(_unb64(body))
+    except (ValueError, TypeError):
+        return None
+    return payload if payload.get('exp', 0) > time.time() else None
+
+def _is_revoked(sid):
+    conn = get_db()
+    row = conn.execute("SELECT 1 FROM revoked_sessions WHERE sid=?", (sid,)).fetchone()
+    conn.close()
+    return row is not None
+
+def verify(token):
+    """Returns (user dict, payload) for a valid session token, else (None, None)."""
+    if not token:
+        return None, None
+    stamp = versions_of(DEPENDS_ON)
+    with _cache_lock:
+        entry = _cache.get(token)
+        if entry is not None and entry[0] == stamp and entry[2]['exp'] > time.time():
+            _cache.move_to_end(token)
+            metrics.CACHE_REQUESTS.inc(cache="session", result="hit")
+            return entry[1], entry[2]
+    metrics.CACHE_REQUESTS.inc(cache="session", result="miss")
+    payload = _decode(token)
+    user = get_user(payload['u']) if payload and not _is_revoked(payload['sid']) else None
+    if user is None:
+        with _cache_lock:
+            _cache.pop(token, None)
+        return None, None
+    with _cache_lock:
+        _cache[token] = (stamp, user, payload)
+        _cache.move_to_end(token)
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return user, payload
+
+def needs_renewal(payload, ttl_hours=None):
+    """True once less than half of the session lifetime is left."""
+    ttl_hours = config.SESSION_TTL_HOURS if ttl_hours is None else ttl_hours
+    return payload['exp'] - time.time() < ttl_hours * 1800
+
+@write_op
+def _revoke_sid(conn, sid, expires_at):
+    conn.execute("INSERT OR IGNORE INTO revoked_sessions (sid, expires_at) VALUES (?, ?)", (sid, expires_at))
+
+def revoke(token):
+    """Invalidates a token everywhere; returns False if it was not a valid token to begin with."""
+    payload = _decode(token) if token else None
+    with _cache_lock:
+        _cache.pop(token, None)
+    if payload is None:
+        return False
+    _revoke_sid(payload['sid'], payload['exp'])
+    return True
+
+def renew(token, username):
+    """Returns a fresh token for `username` and revokes `token`, so a renewed session id stops working."""
+    fresh = issue(username)
+    revoke(token)
+    return fresh
+
+@write_op
+def purge_expired_revocations(conn):
+    """Drops revocations whose tokens have expired anyway."""
+    return conn.execute("DELETE FROM revoked_sessions WHERE expires_at < ?", (int(time.time()),)).rowcount
@@ -0,0 +1,50 @@
+"""3PL shipments."""
+import sqlite3
+
+from titan import metrics
+from titan.db import get_db
+from titan.writer import write_op
+
+def get_shipments():
+    conn = get_db()
+    conn.row_factory = sqlite3.Row
+    rows = [dict(r) for r in conn.execute("SELECT * FROM shipments ORDER BY date DESC").fetchall()]
+    conn.close()
+    return rows
+
+def get_shipments_page(limit=50, offset=0, status=None):
+    where, params = ("WHERE status = ?", (status,)) if status else ("", ())
+    conn = get_db()
+    conn.row_factory = sqlite3.Row
+    rows = [dict(r) for r in conn.execute(f"SELECT * FROM shipments {where} ORDER BY date DESC, id DESC LIMIT ? OFFSET ?",
+                                          (*params, limit, offset)).fetchall()]
+    conn.close()
+    return rows
+
+def get_shipment_by_id(s_id):
+    conn = get_db()
+    conn.row_factory = sqlite3.Row
+    row = conn.execute("SELECT * FROM shipments WHERE id=?", (s_id,)).fetchone()
+    conn.close()
+    return dict(row) if row else None
+
+@write_op
+def add_shipment(conn, s_id, date, am, dest, skus, qty):
+    conn.execute("INSERT INTO shipments VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                 (s_id, str(date), am, dest, skus, qty, "New", ""))
+    metrics.SHIPMENT_WRITES.inc(op="add")
+
+@write_op
+def update_shipment_details(conn, s_id, dest, skus, qty, status):
+    conn.execute("UPDATE shipments SET dest=?, skus=?, qty=?, status=? WHERE id=?", 
+                 (dest, skus, qty, status, s_id))
+    metrics.SHIPMENT_WRITES.inc(op="update")
+
+@write_op
+def add_shipments(conn, rows):
+    """Bulk insert of shipment dicts (id, date, am, dest, skus, qty) in one transaction."""
+    conn.executemany("INSERT INTO shipments VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                     [(r['id'], str(r['date']), r.get('am'), r.get('dest'), r.get('skus'), r.get('qty', 0), r.get('status', "New"), r.get('tracking', ""))
+                      for r in rows])
+    metrics.SHIPMENT_WRITES.inc(len(rows), op="bulk_add")
+    return len(rows)
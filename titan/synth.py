@@ -0,0 +1,137 @@
+"""Seeded synthetic datasets for benchmarks and load tests.
+
+    python -m titan.synth --scale 100k --db /tmp/titan-100k.db
+
+A scale sets the row count of the large tables (tasks, task_comments, work_logs,
+shipments); users, companies and inventory grow more slowly, like a real tenant.
+The same scale and seed always produce the same rows.
+"""
+import argparse
+import datetime
+import random
+import sqlite3
+
+from titan import config
+from titan.db import connect, init_db, is_postgres
+from titan.users import hash_password
+
+SCALES = {"1k": 1_000, "10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+CHUNK_ROWS = 50_000
+
+ROLES = ["Account Manager", "Researcher", "Warehouse Labour", "Employee"]
+CATEGORIES = ["Admin", "Sales", "Logistics", "IT", "Research"]
+PRIORITIES = ["High", "Medium", "Low"]
+STATUSES = ["To Do", "In Progress", "Done"]
+DESTINATIONS = ["Amazon", "Walmart"]
+WORDS = ["pallet", "audit", "client", "report", "restock", "label", "inbound", "returns", "cycle", "count",
+         "invoice", "dock", "carrier", "review", "onboarding", "SKU", "sync", "quote", "forecast", "bin"]
+
+def parse_scale(scale):
+    key = str(scale).lower()
+    if key in SCALES:
+        return SCALES[key]
+    return int(key)
+
+def table_sizes(rows):
+    return {
+        "users": max(10, min(2_000, rows // 500)),
+        "companies": max(5, min(1_000, rows // 1_000)),
+        "inventory": max(50, rows // 10),
+        "tasks": rows,
+        "task_comments": rows,
+        "work_logs": rows,
+        "shipments": rows,
+    }
+
+def _insert(conn, sql, rows):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= CHUNK_ROWS:
+            conn.executemany(sql, batch)
+            batch = []
+    if batch:
+        conn.executemany(sql, batch)
+
+def _ts(rng, start, days):
+    return (start + datetime.timedelta(seconds=rng.randrange(days * 86400))).strftime("%Y-%m-%d %H:%M:%S")
+
+def generate(scale="10k", seed=42, days=365):
+    """Fills config.DB_FILE (after init_db) with a synthetic dataset; returns the table sizes used."""
+    rng = random.Random(seed)
+    sizes = table_sizes(parse_scale(scale))
+    start = datetime.datetime.now().replace(microsecond=0) - datetime.timedelta(days=days)
+    today = datetime.date.today()
+    init_db()
+
+    users = [(f"user{i:05d}", f"Worker {i:05d}") for i in range(sizes["users"])]
+    companies = [f"Client {i:04d}" for i in range(sizes["companies"])]
+    skus = [f"SKU-{i:06d}" for i in range(sizes["inventory"])]
+    pwd_hash = hash_password("123")
+
+    # A private connection so the relaxed durability setting never leaks into the pool
+    if is_postgres():
+        conn = connect(config.DB_FILE)
+        conn.execute("SET synchronous_commit = off")
+    else:
+        conn = sqlite3.connect(config.DB_FILE)
+        conn.execute("PRAGMA synchronous = OFF")
+    _insert(conn, "INSERT OR IGNORE INTO users (username, password, name, role, avatar, is_admin, email) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            ((u, pwd_hash, name, rng.choice(ROLES), '👤', False, f"{u}@titan.com") for u, name in users))
+    _insert(conn, "INSERT OR IGNORE INTO companies VALUES (?)", ((c,) for c in companies))
+    _insert(conn, "INSERT OR IGNORE INTO inventory VALUES (?, ?, ?, ?)",
+            ((sku, f"Item {sku[4:]}", rng.randrange(0, 5_000), f"{chr(65 + rng.randrange(20))}{rng.randrange(1, 60)}") for sku in skus))
+
+    def task_rows():
+        for i in range(sizes["tasks"]):
+            status = rng.choices(STATUSES, weights=[3, 1, 6])[0]
+            planned = today + datetime.timedelta(days=rng.randrange(-days, 30))
+            overdue = str(planned) < str(today) and status != 'Done'
+            rating = rng.randrange(1, 6) if status == 'Done' and rng.random() < 0.5 else None
+            yield (f"{rng.choice(WORDS).title()} {rng.choice(WORDS)} #{i}", rng.choice(users)[0], rng.choice(companies),
+                   rng.choice(CATEGORIES), rng.choice(PRIORITIES), status, str(planned), None,
+                   round(rng.expovariate(0.5), 2), rating, overdue, f"{planned} 17:00:00" if status == 'Done' else None)
+    _insert(conn, """INSERT INTO tasks (title, assignee, company, category, priority, status, planned_date, timer_start, act_time, rating, is_overdue, done_at)
+                     VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""", task_rows())
+
+    n_tasks = sizes["tasks"]
+    _insert(conn, "INSERT INTO task_comments (task_id, username, comment, timestamp) VALUES (?, ?, ?, ?)",
+            ((rng.randrange(1, n_tasks + 1), rng.choice(users)[1], " ".join(rng.choices(WORDS, k=8)), _ts(rng, start, days)[:16])
+             for _ in range(sizes["task_comments"])))
+
+    def work_log_rows():
+        # Alternating CLOCK_IN / CLOCK_OUT per user in time order; roughly a fifth end clocked in.
+        per_user = max(2, sizes["work_logs"] // len(users))
+        emitted = 0
+        for u, _ in users:
+            stamps = sorted(_ts(rng, start, days) for _ in range(per_user))
+            if rng.random() < 0.8 and len(stamps) % 2:
+                stamps.pop()
+            for j, ts in enumerate(stamps):
+                if emitted >= sizes["work_logs"]:
+                    return
+                emitted += 1
+                yield (u, "CLOCK_IN" if j % 2 == 0 else "CLOCK_OUT", ts)
+    _insert(conn, "INSERT INTO work_logs (username, event_type, timestamp) VALUES (?, ?, ?)", work_log_rows())
+
+    _insert(conn, "INSERT OR IGNORE INTO shipments VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            ((f"SH-SYN-{i:07d}", _ts(rng, start, days)[:10], rng.choice(users)[1], rng.choice(DESTINATIONS),
+              ", ".join(rng.sample(skus, k=min(len(skus), rng.randrange(1, 4)))), rng.randrange(1, 500),
+              rng.choice(["New", "Picking", "Shipped"]), "") for i in range(sizes["shipments"])))
+    conn.commit()
+    conn.execute("ANALYZE")
+    conn.close()
+    return sizes
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic Titan database.")
+    parser.add_argument("--scale", default="10k", help="1k, 10k, 100k, 1m or a row count")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--db", default=config.DB_FILE)
+    args = parser.parse_args(argv)
+    config.DB_FILE = args.db
+    sizes = generate(args.scale, args.seed)
+    print(f"Wrote {sum(sizes.values()):,} rows to {args.db}: {sizes}")
+
+if __name__ == "__main__":
+    main()
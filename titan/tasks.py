@@ -0,0 +1,323 @@
+"""Tasks and task timers."""
+import datetime
+import json
+import sqlite3
+
+from titan import metrics
+from titan.archive import ranged_select
+from titan.audit import audited
+from titan.changes import cached
+from titan.db import get_db
+from titan.frames import cached_frame
+from titan.notify import enqueue, enqueue_select
+from titan.planning import assignable_users, recommend_assignee
+from titan.replica import current_generation, get_report_db
+from titan.writer import write_op
+
+def get_tasks(since=None, until=None, replica=False):
+    """Live tasks, newest first. A planned_date range also reaches into archived tasks when it needs to.
+
+    replica=True reads from the report replica (titan.replica), which may lag by the staleness bound.
+    """
+    conn = get_report_db() if replica else get_db()
+    sql, params = ranged_select(conn, "tasks", since, until)
+    conn.row_factory = sqlite3.Row
+    c = conn.cursor()
+    c.execute(f"{sql} ORDER BY id DESC", params)
+    rows = [dict(r) for r in c.fetchall()]
+    conn.close()
+    return rows
+
+def filter_tasks(tasks, status="All", search="", companies=(), priorities=(), timing="All Time"):
+    """Dashboard filtering over get_tasks() rows."""
+    filtered = tasks
+    if status != "All":
+        filtered = [t for t in tasks if t['status'] == status]
+    
+    if search:
+        filtered = [t for t in filtered if search.lower() in t['title'].lower() or search.lower() in t['assignee'].lower()]
+    if companies:
+        filtered = [t for t in filtered if t['company'] in companies]
+    if priorities:
+        filtered = [t for t in filtered if t['priority'] in priorities]
+
+    # Timing Logic
+    today_str = str(datetime.date.today())
+    next_7_str = str(datetime.date.today() + datetime.timedelta(days=7))
+    
+    if timing == "Due Today":
+        filtered = [t for t in filtered if t.get('planned_date') == today_str]
+    elif timing == "Overdue":
+        filtered = [t for t in filtered if t['is_overdue'] and t['status'] != 'Done']
+    elif timing == "Next 7 Days":
+        filtered = [t for t in filtered if t.get('planned_date') and today_str <= t['planned_date'] <= next_7_str]
+    return filtered
+
+# Columns shown in the dashboard grid (plus id for row selection) and their types
+TASK_GRID_COLUMNS = {"id": "int", "title": "text", "assignee": "text", "company": "text", "status": "text",
+                     "priority": "text", "planned_date": "text", "act_time": "float"}
+# tasks.assignee is a username; the grid shows the display name in its place
+TASK_GRID_SELECT = ("id, title, COALESCE((SELECT name FROM users WHERE username = tasks.assignee), assignee) AS assignee, "
+                    "company, status, priority, planned_date, act_time")
+
+def task_filter_sql(status="All", search="", companies=(), priorities=(), timing="All Time"):
+    """The WHERE clause and params equivalent to filter_tasks()."""
+    clauses, params = [], []
+    if status != "All":
+        clauses.append("status = ?"); params.append(status)
+    if search:
+        clauses.append("""(instr(lower(title), ?) > 0 OR instr(lower(assignee), ?) > 0
+                           OR assignee IN (SELECT username FROM users WHERE instr(lower(name), ?) > 0))""")
+        params += [search.lower()] * 3
+    if companies:
+        clauses.append(f"company IN ({', '.join('?' * len(companies))})"); params += list(companies)
+    if priorities:
+        clauses.append(f"priority IN ({', '.join('?' * len(priorities))})"); params += list(priorities)
+
+    today_str = str(datetime.date.today())
+    if timing == "Due Today":
+        clauses.append("planned_date = ?"); params.append(today_str)
+    elif timing == "Overdue":
+        clauses.append("is_overdue = 1 AND status != 'Done'")
+    elif timing == "Next 7 Days":
+        clauses.append("planned_date BETWEEN ? AND ?"); params += [today_str, str(datetime.date.today() + datetime.timedelta(days=7))]
+    return (f"WHERE {' AND '.join(clauses)}" if clauses else ""), params
+
+def get_task_grid(status="All", search="", companies=(), priorities=(), timing="All Time", replica=False):
+    """Filtered dashboard rows as a typed frame of the grid columns, cached until tasks change."""
+    where, params = task_filter_sql(status, search, companies, priorities, timing)
+    return cached_frame('task_grid', ['tasks', 'users'], f"SELECT {TASK_GRID_SELECT} FROM tasks {where} ORDER BY id DESC",
+                        params, TASK_GRID_COLUMNS, replica)
+
+def get_task_summary(replica=False):
+    """{'counts': {status: n}, 'companies': [...]} for the dashboard tiles and filters, cached until tasks change."""
+    def load():
+        conn = get_report_db() if replica else get_db()
+        counts = dict(conn.execute("SELECT status, COUNT(*) FROM tasks GROUP BY status").fetchall())
+        companies = [r[0] for r in conn.execute("SELECT DISTINCT company FROM tasks WHERE company IS NOT NULL AND company != '' ORDER BY company").fetchall()]
+        conn.close()
+        return {'counts': counts, 'companies': companies}
+    return cached(('task_summary', current_generation() if replica else None), ['tasks'], load)
+
+def get_tasks_page(limit=50, before_id=None, status=None, assignee=None, company=None):
+    """Keyset-paginated tasks, newest first. Pass the last id of a page as before_id for the next."""
+    clauses, params = [], []
+    if before_id is not None:
+        clauses.append("id < ?"); params.append(before_id)
+    if status:
+        clauses.append("status = ?"); params.append(status)
+    if assignee:
+        clauses.append("assignee = ?"); params.append(assignee)
+    if company:
+        clauses.append("company = ?"); params.append(company)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    conn = get_db()
+    conn.row_factory = sqlite3.Row
+    rows = [dict(r) for r in conn.execute(f"SELECT * FROM tasks {where} ORDER BY id DESC LIMIT ?", (*params, limit)).fetchall()]
+    conn.close()
+    return rows
+
+def get_user_tasks(username=None):
+    """My Desk rows, newest first: the tasks assigned to `username`, or every task when None (admin team view).
+
+    Rows also carry assignee_name, the assignee's display name.
+    """
+    where, params = ("WHERE t.assignee = ?", (username,)) if username else ("", ())
+    conn = get_db()
+    conn.row_factory = sqlite3.Row
+    rows = [dict(r) for r in conn.execute(f"""SELECT t.*, COALESCE(u.name, t.assignee) AS assignee_name
+                                              FROM tasks t LEFT JOIN users u ON u.username = t.assignee
+                                              {where} ORDER BY t.id DESC""", params).fetchall()]
+    conn.close()
+    return rows
+
+def get_running_task_for_user(username):
+    """Fetches the active task currently being timed by the user"""
+    conn = get_db()
+    conn.row_factory = sqlite3.Row
+    c = conn.cursor()
+    c.execute("SELECT * FROM tasks WHERE assignee=? AND timer_start IS NOT NULL ORDER BY timer_start DESC LIMIT 1", (username,))
+    row = c.fetchone()
+    conn.close()
+    return dict(row) if row else None
+
+def get_task_by_id(task_id):
+    conn = get_db()
+    conn.row_factory = sqlite3.Row
+    c = conn.cursor()
+    c.execute("""SELECT t.*, COALESCE(u.name, t.assignee) AS assignee_name
+                 FROM tasks t LEFT JOIN users u ON u.username = t.assignee WHERE t.id=?""", (task_id,))
+    row = c.fetchone()
+    conn.close()
+    return dict(row) if row else None
+
+def is_task_overdue(planned_date, status):
+    return bool(planned_date) and str(planned_date) < str(datetime.date.today()) and status != 'Done'
+
+def add_task(title, assignee, company, category, planned_date, parent_id=None):
+    """Creates a To Do task, as a subtask of parent_id if given (titan.projects). Returns its assignee.
+
+    With no assignee it goes to the least loaded non-admin user (titan.planning). That
+    pick is a read-heavy pandas job, so it runs on the caller's thread and only
+    the insert is queued to the writer.
+    """
+    assignee = assignee or recommend_assignee(category, planned_date, assignable_users())
+    return _insert_task(title, assignee, company, category, planned_date, parent_id)
+
+@write_op
+def _insert_task(conn, title, assignee, company, category, planned_date, parent_id):
+    cur = conn.execute("INSERT INTO tasks (title, assignee, company, category, priority, status, planned_date, act_time, is_overdue, parent_id) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                       (title, assignee, company, category, "Medium", "To Do", str(planned_date), 0.0, is_task_overdue(planned_date, "To Do"), parent_id))
+    enqueue(conn, assignee, "assigned", cur.lastrowid, f"{title} (due {planned_date})" if planned_date else title)
+    metrics.TASK_WRITES.inc(op="add")
+    return assignee
+
+@write_op
+def add_tasks(conn, rows):
+    """Bulk insert of task dicts (title, assignee, company, category, planned_date[, priority]) in one transaction."""
+    last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM tasks").fetchone()[0]
+    conn.executemany("INSERT INTO tasks (title, assignee, company, category, priority, status, planned_date, act_time, is_overdue) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                     [(r['title'], r.get('assignee'), r.get('company'), r.get('category'), r.get('priority', "Medium"), "To Do",
+                       str(r.get('planned_date', datetime.date.today())), 0.0, is_task_overdue(r.get('planned_date'), "To Do")) for r in rows])
+    enqueue_select(conn, "SELECT assignee AS recipient, 'assigned', id, title, NULL FROM tasks WHERE id > ?", (last_id,))
+    metrics.TASK_WRITES.inc(len(rows), op="bulk_add")
+    return len(rows)
+
+@write_op
+def update_task(conn, task_id, status, assignee, act_time, planned_date, actor=None):
+    enqueue_select(conn, "SELECT ? AS recipient, 'assigned', id, title, NULL FROM tasks WHERE id=? AND assignee IS NOT ?",
+                   (assignee, task_id, assignee))
+    with audited(conn, [task_id], actor):
+        conn.execute("""UPDATE tasks SET status=?, assignee=?, act_time=?, planned_date=?, is_overdue=?,
+                        done_at = CASE WHEN ? = 'Done' THEN COALESCE(done_at, ?) END WHERE id=?""",
+                     (status, assignee, act_time, str(planned_date), is_task_overdue(planned_date, status),
+                      status, datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"), task_id))
+    metrics.TASK_WRITES.inc(op="update")
+
+@write_op
+def rate_task(conn, task_id, rating, feedback, actor=None):
+    with audited(conn, [task_id], actor):
+        conn.execute("UPDATE tasks SET rating=?, feedback=? WHERE id=?", (rating, feedback, task_id))
+    metrics.TASK_WRITES.inc(op="rate")
+
+BULK_ACTIONS = ("reassign", "status", "priority", "shift", "rate")
+
+@write_op
+def bulk_update_tasks(conn, task_ids, action, value, feedback="", actor=None):
+    """Applies one dashboard bulk action to every task in `task_ids` as a single executemany.
+
+    action/value: 'reassign' (assignee), 'status', 'priority', 'shift' (days to move planned_date by,
+    undated tasks are left alone) or 'rate' (1-5, only Done tasks are rated). Returns the number of tasks changed.
+    """
+    today = str(datetime.date.today())
+    if action == "reassign":
+        enqueue_select(conn, """SELECT ? AS recipient, 'assigned', id, title, NULL FROM tasks
+                                WHERE id IN (SELECT value FROM json_each(?)) AND assignee IS NOT ?""",
+                       (value, json.dumps([int(i) for i in task_ids]), value))
+        sql, args = "UPDATE tasks SET assignee=? WHERE id=?", (value,)
+    elif action == "status":
+        # Same overdue/done_at bookkeeping as update_task, with the new status passed in
+        sql = """UPDATE tasks SET status=?, is_overdue = CASE WHEN planned_date != '' AND planned_date < ? AND ? != 'Done' THEN 1 ELSE 0 END,
+                 done_at = CASE WHEN ? = 'Done' THEN COALESCE(done_at, ?) END WHERE id=?"""
+        args = (value, today, value, value, datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+    elif action == "priority":
+        sql, args = "UPDATE tasks SET priority=? WHERE id=?", (value,)
+    elif action == "shift":
+        # New dates are worked out here: date arithmetic differs between the SQL backends
+        sql, rows = "UPDATE tasks SET planned_date=?, is_overdue=? WHERE id=?", []
+        for task_id, planned, status in conn.execute("""SELECT id, planned_date, status FROM tasks
+                                                        WHERE id IN (SELECT value FROM json_each(?))""",
+                                                     (json.dumps([int(i) for i in task_ids]),)).fetchall():
+            try:
+                moved = str(datetime.date.fromisoformat(str(planned)[:10]) + datetime.timedelta(days=int(value)))
+            except ValueError:
+                continue
+            rows.append((moved, int(moved < today and status != 'Done'), task_id))
+    elif action == "rate":
+        sql, args = "UPDATE tasks SET rating=?, feedback=? WHERE id=? AND status='Done'", (value, feedback)
+    else:
+        raise ValueError(f"unknown bulk action {action!r}")
+    if action != "shift":
+        rows = [args + (int(i),) for i in task_ids]
+    with audited(conn, task_ids, actor):
+        changed = conn.executemany(sql, rows).rowcount if rows else 0
+    metrics.TASK_WRITES.inc(changed, op=f"bulk_{action}")
+    return changed
+
+@write_op
+def handle_task_timer(conn, task_id, action, username=None):
+    """Handles Start, Pause, and Stop explicitly without toggle ambiguity.
+
+    Returns a list of user-facing messages describing what happened.
+    """
+    # Starting may auto-pause the user's other running tasks, so their changes are audited too
+    others = [r[0] for r in conn.execute("SELECT id FROM tasks WHERE assignee=? AND timer_start IS NOT NULL AND id != ?",
+                                         (username, task_id)).fetchall()] if action == 'start' and username else []
+    with audited(conn, [task_id, *others], username):
+        return _run_task_timer(conn, task_id, action, username)
+
+def _run_task_timer(conn, task_id, action, username):
+    messages = []
+    metrics.TIMER_ACTIONS.inc(action=action)
+    c = conn.cursor()
+    
+    # --- SAFETY RULE: Auto-pause any other running tasks for this user ---
+    if action == 'start' and username:
+        c.execute("SELECT id, timer_start, act_time, title FROM tasks WHERE assignee=? AND timer_start IS NOT NULL AND id != ?", (username, task_id))
+        running_tasks = c.fetchall()
+        
+        for r_task in running_tasks:
+            r_id, r_start_ts, r_act_time, r_title = r_task
+            r_act_time = r_act_time if r_act_time else 0.0
+            if r_start_ts:
+                r_start_dt = datetime.datetime.strptime(r_start_ts, "%Y-%m-%d %H:%M:%S")
+                r_diff_hours = (datetime.datetime.now() - r_start_dt).total_seconds() / 3600.0
+                r_new_act = r_act_time + r_diff_hours
+                c.execute("UPDATE tasks SET timer_start=NULL, act_time=? WHERE id=?", (r_new_act, r_id))
+                messages.append(f"Auto-paused '{r_title}'.")
+                
+    # --- Process current task action ---
+    c.execute("SELECT timer_start, act_time FROM tasks WHERE id=?", (task_id,))
+    row = c.fetchone()
+    
+    if row:
+        start_ts, current_act = row
+        current_act = current_act if current_act else 0.0
+        
+        if start_ts and action in ['pause', 'stop']:
+            start_dt = datetime.datetime.strptime(start_ts, "%Y-%m-%d %H:%M:%S")
+            diff_hours = (datetime.datetime.now() - start_dt).total_seconds() / 3600.0
+            new_act = current_act + diff_hours
+            
+            if action == 'pause':
+                c.execute("UPDATE tasks SET timer_start=NULL, act_time=? WHERE id=?", (new_act, task_id))
+                messages.append(f"Timer Paused. Added {diff_hours:.2f} hours.")
+            elif action == 'stop':
+                c.execute("UPDATE tasks SET timer_start=NULL, act_time=?, status='Done', done_at=? WHERE id=?",
+                          (new_act, datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"), task_id))
+                messages.append(f"Task Completed! Added {diff_hours:.2f} hours.")
+                
+        elif not start_ts and action == 'start':
+            now_str = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            c.execute("UPDATE tasks SET timer_start=?, status='In Progress', done_at=NULL WHERE id=?", (now_str, task_id))
+            messages.append("Timer Started!")
+            
+    return messages
+
+@write_op
+def pause_all_running_tasks_for_user(conn, username):
+    """Auto-pauses all running tasks for a user (used on clock-out and logout)."""
+    c = conn.cursor()
+    c.execute("SELECT id, timer_start, act_time, title FROM tasks WHERE assignee=? AND timer_start IS NOT NULL", (username,))
+    running_tasks = c.fetchall()
+    
+    with audited(conn, [r[0] for r in running_tasks], username):
+        for r_task in running_tasks:
+            r_id, r_start_ts, r_act_time, r_title = r_task
+            r_act_time = r_act_time if r_act_time else 0.0
+            if r_start_ts:
+                r_start_dt = datetime.datetime.strptime(r_start_ts, "%Y-%m-%d %H:%M:%S")
+                r_diff_hours = (datetime.datetime.now() - r_start_dt).total_seconds() / 3600.0
+                r_new_act = r_act_time + r_diff_hours
+                c.execute("UPDATE tasks SET timer_start=NULL, act_time=? WHERE id=?", (r_new_act, r_id))
+                metrics.TIMER_ACTIONS.inc(action="auto_pause")
@@ -0,0 +1,53 @@
+"""Shift clock-in / clock-out events."""
+import datetime
+
+from titan import metrics
+from titan.archive import ranged_select
+from titan.db import get_db
+from titan.frames import read_frame
+from titan.replica import get_report_db
+from titan.writer import write_op
+
+@write_op
+def log_work_event(conn, username, event_type):
+    conn.execute("INSERT INTO work_logs (username, event_type, timestamp) VALUES (?, ?, ?)",
+                 (username, event_type, datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+    metrics.CLOCK_EVENTS.inc(event=event_type)
+
+@write_op
+def log_work_events(conn, events):
+    """Bulk insert of (username, event_type) pairs stamped with the current time, in one transaction."""
+    now_str = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    conn.executemany("INSERT INTO work_logs (username, event_type, timestamp) VALUES (?, ?, ?)",
+                     [(username, event_type, now_str) for username, event_type in events])
+    for _, event_type in events:
+        metrics.CLOCK_EVENTS.inc(event=event_type)
+    return len(events)
+
+def get_last_work_event(username):
+    conn = get_db()
+    c = conn.cursor()
+    c.execute("SELECT event_type, timestamp FROM work_logs WHERE username=? ORDER BY id DESC LIMIT 1", (username,))
+    res = c.fetchone()
+    conn.close()
+    return res
+
+def get_live_workers():
+    """Users whose latest work_logs event is a CLOCK_IN, in one query."""
+    conn = get_db()
+    rows = conn.execute("""SELECT u.name, u.role, w.timestamp
+                           FROM (SELECT username, MAX(id) AS last_id FROM work_logs GROUP BY username) l
+                           JOIN work_logs w ON w.id = l.last_id
+                           JOIN users u ON u.username = l.username
+                           WHERE w.event_type = 'CLOCK_IN'
+                           ORDER BY u.username""").fetchall()
+    conn.close()
+    return [{'name': name, 'role': role, 'since': since} for name, role, since in rows]
+
+def get_work_logs(since=None, until=None, replica=False):
+    """Work log events, newest first. A date range also reaches into archived logs when it needs to."""
+    conn = get_report_db() if replica else get_db()
+    sql, params = ranged_select(conn, "work_logs", since, until)
+    df = read_frame(conn, f"{sql} ORDER BY id DESC", params)
+    conn.close()
+    return df
@@ -0,0 +1,61 @@
+"""User accounts and authentication."""
+import sqlite3
+import hashlib
+
+from titan import metrics
+from titan.db import get_db
+from titan.frames import cached_frame, read_frame
+from titan.replica import get_report_db
+from titan.writer import write_op
+
+def hash_password(password):
+    return hashlib.sha256(password.encode()).hexdigest()
+
+def verify_user(identifier, password):
+    """Verifies a user by either Username OR Email."""
+    conn = get_db()
+    conn.row_factory = sqlite3.Row
+    c = conn.cursor()
+    pwd_hash = hash_password(password)
+    
+    try:
+        c.execute("SELECT * FROM users WHERE (username=? OR email=?) AND password=?", (identifier, identifier, pwd_hash))
+    except sqlite3.OperationalError:
+        # Fallback if email column doesn't exist for some reason
+        c.execute("SELECT * FROM users WHERE username=? AND password=?", (identifier, pwd_hash))
+        
+    user = c.fetchone()
+    conn.close()
+    
+    metrics.LOGINS.inc(result="success" if user else "failure")
+    if user:
+        return dict(user)
+    return None
+
+@write_op
+def create_user(conn, username, password, name, role, is_admin, email):
+    cur = conn.execute("INSERT OR IGNORE INTO users (username, password, name, role, avatar, is_admin, email) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                       (username, hash_password(password), name, role, '👤', is_admin, email))
+    return cur.rowcount == 1
+
+def get_user(username):
+    conn = get_db()
+    conn.row_factory = sqlite3.Row
+    row = conn.execute("SELECT * FROM users WHERE username=?", (username,)).fetchone()
+    conn.close()
+    return dict(row) if row else None
+
+def get_all_users(replica=False):
+    conn = get_report_db() if replica else get_db()
+    df = read_frame(conn, "SELECT * FROM users ORDER BY username")
+    conn.close()
+    return df
+
+def get_users_frame(replica=False):
+    """Team roster for display (no password hashes), typed and cached until users change."""
+    return cached_frame('users', ['users'], "SELECT username, name, role, email, is_admin FROM users ORDER BY username",
+                        schema={'is_admin': 'bool'}, replica=replica)
+
+@write_op
+def delete_user(conn, username):
+    conn.execute("DELETE FROM users WHERE username=?", (username,))
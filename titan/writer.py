@@ -0,0 +1,192 @@
+"""Single-writer queue that serializes SQLite writes into group commits.
+
+Mutators are written as ``fn(conn, ...)`` and decorated with @write_op, which
+gives them a public ``fn(...)`` signature. Once start_writer() has run, calls are
+queued to one dedicated writer thread. That thread drains up to
+config.WRITE_BATCH_SIZE queued operations, runs each inside its own SAVEPOINT of
+a single BEGIN IMMEDIATE transaction and commits once. Every caller gets a
+Future: ``fn(...)`` waits for it, ``fn.submit(...)`` returns it. A full queue
+blocks callers for at most config.WRITE_QUEUE_TIMEOUT_SECONDS, then raises
+WriterBusy.
+
+Without a running writer (CLI jobs, benchmarks) operations run inline on a
+pooled connection and commit immediately. Either way, a write op that calls
+another write op joins the same transaction.
+"""
+import functools
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+
+from titan import config
+from titan import metrics
+from titan.db import connect, get_db, is_busy_error, is_postgres
+
+_local = threading.local()
+_writer_lock = threading.Lock()
+_writer = None
+
+class WriterBusy(Exception):
+    """The write queue stayed full for longer than config.WRITE_QUEUE_TIMEOUT_SECONDS."""
+
+def _run_op(conn, fn, args, kwargs):
+    _local.conn = conn
+    try:
+        return fn(conn, *args, **kwargs)
+    finally:
+        _local.conn = None
+
+class WriteQueue:
+    def __init__(self, path, max_depth, batch_size):
+        self.path = path
+        self.batch_size = batch_size
+        self._queue = queue.Queue(maxsize=max_depth)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name="titan-writer", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def depth(self):
+        return self._queue.qsize()
+
+    def submit(self, fn, args, kwargs):
+        future = Future()
+        try:
+            self._queue.put((fn, args, kwargs, future), timeout=config.WRITE_QUEUE_TIMEOUT_SECONDS)
+        except queue.Full:
+            metrics.WRITES_REJECTED.inc()
+            raise WriterBusy(f"write queue full ({self._queue.maxsize} pending)")
+        return future
+
+    def _connect(self):
+        conn = connect(self.path, isolation_level=None)
+        if not is_postgres(self.path):
+            conn.execute("PRAGMA busy_timeout = 5000")
+        return conn
+
+    def _next_batch(self):
+        first = self._queue.get()
+        if first is None:
+            return []
+        batch = [first]
+        while len(batch) < self.batch_size:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                self._stop.set()
+                break
+            batch.append(item)
+        return batch
+
+    def _loop(self):
+        conn = self._connect()
+        while not self._stop.is_set():
+            batch = self._next_batch()
+            if batch:
+                self._commit_batch(conn, batch)
+        conn.close()
+
+    def _commit_batch(self, conn, batch):
+        metrics.WRITE_BATCH_OPS.observe(len(batch))
+        outcomes = []
+        try:
+            self._with_retry(lambda: conn.execute("BEGIN IMMEDIATE"))
+            for fn, args, kwargs, future in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                conn.execute("SAVEPOINT write_op")
+                try:
+                    outcomes.append((future, True, _run_op(conn, fn, args, kwargs)))
+                    conn.execute("RELEASE write_op")
+                except BaseException as e:
+                    conn.execute("ROLLBACK TO write_op")
+                    conn.execute("RELEASE write_op")
+                    outcomes.append((future, False, e))
+            self._with_retry(conn.commit)
+        except Exception as e:
+            if conn.in_transaction:
+                conn.rollback()
+            for _, _, _, future in batch:
+                if not future.done():
+                    if not future.running():
+                        future.set_running_or_notify_cancel()
+                    future.set_exception(e)
+            return
+        for future, ok, value in outcomes:
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
+    def _with_retry(self, action, attempts=5):
+        for attempt in range(attempts):
+            try:
+                return action()
+            except sqlite3.OperationalError as e:
+                if not is_busy_error(e) or attempt == attempts - 1:
+                    raise
+                metrics.DB_BUSY.inc(outcome="retry")
+                time.sleep(0.05 * (2 ** attempt))
+
+def start_writer():
+    """Starts the writer thread for config.DB_FILE once per process."""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = WriteQueue(config.DB_FILE, config.WRITE_QUEUE_DEPTH, config.WRITE_BATCH_SIZE).start()
+        return _writer
+
+def stop_writer():
+    global _writer
+    with _writer_lock:
+        if _writer is not None:
+            _writer.stop()
+            _writer = None
+
+def submit(fn, *args, **kwargs):
+    """Queues fn(conn, *args, **kwargs); returns a Future for its result."""
+    conn = getattr(_local, "conn", None)
+    if conn is not None or _writer is None:
+        future = Future()
+        future.set_running_or_notify_cancel()
+        try:
+            future.set_result(_run_inline(conn, fn, args, kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+        return future
+    return _writer.submit(fn, args, kwargs)
+
+def _run_inline(conn, fn, args, kwargs):
+    if conn is not None:
+        # Nested write op: join the caller's transaction.
+        return fn(conn, *args, **kwargs)
+    conn = get_db()
+    try:
+        result = _run_op(conn, fn, args, kwargs)
+        conn.commit()
+        return result
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+def write_op(fn):
+    """Decorates fn(conn, ...) so callers use fn(...) and the body runs in the writer's transaction."""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        return submit(fn, *args, **kwargs).result()
+
+    wrapper.submit = functools.partial(submit, fn)
+    return wrapper
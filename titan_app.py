@@ -1,19 +1,30 @@
 import streamlit as st
 import pandas as pd
 import datetime
-import os
 import time
-import sqlite3
-import hashlib
 import re
-from urllib.parse import quote
 
-# --- SAFETY: GEMINI IMPORT ---
-try:
-    import google.generativeai as genai
-    AI_AVAILABLE = True
-except ImportError:
-    AI_AVAILABLE = False
+from titan.assets import theme_tag
+from titan.audit import get_task_history
+from titan.changes import cached
+from titan import metrics, profiler, sessions
+from titan.comments import add_comment, get_comments_page, get_unread_counts, mark_read
+from titan.config import LIVE_REFRESH_SECONDS, PICK_ROUTE, PLAN_DAILY_HOURS, SLOW_QUERY_MS
+from titan.db import init_db
+from titan.notify import start_dispatcher
+from titan.picking import ROUTES as PICK_ROUTES, build_pick_list
+from titan.planning import get_load_forecast
+from titan.projects import get_ancestors, get_rollup, get_subtasks
+from titan.recurring import WEEKDAYS, add_template, get_templates, set_template_active
+from titan.replica import catch_up, start_replica
+from titan.inventory import get_companies, get_inventory_frame
+from titan.scheduler import start_background_scheduler
+from titan.shipments import add_shipment, get_shipments
+from titan.tasks import (add_task, bulk_update_tasks, get_running_task_for_user, get_task_by_id, get_task_grid, get_task_summary, get_user_tasks,
+                         handle_task_timer, pause_all_running_tasks_for_user, rate_task, update_task)
+from titan.timeclock import get_last_work_event, get_live_workers, get_work_logs, log_work_event
+from titan.users import create_user, get_all_users, get_users_frame, verify_user
+from titan.writer import start_writer
 
 # --- CONFIGURATION ---
 st.set_page_config(
@@ -22,859 +33,188 @@ st.set_page_config(
     layout="wide",
     initial_sidebar_state="expanded"
 )
+profiler.begin_run("Login")
+
+# --- DATABASE SETUP & BACKGROUND JOBS (once per server process) ---
+@st.cache_resource
+def bootstrap():
+    init_db()
+    start_writer()
+    start_replica()
+    start_dispatcher()
+    metrics.start_exporters()
+    return start_background_scheduler()
+
+bootstrap()
+
+# --- SESSION (signed token in the URL, so any server process can serve this user) ---
+session_user, session_payload = sessions.verify(st.query_params.get("session"))
+st.session_state.authenticated = session_user is not None
+if session_user:
+    st.session_state.user = session_user
+    if sessions.needs_renewal(session_payload):
+        st.query_params["session"] = sessions.renew(st.query_params.get("session"), session_user['username'])
 
-# --- DATABASE SETUP ---
-DB_FILE = "titan.db"
-
-def init_db():
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    
-    # 1. Users (Added email column)
-    c.execute('''CREATE TABLE IF NOT EXISTS users (
-                    username TEXT PRIMARY KEY,
-                    password TEXT,
-                    name TEXT,
-                    role TEXT,
-                    avatar TEXT,
-                    is_admin BOOLEAN,
-                    email TEXT
-                )''')
-    
-    # DB Migration checks (Graceful updates for existing DBs)
-    try: c.execute("ALTER TABLE users ADD COLUMN email TEXT")
-    except: pass
-    
-    try: c.execute("ALTER TABLE tasks ADD COLUMN company TEXT")
-    except: pass
-    try: c.execute("ALTER TABLE tasks ADD COLUMN timer_start TEXT")
-    except: pass
-    try: c.execute("ALTER TABLE tasks ADD COLUMN rating INTEGER")
-    except: pass
-    try: c.execute("ALTER TABLE tasks ADD COLUMN feedback TEXT")
-    except: pass
-                
-    # 2. Tasks
-    c.execute('''CREATE TABLE IF NOT EXISTS tasks (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    title TEXT,
-                    assignee TEXT,
-                    company TEXT,
-                    category TEXT,
-                    priority TEXT,
-                    status TEXT,
-                    planned_date TEXT,
-                    timer_start TEXT,
-                    act_time REAL,
-                    notes TEXT,
-                    rating INTEGER,
-                    feedback TEXT
-                )''')
-                
-    # 3. Shipments
-    c.execute('''CREATE TABLE IF NOT EXISTS shipments (
-                    id TEXT PRIMARY KEY,
-                    date TEXT,
-                    am TEXT,
-                    dest TEXT,
-                    skus TEXT,
-                    qty INTEGER,
-                    status TEXT,
-                    tracking TEXT
-                )''')
-
-    # 4. Work Logs
-    c.execute('''CREATE TABLE IF NOT EXISTS work_logs (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    username TEXT,
-                    event_type TEXT,
-                    timestamp TEXT
-                )''')
-    
-    # 5. Companies
-    c.execute('''CREATE TABLE IF NOT EXISTS companies (
-                    name TEXT PRIMARY KEY
-                )''')
-
-    # 6. Inventory
-    c.execute('''CREATE TABLE IF NOT EXISTS inventory (
-                    sku TEXT PRIMARY KEY,
-                    name TEXT,
-                    stock INTEGER,
-                    location TEXT
-                )''')
-
-    # 7. SOPs
-    c.execute('''CREATE TABLE IF NOT EXISTS sops (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    title TEXT,
-                    content TEXT,
-                    category TEXT
-                )''')
-
-    # 8. Task Comments
-    c.execute('''CREATE TABLE IF NOT EXISTS task_comments (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    task_id INTEGER,
-                    username TEXT,
-                    comment TEXT,
-                    timestamp TEXT
-                )''')
-    
-    # Seed Default Data (with default emails)
-    c.execute("SELECT * FROM users WHERE username = 'admin'")
-    if not c.fetchone():
-        pwd_hash = hashlib.sha256("123".encode()).hexdigest()
-        c.execute("INSERT INTO users (username, password, name, role, avatar, is_admin, email) VALUES (?, ?, ?, ?, ?, ?, ?)", 
-                  ('admin', pwd_hash, 'Big Boss', 'CEO', '🦁', True, 'admin@titan.com'))
-    
-    c.execute("SELECT * FROM users WHERE username = 'alex'")
-    if not c.fetchone():
-        pwd_hash = hashlib.sha256("123".encode()).hexdigest()
-        c.execute("INSERT INTO users (username, password, name, role, avatar, is_admin, email) VALUES (?, ?, ?, ?, ?, ?, ?)", 
-                  ('alex', pwd_hash, 'Alex', 'Account Manager', '👨‍💻', False, 'alex@titan.com'))
-
-    c.execute("SELECT * FROM users WHERE username = 'sarah'")
-    if not c.fetchone():
-        pwd_hash = hashlib.sha256("123".encode()).hexdigest()
-        c.execute("INSERT INTO users (username, password, name, role, avatar, is_admin, email) VALUES (?, ?, ?, ?, ?, ?, ?)", 
-                  ('sarah', pwd_hash, 'Sarah', 'Researcher', '🔎', False, 'sarah@titan.com'))
-
-    c.execute("SELECT * FROM users WHERE username = 'mike'")
-    if not c.fetchone():
-        pwd_hash = hashlib.sha256("123".encode()).hexdigest()
-        c.execute("INSERT INTO users (username, password, name, role, avatar, is_admin, email) VALUES (?, ?, ?, ?, ?, ?, ?)", 
-                  ('mike', pwd_hash, 'Mike', 'Warehouse Labour', '📦', False, 'mike@titan.com'))
-    
-    # Backfill missing emails for older DB versions
-    c.execute("UPDATE users SET email = username || '@titan.com' WHERE email IS NULL")
-    
-    # Default Companies & Inventory
-    c.execute("INSERT OR IGNORE INTO companies VALUES ('Internal')")
-    c.execute("INSERT OR IGNORE INTO companies VALUES ('Client A')")
-    c.execute("INSERT OR IGNORE INTO inventory VALUES ('SKU-001', 'Wireless Mouse', 500, 'A1')")
-    
-    c.execute("SELECT * FROM sops")
-    if not c.fetchone():
-        c.execute("INSERT INTO sops (title, content, category) VALUES (?, ?, ?)", 
-                 ('How to Pack Fragile Items', '1. Wrap in bubble wrap (2 layers).\n2. Use double-walled box.', 'Logistics'))
-        
-    conn.commit()
-    conn.close()
-
-init_db()
-
-# --- BACKEND FUNCTIONS ---
-def get_db():
-    return sqlite3.connect(DB_FILE)
-
-def hash_password(password):
-    return hashlib.sha256(password.encode()).hexdigest()
-
-def verify_user(identifier, password):
-    """Verifies a user by either Username OR Email."""
-    conn = get_db()
-    conn.row_factory = sqlite3.Row
-    c = conn.cursor()
-    pwd_hash = hash_password(password)
-    
-    try:
-        c.execute("SELECT * FROM users WHERE (username=? OR email=?) AND password=?", (identifier, identifier, pwd_hash))
-    except sqlite3.OperationalError:
-        # Fallback if email column doesn't exist for some reason
-        c.execute("SELECT * FROM users WHERE username=? AND password=?", (identifier, pwd_hash))
-        
-    user = c.fetchone()
-    conn.close()
-    
-    if user:
-        return dict(user)
-    return None
-
-def create_user(username, password, name, role, is_admin, email):
-    conn = get_db()
-    c = conn.cursor()
-    try:
-        c.execute("INSERT INTO users (username, password, name, role, avatar, is_admin, email) VALUES (?, ?, ?, ?, ?, ?, ?)", 
-                  (username, hash_password(password), name, role, '👤', is_admin, email))
-        conn.commit()
-        return True
-    except sqlite3.IntegrityError:
-        return False
-    finally:
-        conn.close()
-
-def get_all_users():
-    conn = get_db()
-    df = pd.read_sql("SELECT * FROM users", conn)
-    conn.close()
-    return df
-
-def delete_user(username):
-    conn = get_db()
-    conn.execute("DELETE FROM users WHERE username=?", (username,))
-    conn.commit()
-    conn.close()
-
-# --- TIME CLOCK FUNCTIONS ---
-def log_work_event(username, event_type):
-    conn = get_db()
-    conn.execute("INSERT INTO work_logs (username, event_type, timestamp) VALUES (?, ?, ?)",
-                 (username, event_type, datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
-    conn.commit()
-    conn.close()
-
-def get_last_work_event(username):
-    conn = get_db()
-    c = conn.cursor()
-    c.execute("SELECT event_type, timestamp FROM work_logs WHERE username=? ORDER BY id DESC LIMIT 1", (username,))
-    res = c.fetchone()
-    conn.close()
-    return res
-
-def get_live_workers():
-    users = get_all_users()
-    active_workers = []
-    for _, u in users.iterrows():
-        last = get_last_work_event(u['username'])
-        if last and last[0] == 'CLOCK_IN':
-            active_workers.append({'name': u['name'], 'role': u['role'], 'since': last[1]})
-    return active_workers
-
-def get_work_logs():
-    conn = get_db()
-    df = pd.read_sql("SELECT * FROM work_logs ORDER BY id DESC", conn)
-    conn.close()
-    return df
-
-# --- COMPANY & INVENTORY FUNCTIONS ---
-def get_companies():
-    conn = get_db()
-    df = pd.read_sql("SELECT name FROM companies", conn)
-    conn.close()
-    return df['name'].tolist()
-
-def add_company(name):
-    conn = get_db()
-    try:
-        conn.execute("INSERT INTO companies VALUES (?)", (name,))
-        conn.commit()
-        return True
-    except: return False
-    finally: conn.close()
-
-def get_inventory():
-    conn = get_db()
-    df = pd.read_sql("SELECT * FROM inventory", conn)
-    conn.close()
-    return df
-
-def add_inventory(sku, name, stock, location):
-    conn = get_db()
-    try:
-        conn.execute("INSERT INTO inventory VALUES (?, ?, ?, ?)", (sku, name, stock, location))
-        conn.commit()
-        return True
-    except: return False
-    finally: conn.close()
-
-def get_sops():
-    conn = get_db()
-    df = pd.read_sql("SELECT * FROM sops", conn)
-    conn.close()
-    return df
-
-def add_sop(title, content, category):
-    conn = get_db()
-    conn.execute("INSERT INTO sops (title, content, category) VALUES (?, ?, ?)", (title, content, category))
-    conn.commit()
-    conn.close()
-
-# --- COMMENT FUNCTIONS ---
-def add_comment(task_id, username, comment):
-    conn = get_db()
-    ts = datetime.datetime.now().strftime("%Y-%m-%d %H:%M")
-    conn.execute("INSERT INTO task_comments (task_id, username, comment, timestamp) VALUES (?, ?, ?, ?)",
-                 (task_id, username, comment, ts))
-    conn.commit()
-    conn.close()
-
-def get_comments(task_id):
-    conn = get_db()
-    conn.row_factory = sqlite3.Row
-    c = conn.cursor()
-    c.execute("SELECT * FROM task_comments WHERE task_id=? ORDER BY id ASC", (task_id,))
-    rows = [dict(r) for r in c.fetchall()]
-    conn.close()
-    return rows
-
-# --- CALENDAR HELPERS ---
-def create_gcal_link(title, date_str, desc=""):
-    try:
-        dt = datetime.datetime.strptime(date_str, "%Y-%m-%d")
-        start = dt.replace(hour=9, minute=0).strftime("%Y%m%dT%H%M%S")
-        end = dt.replace(hour=10, minute=0).strftime("%Y%m%dT%H%M%S")
-        base = "https://www.google.com/calendar/render?action=TEMPLATE"
-        link = f"{base}&text={quote(title)}&dates={start}/{end}&details={quote(desc)}"
-        return link
-    except:
-        return "#"
-
-# --- TASK FUNCTIONS ---
-def get_tasks():
-    conn = get_db()
-    conn.row_factory = sqlite3.Row
-    c = conn.cursor()
-    c.execute("SELECT * FROM tasks ORDER BY id DESC")
-    rows = [dict(r) for r in c.fetchall()]
-    conn.close()
-    return rows
-
-def get_running_task_for_user(username):
-    """Fetches the active task currently being timed by the user"""
-    conn = get_db()
-    conn.row_factory = sqlite3.Row
-    c = conn.cursor()
-    c.execute("SELECT * FROM tasks WHERE assignee=? AND timer_start IS NOT NULL ORDER BY timer_start DESC LIMIT 1", (username,))
-    row = c.fetchone()
-    conn.close()
-    return dict(row) if row else None
-
-def get_task_by_id(task_id):
-    conn = get_db()
-    conn.row_factory = sqlite3.Row
-    c = conn.cursor()
-    c.execute("SELECT * FROM tasks WHERE id=?", (task_id,))
-    row = c.fetchone()
-    conn.close()
-    return dict(row) if row else None
+# --- GEMINI AI ---
+api_key = st.sidebar.text_input("🔑 Gemini API Key", type="password") if st.session_state.authenticated else None
 
-def add_task(title, assignee, company, category, planned_date):
-    conn = get_db()
-    conn.execute("INSERT INTO tasks (title, assignee, company, category, priority, status, planned_date, act_time) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
-                 (title, assignee, company, category, "Medium", "To Do", str(planned_date), 0.0))
-    conn.commit()
-    conn.close()
+# --- THEME (static/titan.css, served once and cached by the browser; see titan.assets) ---
+st.html(theme_tag())
 
-def update_task(task_id, status, assignee, act_time, planned_date):
-    conn = get_db()
-    conn.execute("UPDATE tasks SET status=?, assignee=?, act_time=?, planned_date=? WHERE id=?", (status, assignee, act_time, str(planned_date), task_id))
-    conn.commit()
-    conn.close()
+# --- HELPER FUNCTIONS ---
+def safe_rerun():
+    time.sleep(0.1)
+    st.rerun()
 
-def rate_task(task_id, rating, feedback):
-    conn = get_db()
-    conn.execute("UPDATE tasks SET rating=?, feedback=? WHERE id=?", (rating, feedback, task_id))
-    conn.commit()
-    conn.close()
+def run_task_timer(task_id, action, username):
+    for msg in handle_task_timer(task_id, action, username):
+        st.toast(msg)
 
-def handle_task_timer(task_id, action, username=None):
-    """Handles Start, Pause, and Stop explicitly without toggle ambiguity"""
-    if not username and 'user' in st.session_state:
-        username = st.session_state.user['name']
-        
-    conn = get_db()
-    c = conn.cursor()
-    
-    # --- SAFETY RULE: Auto-pause any other running tasks for this user ---
-    if action == 'start' and username:
-        c.execute("SELECT id, timer_start, act_time, title FROM tasks WHERE assignee=? AND timer_start IS NOT NULL AND id != ?", (username, task_id))
-        running_tasks = c.fetchall()
+# --- LIVE FRAGMENTS (re-run on a timer, refetch only when their tables changed) ---
+@st.fragment(run_every=LIVE_REFRESH_SECONDS)
+def active_timer_bar(user):
+    active_task = cached(('running_task', user['username']), ['tasks'], lambda: get_running_task_for_user(user['username']))
+    if active_task:
+        with st.container():
+            st.markdown('<div class="active-timer-marker"></div>', unsafe_allow_html=True)
         
-        for r_task in running_tasks:
-            r_id, r_start_ts, r_act_time, r_title = r_task
-            r_act_time = r_act_time if r_act_time else 0.0
-            if r_start_ts:
-                r_start_dt = datetime.datetime.strptime(r_start_ts, "%Y-%m-%d %H:%M:%S")
-                r_diff_hours = (datetime.datetime.now() - r_start_dt).total_seconds() / 3600.0
-                r_new_act = r_act_time + r_diff_hours
-                c.execute("UPDATE tasks SET timer_start=NULL, act_time=? WHERE id=?", (r_new_act, r_id))
-                st.toast(f"Auto-paused '{r_title}'.")
-                
-    # --- Process current task action ---
-    c.execute("SELECT timer_start, act_time FROM tasks WHERE id=?", (task_id,))
-    row = c.fetchone()
-    
-    if row:
-        start_ts, current_act = row
-        current_act = current_act if current_act else 0.0
+            # Calculate elapsed time
+            start_dt = datetime.datetime.strptime(active_task['timer_start'], "%Y-%m-%d %H:%M:%S")
+            elapsed = datetime.datetime.now() - start_dt
+            elapsed_hours = int(elapsed.total_seconds() // 3600)
+            elapsed_minutes = int((elapsed.total_seconds() % 3600) // 60)
+            elapsed_str = f"{elapsed_hours}h {elapsed_minutes}m"
+            started_at = start_dt.strftime("%H:%M")
+            company_str = active_task['company'] if active_task['company'] else 'Internal'
         
-        if start_ts and action in ['pause', 'stop']:
-            start_dt = datetime.datetime.strptime(start_ts, "%Y-%m-%d %H:%M:%S")
-            diff_hours = (datetime.datetime.now() - start_dt).total_seconds() / 3600.0
-            new_act = current_act + diff_hours
-            
-            if action == 'pause':
-                c.execute("UPDATE tasks SET timer_start=NULL, act_time=? WHERE id=?", (new_act, task_id))
-                st.toast(f"Timer Paused. Added {diff_hours:.2f} hours.")
-            elif action == 'stop':
-                c.execute("UPDATE tasks SET timer_start=NULL, act_time=?, status='Done' WHERE id=?", (new_act, task_id))
-                st.toast(f"Task Completed! Added {diff_hours:.2f} hours.")
-                
-        elif not start_ts and action == 'start':
-            now_str = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            c.execute("UPDATE tasks SET timer_start=?, status='In Progress' WHERE id=?", (now_str, task_id))
-            st.toast("Timer Started!")
-            
-    conn.commit()
-    conn.close()
-
-def pause_all_running_tasks_for_user(username):
-    """Auto-pauses all running tasks for a user (used on clock-out and logout)."""
-    conn = get_db()
-    c = conn.cursor()
-    c.execute("SELECT id, timer_start, act_time, title FROM tasks WHERE assignee=? AND timer_start IS NOT NULL", (username,))
-    running_tasks = c.fetchall()
-    
-    for r_task in running_tasks:
-        r_id, r_start_ts, r_act_time, r_title = r_task
-        r_act_time = r_act_time if r_act_time else 0.0
-        if r_start_ts:
-            r_start_dt = datetime.datetime.strptime(r_start_ts, "%Y-%m-%d %H:%M:%S")
-            r_diff_hours = (datetime.datetime.now() - r_start_dt).total_seconds() / 3600.0
-            r_new_act = r_act_time + r_diff_hours
-            c.execute("UPDATE tasks SET timer_start=NULL, act_time=? WHERE id=?", (r_new_act, r_id))
-            
-    conn.commit()
-    conn.close()
-
-# --- SHIPMENT FUNCTIONS ---
-def get_shipments():
-    conn = get_db()
-    conn.row_factory = sqlite3.Row
-    rows = [dict(r) for r in conn.execute("SELECT * FROM shipments ORDER BY date DESC").fetchall()]
-    conn.close()
-    return rows
-
-def add_shipment(s_id, date, am, dest, skus, qty):
-    conn = get_db()
-    conn.execute("INSERT INTO shipments VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
-                 (s_id, str(date), am, dest, skus, qty, "New", ""))
-    conn.commit()
-    conn.close()
-
-def update_shipment_details(s_id, dest, skus, qty, status):
-    conn = get_db()
-    conn.execute("UPDATE shipments SET dest=?, skus=?, qty=?, status=? WHERE id=?", 
-                 (dest, skus, qty, status, s_id))
-    conn.commit()
-    conn.close()
-
-# --- GEMINI AI ---
-api_key = st.sidebar.text_input("🔑 Gemini API Key", type="password") if "authenticated" in st.session_state and st.session_state.authenticated else None
-if api_key and AI_AVAILABLE:
-    genai.configure(api_key=api_key)
-
-def ask_gemini(prompt, context=""):
-    if not AI_AVAILABLE: return "Library not installed."
-    if not api_key: return "Enter API Key."
-    try:
-        model = genai.GenerativeModel('gemini-2.5-flash-preview-09-2025')
-        return model.generate_content(f"Titan AI Context: {context}. User: {prompt}").text
-    except Exception as e: return f"Error: {e}"
-
-# --- CSS STYLING (FLUID GLASS SPACE GRADIENT & ULTRA-MODERN UI) ---
-st.markdown("""
-<style>
-    @import url('https://fonts.googleapis.com/css2?family=Outfit:wght@300;400;500;600;700;800&display=swap');
-
-    :root {
-      --titan-surface: #1e293b;
-      --titan-surface-2: #334155;
-      --titan-border: rgba(148, 163, 184, 0.35);
-      --titan-border-2: rgba(148, 163, 184, 0.55);
-      --titan-text: #f8fafc;
-      --titan-muted: #cbd5e1;
-      --titan-focus: rgba(23, 210, 159, 0.35);
-    }
-
-    /* Make sure ALL text inside buttons is readable (Streamlit wraps labels in nested tags) */
-    div.stButton > button[kind] * {
-      color: var(--titan-text) !important;
-    }
-
-    /* --- BACKGROUND & GLOBAL --- */
-    .stApp {
-        background-color: #271759;
-        background-image: linear-gradient(120deg, #271759 0%, #0a719c 45%, #11c99f 100%);
-        background-attachment: fixed;
-        background-size: cover;
-        font-family: 'Outfit', sans-serif;
-        color: white;
-    }
-
-    /* --- SIDEBAR GLASS (SEAMLESS & FLUID) --- */
-    [data-testid="stSidebar"] {
-        background: rgba(13, 17, 30, 0.55) !important; 
-        backdrop-filter: blur(24px) !important;
-        -webkit-backdrop-filter: blur(24px) !important;
-        border-right: 1px solid rgba(255, 255, 255, 0.05) !important;
-    }
-    
-    /* --- SIDEBAR TITLES & TEXT --- */
-    [data-testid="stSidebar"] .titan-title {
-        font-size: 11px;
-        font-weight: 700;
-        color: #64748b;
-        text-transform: uppercase;
-        letter-spacing: 1.5px;
-        margin-bottom: 8px;
-        margin-top: 15px;
-        padding-left: 14px; 
-    }
-
-    /* --- NAVIGATION MENU TILES (FLUID LEFT-ALIGNED UI) --- */
-    [data-testid="stSidebar"] [data-testid="stRadio"] label > div:first-child { display: none; }
-    [data-testid="stSidebar"] [data-testid="stRadio"] > label { display: none !important; }
-    [data-testid="stSidebar"] [data-testid="stRadio"] div[role="radiogroup"] { 
-        gap: 2px; 
-        padding: 0 10px; 
-    }
-
-    /* Unselected Tile */
-    [data-testid="stSidebar"] [data-testid="stRadio"] label {
-        background: transparent !important; 
-        border: none !important; 
-        border-radius: 8px !important;
-        padding: 12px 14px !important;
-        margin-bottom: 2px !important;
-        transition: all 0.3s ease !important;
-        display: flex;
-        align-items: center;
-        justify-content: flex-start !important; 
-        width: 100% !important;
-        box-shadow: none !important;
-        cursor: pointer;
-    }
-    
-    [data-testid="stSidebar"] [data-testid="stRadio"] label:hover {
-        background: rgba(255, 255, 255, 0.04) !important; 
-        transform: translateX(4px); 
-    }
-
-    /* Selected Tile */
-    [data-testid="stSidebar"] [data-testid="stRadio"] label:has(input:checked) {
-        background: linear-gradient(90deg, rgba(255, 255, 255, 0.1) 0%, rgba(255, 255, 255, 0.01) 100%) !important; 
-        box-shadow: inset 3px 0 0 0 #17D29F !important; 
-        border-radius: 4px 8px 8px 4px !important;
-        transform: translateX(4px);
-    }
-
-    /* Tile Typography */
-    [data-testid="stSidebar"] [data-testid="stRadio"] label p {
-        color: #94a3b8 !important; 
-        font-weight: 500 !important; 
-        font-size: 14.5px !important; 
-        margin: 0 !important;
-        transition: color 0.3s ease;
-    }
-    
-    [data-testid="stSidebar"] [data-testid="stRadio"] label:hover p {
-        color: #cbd5e1 !important;
-    }
-
-    [data-testid="stSidebar"] [data-testid="stRadio"] label:has(input:checked) p {
-        color: #ffffff !important; 
-        font-weight: 600 !important;
-        letter-spacing: 0.3px;
-        text-shadow: 0 0 10px rgba(255, 255, 255, 0.2);
-    }
-    
-    /* --- SIDEBAR BUTTONS (Like CLOCK IN) --- */
-    [data-testid="stSidebar"] div.stButton > button[kind="primary"] {
-        background: linear-gradient(90deg, rgba(61,97,255,0.9), rgba(23,210,159,0.9)) !important;
-        border-radius: 8px !important; 
-        padding: 8px 20px !important;
-        width: calc(100% - 20px) !important; 
-        margin: 5px 10px 15px 10px !important;
-        font-weight: 600 !important;
-        font-size: 14px !important;
-        border: none !important;
-        box-shadow: 0 4px 15px rgba(23, 210, 159, 0.2) !important;
-        transition: all 0.3s ease !important;
-    }
-    [data-testid="stSidebar"] div.stButton > button[kind="primary"]:hover {
-        transform: translateY(-2px) !important;
-        box-shadow: 0 6px 20px rgba(23, 210, 159, 0.4) !important;
-        opacity: 1 !important;
-    }
-
-    /* Pulse Animation for Online Dot */
-    @keyframes pulse-dot {
-        0% { box-shadow: 0 0 0 0 rgba(23, 210, 159, 0.5); }
-        70% { box-shadow: 0 0 0 6px rgba(23, 210, 159, 0); }
-        100% { box-shadow: 0 0 0 0 rgba(23, 210, 159, 0); }
-    }
-
-    /* --- GLOBAL ACTIVE TIMER BAR STICKY CSS --- */
-    div.main .block-container > div:has(.active-timer-marker) {
-        position: sticky !important;
-        top: 2.875rem !important; /* Streamlit header offset */
-        z-index: 990 !important;
-        background: rgba(15, 23, 42, 0.85) !important;
-        backdrop-filter: blur(16px) !important;
-        -webkit-backdrop-filter: blur(16px) !important;
-        border: 1px solid rgba(23, 210, 159, 0.4) !important;
-        border-radius: 12px !important;
-        padding: 12px 20px !important;
-        box-shadow: 0 10px 30px rgba(0,0,0,0.5), 0 0 15px rgba(23, 210, 159, 0.1) !important;
-        margin-bottom: 1.5rem !important;
-        transition: all 0.3s ease;
-    }
-    .active-timer-marker { display: none; }
-
-    /* --- SECONDARY BUTTONS (Solid & Neat UI - NO GLASS) --- */
-    div.stButton > button[kind="secondary"] {
-      background: var(--titan-surface) !important;
-      border: 1px solid var(--titan-border) !important;
-      color: var(--titan-text) !important;
-      border-radius: 8px !important;
-      padding: 8px 14px !important;
-      box-shadow: 0 2px 8px rgba(0,0,0,0.16) !important;
-      transition: transform 0.15s ease, background 0.15s ease, border-color 0.15s ease !important;
-    }
-
-    div.stButton > button[kind="secondary"]:hover {
-      background: var(--titan-surface-2) !important;
-      border-color: var(--titan-border-2) !important;
-      transform: translateY(-1px) !important;
-    }
-
-    div.stButton > button[kind="secondary"]:focus-visible {
-      outline: 2px solid var(--titan-focus) !important;
-      outline-offset: 2px !important;
-    }
-
-    div.stButton > button[kind="secondary"]:disabled {
-      opacity: 0.55 !important;
-      cursor: not-allowed !important;
-      transform: none !important;
-    }
-
-    /* Popover trigger buttons (✏️, 💬, ⭐) — these are the “white squares” in your screenshot */
-    div[data-testid="stPopover"] > button,
-    div[data-testid="stPopover"] button {
-      background: var(--titan-surface) !important;
-      border: 1px solid var(--titan-border) !important;
-      color: var(--titan-text) !important;
-      border-radius: 10px !important;
-      min-height: 40px !important;
-      padding: 6px 12px !important;
-      box-shadow: 0 2px 8px rgba(0,0,0,0.16) !important;
-      transition: transform 0.15s ease, background 0.15s ease, border-color 0.15s ease !important;
-    }
-
-    div[data-testid="stPopover"] > button:hover,
-    div[data-testid="stPopover"] button:hover {
-      background: var(--titan-surface-2) !important;
-      border-color: var(--titan-border-2) !important;
-      transform: translateY(-1px) !important;
-    }
-
-    div[data-testid="stPopover"] > button:focus-visible,
-    div[data-testid="stPopover"] button:focus-visible {
-      outline: 2px solid var(--titan-focus) !important;
-      outline-offset: 2px !important;
-    }
-
-    /* Optional: placeholder readability (often too faint) */
-    input::placeholder {
-      color: rgba(203,213,225,0.75) !important;
-      opacity: 1 !important;
-    }
-    
-    /* --- PRIMARY BUTTONS (Main Action UI - NO GLASS) --- */
-    .main div.stButton > button[kind="primary"] {
-        background: #ef4444; /* Vivid neat red for standard stop/create actions */
-        border: 1px solid #dc2626;
-        color: white;
-        border-radius: 6px; 
-        font-weight: 600;
-        letter-spacing: 0.2px;
-        transition: all 0.2s ease;
-        box-shadow: 0 2px 6px rgba(239, 68, 68, 0.3);
-    }
-    .main div.stButton > button[kind="primary"]:hover {
-        background: #dc2626; 
-        border-color: #b91c1c;
-        transform: translateY(-1px);
-        box-shadow: 0 4px 10px rgba(239, 68, 68, 0.4);
-    }
-
-    /* --- TITAN ELEMENTS --- */
-    h1, h2, h3 {
-        color: white !important;
-        text-shadow: 0px 2px 10px rgba(0,0,0,0.3);
-        font-weight: 800;
-        letter-spacing: -0.5px;
-    }
-    .titan-card {
-        background: rgba(255, 255, 255, 0.08); backdrop-filter: blur(16px);
-        border-radius: 12px; border: 1px solid rgba(255, 255, 255, 0.12);
-        padding: 24px; box-shadow: 0 8px 32px 0 rgba(0, 0, 0, 0.1); margin-bottom: 15px;
-    }
-
-    /* --- TITAN CHIPS --- */
-    .titan-chip {
-        display: inline-block;
-        padding: 2px 8px;
-        border-radius: 6px;
-        font-size: 10.5px;
-        font-weight: 700;
-        text-transform: uppercase;
-        letter-spacing: 0.5px;
-        white-space: nowrap;
-    }
-    .chip-done { background: rgba(23, 210, 159, 0.15); color: #17D29F; border: 1px solid rgba(23, 210, 159, 0.3); }
-    .chip-progress { background: rgba(59, 130, 246, 0.15); color: #60a5fa; border: 1px solid rgba(59, 130, 246, 0.3); }
-    .chip-todo { background: rgba(148, 163, 184, 0.15); color: #cbd5e1; border: 1px solid rgba(148, 163, 184, 0.3); }
-    .chip-high { background: rgba(239, 68, 68, 0.15); color: #f87171; border: 1px solid rgba(239, 68, 68, 0.3); }
-    .chip-med { background: rgba(245, 158, 11, 0.15); color: #fbbf24; border: 1px solid rgba(245, 158, 11, 0.3); }
-    .chip-low { background: rgba(148, 163, 184, 0.1); color: #94a3b8; border: 1px solid rgba(148, 163, 184, 0.2); }
-    .chip-overdue { background: rgba(220, 38, 38, 0.2) !important; color: #fca5a5 !important; border: 1px solid rgba(220, 38, 38, 0.5) !important; }
-    
-    /* --- INPUTS, SELECTBOXES & MULTISELECTS (Solid Slate Design) --- */
-    .stTextInput input, 
-    .stSelectbox div[data-baseweb="select"] > div, 
-    .stMultiSelect div[data-baseweb="select"] > div, 
-    .stNumberInput input {
-        background-color: #1e293b !important; /* Solid elegant slate blue */
-        color: white !important;
-        border: 1px solid #334155 !important; 
-        border-radius: 8px !important;
-        box-shadow: inset 0 2px 4px rgba(0,0,0,0.1) !important;
-        transition: all 0.2s ease !important;
-    }
-    .stTextInput input:focus, 
-    .stSelectbox div[data-baseweb="select"] > div:focus-within, 
-    .stMultiSelect div[data-baseweb="select"] > div:focus-within {
-        border-color: #17D29F !important;
-        box-shadow: 0 0 0 1px rgba(23, 210, 159, 0.3) !important;
-    }
-    
-    /* Ensure text inside the input selection is strictly white */
-    div[data-baseweb="select"] div {
-        color: white !important;
-    }
-    div[data-baseweb="select"] svg {
-        fill: #94a3b8 !important; /* Ensure dropdown arrow is visible */
-    }
-
-    /* =====================================================================
-       AGGRESSIVE STREAMLIT POPOVER & DROPDOWN MENU FIXES
-       ===================================================================== */
-    /* Target the base web popover portal completely independent of DOM tree */
-    div[data-baseweb="popover"],
-    div[data-baseweb="popover"] > div {
-        background-color: transparent !important;
-    }
-
-    /* Outer Popover container */
-    div[data-baseweb="popover"] > div[data-placement] > div {
-        background-color: #1e293b !important; /* Solid slate blue */
-        border: 1px solid #334155 !important;
-        border-radius: 8px !important;
-        box-shadow: 0 10px 40px -5px rgba(0,0,0,0.8) !important;
-        padding: 4px !important;
-        overflow: hidden !important;
-    }
-
-    /* Virtual dropdown container wrapper */
-    div[data-testid="stVirtualDropdown"],
-    ul[data-baseweb="menu"], 
-    ul[role="listbox"] {
-        background-color: #1e293b !important;
-        outline: none !important;
-        border: none !important;
-    }
-
-    /* Individual dropdown options */
-    li[role="option"] {
-        background-color: #1e293b !important; /* Explicitly dark */
-        color: #cbd5e1 !important; /* Slate gray text */
-        border-radius: 6px !important;
-        margin: 2px !important;
-        padding: 10px 14px !important; 
-        font-size: 14.5px !important;
-        font-weight: 500 !important;
-        border-bottom: none !important;
-        transition: all 0.2s ease !important;
-        display: flex !important;
-        align-items: center !important;
-    }
-
-    /* Force text elements inside to inherit correct colors */
-    li[role="option"] span,
-    li[role="option"] div,
-    li[role="option"] p {
-        color: inherit !important;
-        font-family: 'Outfit', sans-serif !important;
-    }
+            c1, c2, c3 = st.columns([3, 1, 1])
+            with c1:
+                st.markdown(f"""
+                    <div class="timer-bar"><div class="titan-pulse"></div><b>{active_task['title']}</b>
+                    <span>&nbsp;|&nbsp; 🏢 {company_str} &nbsp;|&nbsp; ⏱️ Started: {started_at} (Elapsed: {elapsed_str})</span></div>
+                """, unsafe_allow_html=True)
+            with c2:
+                if st.button("⏸ Pause", key="global_pause", type="secondary", use_container_width=True):
+                    run_task_timer(active_task['id'], 'pause', user['username'])
+                    safe_rerun()
+            with c3:
+                if st.button("⏹ Stop & Finish", key="global_stop", type="primary", use_container_width=True):
+                    run_task_timer(active_task['id'], 'stop', user['username'])
+                    safe_rerun()
 
-    /* Hover and Selected state for options */
-    li[role="option"]:hover, 
-    li[role="option"][aria-selected="true"], 
-    li[role="option"][aria-highlighted="true"] {
-        background-color: #3b82f6 !important; /* Solid vibrant blue */
-        color: #ffffff !important; /* Pure white text */
-        transform: translateX(4px) !important; /* Elegant indent */
-        cursor: pointer !important;
-    }
+@st.fragment(run_every=LIVE_REFRESH_SECONDS)
+def live_attendance():
+    workers = cached(('live_workers',), ['work_logs', 'users'], get_live_workers)
+    if workers:
+        cols = st.columns(4)
+        for i, w in enumerate(workers):
+            with cols[i % 4]:
+                st.markdown(f"""
+                <div class="worker-card"><div class="name">{w['name']}</div><div class="since">Online since {w['since'][11:16]}</div></div>
+                """, unsafe_allow_html=True)
+    else:
+        st.caption("No active shifts.")
+
+HISTORY_PAGE_SIZE = 15
+
+@st.fragment
+def task_history(task_id):
+    """Change log for the detail view: nothing is fetched until it is opened, then one page per click."""
+    if not st.toggle("🕘 Change history", key=f"history_on_{task_id}"):
+        return
+    pages = st.session_state.setdefault(f"history_pages_{task_id}", [None])  # before_id per page shown
+    rows = get_task_history(task_id, HISTORY_PAGE_SIZE, pages[-1])
+    if not rows:
+        st.caption("No changes recorded yet.")
+    for r in rows:
+        st.markdown(f"**{r['actor'] or 'system'}** changed **{r['field']}**: {r['old'] if r['old'] is not None else '—'} → {r['new'] if r['new'] is not None else '—'}")
+        st.caption(r['at'])
+    h1, h2 = st.columns(2)
+    if len(pages) > 1 and h1.button("⬅ Newer", key=f"history_newer_{task_id}", use_container_width=True):
+        pages.pop()
+        st.rerun(scope="fragment")
+    if len(rows) == HISTORY_PAGE_SIZE and h2.button("Older ➡", key=f"history_older_{task_id}", use_container_width=True):
+        pages.append(rows[-1]['id'])
+        st.rerun(scope="fragment")
+
+def subtask_panel(t, user):
+    """Project totals (one task_rollups read) and the direct subtasks of the task in the detail view."""
+    st.markdown("### 🧩 Subtasks")
+    roll = get_rollup(t['id'])
+    if roll and roll['task_count'] > 1:
+        m1, m2, m3 = st.columns(3)
+        m1.metric("Done", f"{roll['done']} / {roll['task_count']}")
+        m2.metric("Hours", f"{roll['hours']:.1f}")
+        m3.metric("Avg Rating", f"{roll['avg_rating']:.1f} ★" if roll['avg_rating'] else "—")
+        st.progress(roll['progress'])
+        for sub in get_subtasks(t['id']):
+            s1, s2 = st.columns([5, 1])
+            extra = f" · {sub['task_count'] - 1} subtasks" if sub['task_count'] > 1 else ""
+            s1.markdown(f"**{sub['title']}** · {sub['assignee_name']} · {sub['status']} · {sub['hours']:.1f} h{extra}")
+            if s2.button("Open", key=f"open_sub_{sub['id']}", use_container_width=True):
+                st.session_state.view_task_id = sub['id']
+                safe_rerun()
+    with st.popover("➕ Add subtask"):
+        team = get_all_users()
+        team_names = dict(zip(team['username'], team['name']))
+        sub_title = st.text_input("Title", key=f"sub_title_{t['id']}")
+        sub_assignee = st.selectbox("Assign To", list(team_names), format_func=team_names.get,
+                                    index=list(team_names).index(t['assignee']) if t['assignee'] in team_names else 0,
+                                    key=f"sub_assignee_{t['id']}")
+        sub_date = st.date_input("Planned Date", datetime.date.today(), key=f"sub_date_{t['id']}")
+        if st.button("Create Subtask", key=f"sub_create_{t['id']}", type="primary") and sub_title:
+            add_task(sub_title, sub_assignee, t['company'], t['category'], sub_date, parent_id=t['id'])
+            safe_rerun()
 
-    /* Remove default popover arrow arrows */
-    div[data-baseweb="popover"] div[data-baseweb="arrow"] {
-        display: none !important; 
-    }
+COMMENT_PAGE_SIZE = 20
 
-    /* --- MULTISELECT TAGS (CHIPS) --- */
-    span[data-baseweb="tag"] {
-        background-color: #334155 !important;
-        border: 1px solid #475569 !important;
-        color: white !important;
-        border-radius: 6px !important;
-        padding: 2px 6px !important;
-        margin: 3px !important;
-    }
-    span[data-baseweb="tag"] span {
-        color: white !important;
-        font-weight: 600 !important;
-        font-size: 13px !important;
-    }
-    span[data-baseweb="tag"] svg {
-        fill: #94a3b8 !important;
-    }
-    span[data-baseweb="tag"] span[role="presentation"]:hover {
-        background-color: #ef4444 !important; /* Solid red hover for delete */
-        border-radius: 4px !important;
-    }
-    span[data-baseweb="tag"] span[role="presentation"]:hover svg {
-        fill: #ffffff !important;
-    }
+@st.fragment
+def comment_thread(task_id, viewer, unread=0, compact=False):
+    """Newest COMMENT_PAGE_SIZE comments, older pages on request; viewing them marks the thread read.
 
-    /* Style Tabs to look modern */
-    .stTabs [data-baseweb="tab-list"] { background-color: transparent; gap: 20px; }
-    .stTabs [data-baseweb="tab"] { color: #e2e8f0; background-color: transparent; border-radius: 8px 8px 0 0; }
-    .stTabs [aria-selected="true"] { color: #17D29F !important; border-bottom-color: #17D29F !important; }
-</style>
-""", unsafe_allow_html=True)
+    compact (the My Desk popover, whose body runs on every rerun) fetches nothing until its toggle is on.
+    """
+    if compact and not st.toggle(f"Show comments ({unread} new)" if unread else "Show comments", key=f"comments_on_{task_id}"):
+        rows = []
+    else:
+        pages = st.session_state.setdefault(f"comment_pages_{task_id}", [None])  # before_id per page loaded
+        rows = [r for before_id in pages for r in get_comments_page(task_id, COMMENT_PAGE_SIZE, before_id)]
+        if len(rows) == COMMENT_PAGE_SIZE * len(pages) and st.button("⬆ Load older", key=f"comments_older_{task_id}", use_container_width=True):
+            pages.append(rows[-1]['id'])
+            st.rerun(scope="fragment")
+        with st.container(height=None if compact else 300):
+            if not rows:
+                st.caption("No comments yet.")
+            for c in reversed(rows):
+                if compact:
+                    st.markdown(f"<small><b>{c['username']}</b> ({c['timestamp']}): {c['comment']}</small>", unsafe_allow_html=True)
+                else:
+                    st.markdown(f"**{c['username']}**: {c['comment']}")
+                    st.caption(f"{c['timestamp']}")
+                st.divider()
+        if unread and rows:
+            mark_read(viewer['username'], task_id, rows[0]['id'])
+
+    new_c = st.text_input("Add comment" if compact else "Add a note...", key=f"nc_{task_id}")
+    if st.button("Post" if compact else "Post Comment", key=f"pc_{task_id}", type="secondary" if compact else "primary"):
+        add_comment(task_id, viewer['name'], new_c, reader=viewer['username'])
+        st.session_state.pop(f"comment_pages_{task_id}", None)
+        safe_rerun()
 
-# --- HELPER FUNCTIONS ---
-def safe_rerun():
-    time.sleep(0.1)
-    st.rerun()
+@st.fragment(run_every=LIVE_REFRESH_SECONDS)
+def shipment_board():
+    for s in cached(('shipments',), ['shipments'], get_shipments):
+        st.markdown(f"<div class='titan-card'>{s['id']} to {s['dest']} ({s['qty']} units)</div>", unsafe_allow_html=True)
 
 # --- AUTHENTICATION FLOW ---
-if "authenticated" not in st.session_state:
-    st.session_state.authenticated = False
-
 def login():
     col1, col2, col3 = st.columns([1, 2, 1])
     with col2:
         st.markdown("<br><br><br>", unsafe_allow_html=True)
         st.markdown("""
-        <div style="background: rgba(255,255,255,0.05); backdrop-filter: blur(20px); border: 1px solid rgba(255,255,255,0.15); border-radius: 24px; padding: 40px; text-align: center; margin-bottom: 25px;">
-            <h1 style="font-size: 42px; margin-bottom: 5px;">TITAN CONTROL</h1>
-            <p style="color: #e2e8f0; font-size: 18px;">Secure Enterprise Access</p>
+        <div class="login-hero">
+            <h1>TITAN CONTROL</h1>
+            <p>Secure Enterprise Access</p>
         </div>
         """, unsafe_allow_html=True)
         
@@ -887,6 +227,7 @@ def login():
                 if st.form_submit_button("LOGIN", type="primary", use_container_width=True):
                     user = verify_user(u, p)
                     if user:
+                        st.query_params["session"] = sessions.issue(user['username'])
                         st.session_state.authenticated = True
                         st.session_state.user = user
                         st.success("Authenticated Successfully")
@@ -936,16 +277,13 @@ else:
     user = st.session_state.user
     
     # --- SIDEBAR UI (SEAMLESS & CLEAN) ---
-    st.sidebar.markdown('<div class="titan-title" style="margin-top: 5px;">TITAN OS</div>', unsafe_allow_html=True)
+    st.sidebar.markdown('<div class="titan-title is-first">TITAN OS</div>', unsafe_allow_html=True)
     
     # Big Boss Style User Card (No more clunky box, blends into sidebar)
     st.sidebar.markdown(f"""
-    <div style="padding: 5px 14px 20px 14px; border-bottom: 1px solid rgba(255,255,255,0.05); display: flex; align-items: center; gap: 14px;">
-        <div style="font-size: 20px; background: linear-gradient(135deg, rgba(255,255,255,0.15), rgba(255,255,255,0.02)); width: 44px; height: 44px; display: flex; align-items: center; justify-content: center; border-radius: 50%; border: 1px solid rgba(255,255,255,0.1); box-shadow: inset 0 2px 4px rgba(255,255,255,0.05);">{user['avatar']}</div>
-        <div style="line-height: 1.2;">
-            <div style="font-weight: 700; font-size: 15.5px; color: white; letter-spacing: 0.2px;">{user['name']}</div>
-            <div style="font-size: 11.5px; color: #94a3b8; font-weight: 500;">{user['role']}</div>
-        </div>
+    <div class="user-badge">
+        <div class="avatar">{user['avatar']}</div>
+        <div class="who"><div class="name">{user['name']}</div><div class="role">{user['role']}</div></div>
     </div>
     """, unsafe_allow_html=True)
 
@@ -956,23 +294,17 @@ else:
     if is_working:
         # Seamless Online Indicator with CSS Pulse
         st.sidebar.markdown(f"""
-        <div style="margin: 0 10px 10px 10px; padding: 10px 12px; display: flex; align-items: center; color: #17D29F; font-size: 13.5px; font-weight: 500; background: rgba(23, 210, 159, 0.05); border-radius: 8px;">
-            <div style="width: 8px; height: 8px; background: #17D29F; border-radius: 50%; display: inline-block; margin-right: 12px; animation: pulse-dot 2s infinite;"></div>
-            Working since {last_event[1][11:16]}
-        </div>
+        <div class="clock-status"><div class="titan-pulse"></div>Working since {last_event[1][11:16]}</div>
         """, unsafe_allow_html=True)
         if st.sidebar.button("CLOCK OUT", type="primary"):
-            pause_all_running_tasks_for_user(user['name'])
+            pause_all_running_tasks_for_user(user['username'])
             log_work_event(user['username'], 'CLOCK_OUT')
             st.success("Shift Ended. All active tasks paused.")
             safe_rerun()
     else:
         # Seamless Offline Indicator
         st.sidebar.markdown(f"""
-        <div style="margin: 0 10px 10px 10px; padding: 10px 12px; display: flex; align-items: center; color: #94a3b8; font-size: 13.5px; font-weight: 500; background: rgba(255,255,255,0.02); border-radius: 8px;">
-            <div style="width: 8px; height: 8px; background: #475569; border-radius: 50%; display: inline-block; margin-right: 12px;"></div>
-            Currently Offline
-        </div>
+        <div class="clock-status is-off"><div class="titan-pulse is-off"></div>Currently Offline</div>
         """, unsafe_allow_html=True)
         if st.sidebar.button("CLOCK IN", type="primary"):
             log_work_event(user['username'], 'CLOCK_IN')
@@ -983,46 +315,23 @@ else:
     
     # Fluid Left-Aligned Navigation List
     nav_opts = ["Dashboard", "My Desk", "Team Calendar", "3PL Logistics", "Team & Reports", "Inventory & SOPs", "AI Assistant 🤖"]
+    if user['is_admin']:
+        nav_opts.append("Diagnostics 🩺")
     page = st.sidebar.radio("Navigation", nav_opts, label_visibility="hidden")
+    profiler.set_run_label(page)
     
     st.sidebar.markdown("<br><br>", unsafe_allow_html=True)
     if st.sidebar.button("LOGOUT", type="primary"):
-        pause_all_running_tasks_for_user(user['name'])
+        pause_all_running_tasks_for_user(user['username'])
+        sessions.revoke(st.query_params.get("session"))
+        st.query_params.pop("session", None)
         st.session_state.authenticated = False
         safe_rerun()
 
     # --- ACTIVE TIMER BAR (GLOBAL) ---
-    active_task = get_running_task_for_user(user['name'])
-    if active_task:
-        with st.container():
-            st.markdown('<div class="active-timer-marker"></div>', unsafe_allow_html=True)
-            
-            # Calculate elapsed time
-            start_dt = datetime.datetime.strptime(active_task['timer_start'], "%Y-%m-%d %H:%M:%S")
-            elapsed = datetime.datetime.now() - start_dt
-            elapsed_hours = int(elapsed.total_seconds() // 3600)
-            elapsed_minutes = int((elapsed.total_seconds() % 3600) // 60)
-            elapsed_str = f"{elapsed_hours}h {elapsed_minutes}m"
-            started_at = start_dt.strftime("%H:%M")
-            company_str = active_task['company'] if active_task['company'] else 'Internal'
-            
-            c1, c2, c3 = st.columns([3, 1, 1])
-            with c1:
-                st.markdown(f"""
-                    <div style="display: flex; align-items: center; gap: 10px; padding-top: 5px;">
-                        <div style="width: 10px; height: 10px; background: #17D29F; border-radius: 50%; box-shadow: 0 0 8px #17D29F; animation: pulse-dot 2s infinite;"></div>
-                        <b style="color: white; font-size: 15px; letter-spacing: 0.3px;">{active_task['title']}</b>
-                        <span style="color: #cbd5e1; font-size: 13px;">&nbsp;|&nbsp; 🏢 {company_str} &nbsp;|&nbsp; ⏱️ Started: {started_at} (Elapsed: {elapsed_str})</span>
-                    </div>
-                """, unsafe_allow_html=True)
-            with c2:
-                if st.button("⏸ Pause", key="global_pause", type="secondary", use_container_width=True):
-                    handle_task_timer(active_task['id'], 'pause', user['name'])
-                    safe_rerun()
-            with c3:
-                if st.button("⏹ Stop & Finish", key="global_stop", type="primary", use_container_width=True):
-                    handle_task_timer(active_task['id'], 'stop', user['name'])
-                    safe_rerun()
+    active_timer_bar(user)
+
+    profiler.start_section(f"page:{page}")
 
     # --- PAGE: DASHBOARD ---
     if page == "Dashboard":
@@ -1038,14 +347,17 @@ else:
                     st.session_state.view_task_id = None
                     safe_rerun()
                     
+                trail = get_ancestors(t['id'])
+                if trail:
+                    st.caption(" › ".join(title for _, title in trail))
                 st.markdown(f"# 📌 {t['title']}")
                 
                 c1, c2 = st.columns([2, 1])
                 with c1:
                     st.markdown(f"""
                     <div class="titan-card">
-                        <h3 style="margin-top:0">Task Details</h3>
-                        <p><b>Assignee:</b> {t['assignee']}</p>
+                        <h3>Task Details</h3>
+                        <p><b>Assignee:</b> {t['assignee_name']}</p>
                         <p><b>Company:</b> {t['company']}</p>
                         <p><b>Category:</b> {t['category']}</p>
                         <p><b>Status:</b> {t['status']}</p>
@@ -1060,39 +372,32 @@ else:
                             st.info("Timer is RUNNING")
                             tc1, tc2 = st.columns(2)
                             if tc1.button("⏸ Pause Timer", key="det_pause", type="secondary", use_container_width=True):
-                                handle_task_timer(t['id'], 'pause', user['name'])
+                                run_task_timer(t['id'], 'pause', user['username'])
                                 safe_rerun()
                             if tc2.button("⏹ Stop & Finish", key="det_stop", type="primary", use_container_width=True):
-                                handle_task_timer(t['id'], 'stop', user['name'])
+                                run_task_timer(t['id'], 'stop', user['username'])
                                 safe_rerun()
                         else:
                             if st.button("▶ Start Timer", key="det_start", type="secondary", use_container_width=True):
-                                handle_task_timer(t['id'], 'start', user['name'])
+                                run_task_timer(t['id'], 'start', user['username'])
                                 safe_rerun()
 
+                    task_history(t['id'])
+                    subtask_panel(t, user)
+
                 with c2:
                     st.markdown("### 💬 Comments")
-                    comments = get_comments(t['id'])
-                    with st.container(height=300):
-                        for c in comments:
-                            st.markdown(f"**{c['username']}**: {c['comment']}")
-                            st.caption(f"{c['timestamp']}")
-                            st.divider()
-                    
-                    new_c = st.text_input("Add a note...")
-                    if st.button("Post Comment", type="primary"):
-                        add_comment(t['id'], user['name'], new_c)
-                        safe_rerun()
+                    comment_thread(t['id'], user, get_unread_counts(user['username'], [t['id']]).get(t['id'], 0))
 
         # -- DASHBOARD VIEW --
         else:
             st.markdown("# Executive Overview")
             
-            tasks = get_tasks()
-            total = len(tasks)
-            in_progress = len([t for t in tasks if t['status'] == 'In Progress'])
-            todo = len([t for t in tasks if t['status'] == 'To Do'])
-            done = len([t for t in tasks if t['status'] == 'Done'])
+            summary = get_task_summary(replica=True)
+            total = sum(summary['counts'].values())
+            in_progress = summary['counts'].get('In Progress', 0)
+            todo = summary['counts'].get('To Do', 0)
+            done = summary['counts'].get('Done', 0)
             completion = int((done/total*100)) if total > 0 else 0
 
             # Session Filter
@@ -1124,44 +429,23 @@ else:
             fc1, fc2, fc3, fc4 = st.columns([2, 1, 1, 1])
             search = fc1.text_input("Search", placeholder="Search tasks...", label_visibility="collapsed")
             
-            all_companies = sorted(list(set([t['company'] for t in tasks if t['company']])))
+            all_companies = summary['companies']
             all_priorities = ["High", "Medium", "Low"]
             
             filter_company = fc2.multiselect("Company", all_companies, placeholder="Company", label_visibility="collapsed")
             filter_priority = fc3.multiselect("Priority", all_priorities, placeholder="Priority", label_visibility="collapsed")
             filter_timing = fc4.selectbox("Timing", ["All Time", "Due Today", "Overdue", "Next 7 Days"], label_visibility="collapsed")
 
-            # Filter Logic
-            filtered = tasks
-            if st.session_state.dash_filter != "All":
-                filtered = [t for t in tasks if t['status'] == st.session_state.dash_filter]
-            
-            if search:
-                filtered = [t for t in filtered if search.lower() in t['title'].lower() or search.lower() in t['assignee'].lower()]
-            if filter_company:
-                filtered = [t for t in filtered if t['company'] in filter_company]
-            if filter_priority:
-                filtered = [t for t in filtered if t['priority'] in filter_priority]
-
-            # Timing Logic
-            today_str = str(datetime.date.today())
-            next_7_str = str(datetime.date.today() + datetime.timedelta(days=7))
-            
-            if filter_timing == "Due Today":
-                filtered = [t for t in filtered if t.get('planned_date') == today_str]
-            elif filter_timing == "Overdue":
-                filtered = [t for t in filtered if t.get('planned_date') and t['planned_date'] < today_str and t['status'] != 'Done']
-            elif filter_timing == "Next 7 Days":
-                filtered = [t for t in filtered if t.get('planned_date') and today_str <= t['planned_date'] <= next_7_str]
+            # Filtered in SQL and fetched as typed columns of just the grid fields
+            df = get_task_grid(st.session_state.dash_filter, search, tuple(filter_company), tuple(filter_priority), filter_timing, replica=True)
 
             # Modern Data Grid with Selection
-            df = pd.DataFrame(filtered)
             if not df.empty:
                 event = st.dataframe(
                     df[['title', 'assignee', 'company', 'status', 'priority', 'planned_date', 'act_time']],
                     use_container_width=True,
                     on_select="rerun",
-                    selection_mode="single-row",
+                    selection_mode="multi-row",
                     column_config={
                         "act_time": st.column_config.NumberColumn("Hours", format="%.2f"),
                         "status": st.column_config.TextColumn("Status"),
@@ -1173,53 +457,70 @@ else:
                     hide_index=True
                 )
                 
-                # Handling Selection to Open Detail View
-                if len(event.selection.rows) > 0:
-                    selected_index = event.selection.rows[0]
-                    # Find correct ID
-                    task_id = df.iloc[selected_index]['id'] if 'id' in df.columns else filtered[selected_index]['id']
-                    st.session_state.view_task_id = int(task_id)
-                    safe_rerun()
+                # Selection: open a single task, or apply one bulk action to all selected rows
+                selected_ids = [int(i) for i in df['id'].iloc[event.selection.rows]]
+                if selected_ids:
+                    bulk_action = None
+                    st.caption(f"{len(selected_ids)} selected")
+                    b0, b1, b2, b3, b4, b5 = st.columns(6)
+                    if len(selected_ids) == 1 and b0.button("📂 Open", key="bulk_open", use_container_width=True):
+                        st.session_state.view_task_id = selected_ids[0]
+                        safe_rerun()
+                    with b1.popover("👤 Reassign", use_container_width=True):
+                        team = get_all_users()
+                        names = dict(zip(team['username'], team['name']))
+                        n_assignee = st.selectbox("Assign To", list(names), format_func=names.get, key="bulk_assignee")
+                        if st.button("Apply", key="bulk_apply_assignee", type="primary"):
+                            bulk_action = ("reassign", n_assignee)
+                    with b2.popover("🔄 Status", use_container_width=True):
+                        n_stat = st.selectbox("Status", ["To Do", "In Progress", "Done"], key="bulk_status")
+                        if st.button("Apply", key="bulk_apply_status", type="primary"):
+                            bulk_action = ("status", n_stat)
+                    with b3.popover("🚩 Priority", use_container_width=True):
+                        n_prio = st.selectbox("Priority", all_priorities, key="bulk_priority")
+                        if st.button("Apply", key="bulk_apply_priority", type="primary"):
+                            bulk_action = ("priority", n_prio)
+                    with b4.popover("📅 Reschedule", use_container_width=True):
+                        n_days = st.number_input("Shift by (days)", value=1, step=1, key="bulk_shift")
+                        if st.button("Apply", key="bulk_apply_shift", type="primary"):
+                            bulk_action = ("shift", n_days)
+                    if user['is_admin']:
+                        with b5.popover("⭐ Rate", use_container_width=True):
+                            n_rating = st.slider("Quality", 1, 5, 5, key="bulk_rating")
+                            n_feed = st.text_input("Feedback", key="bulk_feedback")
+                            if st.button("Apply", key="bulk_apply_rating", type="primary"):
+                                bulk_action = ("rate", n_rating)
+
+                    if bulk_action:
+                        changed = bulk_update_tasks(selected_ids, *bulk_action, feedback=n_feed if bulk_action[0] == "rate" else "",
+                                                    actor=user['username'])
+                        catch_up()
+                        st.toast(f"Updated {changed} of {len(selected_ids)} tasks")
+                        safe_rerun()
             else:
                 st.info("No tasks found.")
 
             # Live Attendance Section
             st.markdown("---")
             st.markdown("### 👥 Live Attendance")
-            workers = get_live_workers()
-            if workers:
-                cols = st.columns(4)
-                for i, w in enumerate(workers):
-                    with cols[i % 4]:
-                        st.markdown(f"""
-                        <div style="background:rgba(23, 210, 159, 0.15); border:1px solid #17D29F; padding:10px; border-radius:10px;">
-                            <div style="font-weight:bold; color:white;">{w['name']}</div>
-                            <div style="font-size:12px; color:#17D29F;">Online since {w['since'][11:16]}</div>
-                        </div>
-                        """, unsafe_allow_html=True)
-            else:
-                st.caption("No active shifts.")
+            live_attendance()
 
     # --- OTHER PAGES ---
     elif page == "My Desk":
         st.markdown("# 💻 My Desk")
         
-        my_tasks_all = [t for t in get_tasks() if t['assignee'] == user['name']]
+        # Only the caller's own tasks (served by idx_tasks_assignee_status_date); admins can switch to the whole team
+        team_view = user['is_admin'] and st.toggle("👥 Team view", key="desk_team_view")
+        my_tasks_all = get_user_tasks(user['username'])
         completed_my = [t for t in my_tasks_all if t['status'] == 'Done']
         avg_rating = 0
         rated = [t for t in completed_my if t['rating']]
         if rated: avg_rating = sum([t['rating'] for t in rated]) / len(rated)
         
         st.markdown(f"""
-        <div class="titan-card" style="display:flex; justify-content:space-around; align-items:center;">
-            <div style="text-align:center;">
-                <div style="font-size:24px; font-weight:bold; color:#FF4081;">{avg_rating:.1f} ★</div>
-                <div style="font-size:11px; text-transform:uppercase; color:#e2e8f0;">Avg Quality Rating</div>
-            </div>
-            <div style="text-align:center;">
-                <div style="font-size:24px; font-weight:bold; color:#17D29F;">{len(completed_my)}</div>
-                <div style="font-size:11px; text-transform:uppercase; color:#e2e8f0;">Tasks Finished</div>
-            </div>
+        <div class="titan-card titan-stats">
+            <div class="titan-stat"><div class="value is-rating">{avg_rating:.1f} ★</div><div class="label">Avg Quality Rating</div></div>
+            <div class="titan-stat"><div class="value is-done">{len(completed_my)}</div><div class="label">Tasks Finished</div></div>
         </div>
         """, unsafe_allow_html=True)
         
@@ -1229,10 +530,10 @@ else:
                 title = c1.text_input("Task Title")
                 
                 users = get_all_users()
-                names = users['name'].tolist()
-                try: def_idx = names.index(user['name'])
+                names = {None: "⚖️ Auto (least loaded)", **dict(zip(users['username'], users['name']))}
+                try: def_idx = list(names).index(user['username'])
                 except: def_idx = 0
-                assignee = c2.selectbox("Assign To", names, index=def_idx)
+                assignee = c2.selectbox("Assign To", list(names), index=def_idx, format_func=names.get)
                 
                 c3, c4, c5 = st.columns([2, 2, 2])
                 comps = get_companies()
@@ -1242,12 +543,40 @@ else:
                 p_date = c5.date_input("Planned Date", datetime.date.today())
                 
                 if st.form_submit_button("Create Task", type="primary"):
-                    add_task(title, assignee, comp, cat, p_date)
-                    st.success("Task Created")
+                    assigned = add_task(title, assignee, comp, cat, p_date)
+                    st.success(f"Task Created for {names.get(assigned, assigned)}")
                     safe_rerun()
         
-        tasks = get_tasks()
-        my_tasks = [t for t in tasks if user['is_admin'] or t['assignee'] == user['name'] or True] 
+        with st.expander("🔁 Recurring Tasks", expanded=False):
+            with st.form("new_template"):
+                c1, c2 = st.columns(2)
+                r_title = c1.text_input("Task Title", key="tpl_title")
+                team = get_all_users()
+                team_names = dict(zip(team['username'], team['name']))
+                r_assignee = c2.selectbox("Assign To", list(team_names), format_func=team_names.get, key="tpl_assignee")
+                c3, c4, c5 = st.columns(3)
+                r_comp = c3.selectbox("Company", get_companies() or ["Internal"], key="tpl_company")
+                r_cat = c4.selectbox("Category", ["Admin", "Sales", "Logistics", "IT", "Research"], key="tpl_category")
+                r_start = c5.date_input("Starting", datetime.date.today(), key="tpl_start")
+                c6, c7 = st.columns(2)
+                r_freq = c6.selectbox("Repeats", ["Every weekday", "Daily", "Weekly", "Monthly"], key="tpl_freq")
+                r_days = c7.multiselect("On days (weekly)", list(WEEKDAYS), default=["MO"], key="tpl_days")
+                if st.form_submit_button("Save Template", type="primary"):
+                    rule = {"Every weekday": "FREQ=DAILY;BYDAY=MO,TU,WE,TH,FR", "Daily": "FREQ=DAILY",
+                            "Weekly": f"FREQ=WEEKLY;BYDAY={','.join(r_days) or 'MO'}",
+                            "Monthly": f"FREQ=MONTHLY;BYMONTHDAY={r_start.day}"}[r_freq]
+                    add_template(r_title, r_assignee, r_comp, r_cat, rule, r_start)
+                    st.success("Template saved; tasks appear with the next maintenance run.")
+            for tpl in get_templates():
+                tc1, tc2 = st.columns([5, 1])
+                tc1.markdown(f"**{tpl['title']}** · {team_names.get(tpl['assignee'], tpl['assignee'])} · {tpl['company']} · `{tpl['rule']}`")
+                active = tc2.toggle("Active", value=bool(tpl['active']), key=f"tpl_active_{tpl['id']}")
+                if active != bool(tpl['active']):
+                    set_template_active(tpl['id'], active)
+
+        my_tasks = get_user_tasks() if team_view else my_tasks_all
+        # One grouped query for every card's unread badge
+        unread = get_unread_counts(user['username'], [t['id'] for t in my_tasks])
         
         for t in my_tasks:
             with st.container():
@@ -1255,12 +584,11 @@ else:
                 
                 with c_card:
                     timer_active = t['timer_start'] is not None
-                    border_color = "#3D61FF" if timer_active else ("#17D29F" if t['status']=='Done' else "rgba(255,255,255,0.08)")
-                    rating_html = f"<span style='color:#fbbf24; margin-left:10px;'>{'★'*t['rating']}</span>" if t['rating'] else ""
+                    card_state = " is-running" if timer_active else (" is-done" if t['status']=='Done' else "")
+                    rating_html = f"<span class='stars'>{'★'*t['rating']}</span>" if t['rating'] else ""
                     
-                    today_str = str(datetime.date.today())
-                    is_overdue = bool(t.get('planned_date')) and t['planned_date'] < today_str and t['status'] != 'Done'
-                    overdue_html = '<div class="titan-chip chip-overdue" style="margin-left:8px;">🚨 OVERDUE</div>' if is_overdue else ''
+                    is_overdue = bool(t['is_overdue']) and t['status'] != 'Done'
+                    overdue_html = '<div class="titan-chip chip-overdue">🚨 OVERDUE</div>' if is_overdue else ''
 
                     # --- CHIP LOGIC ---
                     status_class = "chip-todo"
@@ -1273,21 +601,21 @@ else:
                     # ------------------
                     
                     html_str = (
-                        f'<div class="titan-card" style="padding: 15px; margin-bottom: 5px; border: 1px solid {border_color};">'
-                        f'<div style="display:flex; justify-content:space-between; align-items:center;">'
-                        f'<div style="display:flex; align-items:center; gap: 8px; flex-wrap:wrap;">'
-                        f'<div style="font-size:16px; font-weight:bold; color:white;">{t["title"]} {rating_html}</div>'
+                        f'<div class="titan-card task-card{card_state}">'
+                        f'<div class="head">'
+                        f'<div class="tags">'
+                        f'<div class="title">{t["title"]} {rating_html}</div>'
                         f'<div class="titan-chip {status_class}">{t["status"]}</div>'
                         f'<div class="titan-chip {prio_class}">{t["priority"]}</div>'
                         f'{overdue_html}'
                         f'</div>'
-                        f'<div style="font-size:11px; font-weight:bold; color:#e2e8f0; background:rgba(255,255,255,0.1); padding:4px 8px; border-radius:6px; white-space:nowrap; margin-left:10px;">{t["company"]}</div>'
+                        f'<div class="company">{t["company"]}</div>'
                         f'</div>'
-                        f'<div style="font-size:12px; color:#cbd5e1; margin-top:8px; display:flex; gap:12px; flex-wrap:wrap;">'
-                        f'<span>👤 {t["assignee"]}</span>'
+                        f'<div class="meta">'
+                        f'<span>👤 {t["assignee_name"]}</span>'
                         f'<span>📂 {t["category"]}</span>'
                         f'<span>📅 Due: {t.get("planned_date", "N/A")}</span>'
-                        f'<span style="color:{"#17D29F" if timer_active else "white"}">⏱️ {t["act_time"]:.2f}h Logged</span>'
+                        f'<span class="logged">⏱️ {t["act_time"]:.2f}h Logged</span>'
                         f'</div>'
                         f'</div>'
                     )
@@ -1296,18 +624,18 @@ else:
                 with c_timer:
                     if t['status'] != 'Done':
                         if t['timer_start']:
-                            st.markdown(f"<div style='color:#17D29F; font-size:12px; text-align:center; padding-bottom: 5px;'>Running...</div>", unsafe_allow_html=True)
+                            st.markdown("<div class='running-label'>Running...</div>", unsafe_allow_html=True)
                             tc1, tc2 = st.columns(2)
                             if tc1.button("⏸ Pause", key=f"pause_{t['id']}", help="Pause without finishing", type="secondary", use_container_width=True):
-                                handle_task_timer(t['id'], 'pause', user['name'])
+                                run_task_timer(t['id'], 'pause', user['username'])
                                 safe_rerun()
                             if tc2.button("⏹ Stop", key=f"stop_{t['id']}", help="Stop and Mark Done", type="primary", use_container_width=True):
-                                handle_task_timer(t['id'], 'stop', user['name'])
+                                run_task_timer(t['id'], 'stop', user['username'])
                                 safe_rerun()
                         else:
-                            st.markdown(f"<div style='height:24px;'></div>", unsafe_allow_html=True)
+                            st.markdown("<div class='titan-spacer'></div>", unsafe_allow_html=True)
                             if st.button("▶ Start", key=f"start_{t['id']}", type="secondary", use_container_width=True):
-                                handle_task_timer(t['id'], 'start', user['name'])
+                                run_task_timer(t['id'], 'start', user['username'])
                                 safe_rerun()
                     else:
                         if user['is_admin'] and not t['rating']:
@@ -1315,18 +643,18 @@ else:
                                 rating = st.slider("Quality", 1, 5, 5, key=f"r_{t['id']}")
                                 feed = st.text_input("Feedback", key=f"f_{t['id']}")
                                 if st.button("Submit Rating", key=f"sr_{t['id']}"):
-                                    rate_task(t['id'], rating, feed)
+                                    rate_task(t['id'], rating, feed, actor=user['username'])
                                     st.success("Rated")
                                     safe_rerun()
                 
                 with c_edit:
-                    st.markdown(f"<div style='height:24px;'></div>", unsafe_allow_html=True)
+                    st.markdown("<div class='titan-spacer'></div>", unsafe_allow_html=True)
                     with st.popover("✏️"):
                         users = get_all_users()
-                        user_list = users['name'].tolist()
-                        try: curr_idx = user_list.index(t['assignee'])
+                        names = dict(zip(users['username'], users['name']))
+                        try: curr_idx = list(names).index(t['assignee'])
                         except: curr_idx = 0
-                        n_assignee = st.selectbox("Re-Assign", user_list, index=curr_idx, key=f"as_{t['id']}")
+                        n_assignee = st.selectbox("Re-Assign", list(names), index=curr_idx, format_func=names.get, key=f"as_{t['id']}")
                         n_stat = st.selectbox("Status", ["To Do", "In Progress", "Done"], index=["To Do", "In Progress", "Done"].index(t['status']), key=f"s_{t['id']}")
                         n_time = st.number_input("Time (Hrs)", value=t['act_time'], key=f"t_{t['id']}")
                         
@@ -1338,22 +666,14 @@ else:
                         n_date = st.date_input("Planned Date", value=curr_date, key=f"pd_{t['id']}")
                         
                         if st.button("Update", key=f"up_{t['id']}", type="primary"):
-                            update_task(t['id'], n_stat, n_assignee, n_time, n_date)
+                            update_task(t['id'], n_stat, n_assignee, n_time, n_date, actor=user['username'])
                             safe_rerun()
                 
                 with c_comment:
-                    st.markdown(f"<div style='height:24px;'></div>", unsafe_allow_html=True)
-                    with st.popover("💬"):
+                    st.markdown("<div class='titan-spacer'></div>", unsafe_allow_html=True)
+                    with st.popover(f"💬 {unread[t['id']]}" if t['id'] in unread else "💬"):
                         st.markdown("**Comments**")
-                        comments = get_comments(t['id'])
-                        for c in comments:
-                            st.markdown(f"<small><b>{c['username']}</b> ({c['timestamp']}): {c['comment']}</small>", unsafe_allow_html=True)
-                            st.divider()
-                        
-                        new_c = st.text_input("Add comment", key=f"nc_{t['id']}")
-                        if st.button("Post", key=f"pc_{t['id']}", type="secondary"):
-                            add_comment(t['id'], user['name'], new_c)
-                            safe_rerun()
+                        comment_thread(t['id'], user, unread.get(t['id'], 0), compact=True)
 
     elif page == "3PL Logistics":
         st.markdown("# 📦 Warehouse Control")
@@ -1367,16 +687,43 @@ else:
                     add_shipment(f"SH-{int(time.time())}", datetime.date.today(), user['name'], dest, sku, qty)
                     st.success("Created")
                     safe_rerun()
-        for s in get_shipments():
-            st.markdown(f"<div class='titan-card'>{s['id']} to {s['dest']} ({s['qty']} units)</div>", unsafe_allow_html=True)
+        shipment_board()
+
+        st.markdown("### 🧺 Pick List")
+        open_ids = [sh['id'] for sh in cached(('shipments',), ['shipments'], get_shipments) if sh['status'] != 'Shipped']
+        pc1, pc2 = st.columns([3, 1])
+        wave = pc1.multiselect("Shipments in this wave", open_ids, key="pick_wave")
+        route = pc2.selectbox("Route", PICK_ROUTES, index=PICK_ROUTES.index(PICK_ROUTE), key="pick_route")
+        if wave:
+            plist = build_pick_list(wave, route)
+            st.caption(f"{len(plist['picks'])} picks for {len(plist['shipments'])} shipments · walk ≈ {plist['distance']:.0f} m")
+            if plist['missing']:
+                st.warning(f"No bin for: {', '.join(plist['missing'])}")
+            picks = pd.DataFrame([{'#': p['seq'], 'Bin': p['location'], 'SKU': p['sku'], 'Item': p['name'], 'Qty': p['qty'],
+                                   'Stock': p['stock'], 'Short': p['short'],
+                                   'Orders': ", ".join(f"{sid} ×{n}" for sid, n in p['orders'].items())} for p in plist['picks']])
+            st.dataframe(picks, use_container_width=True, hide_index=True)
+            st.download_button("⬇ Download pick list", picks.to_csv(index=False), file_name="pick-list.csv", mime="text/csv")
 
     elif page == "Team & Reports":
         st.markdown("# 👥 Team & Reports")
-        st.dataframe(get_all_users(), use_container_width=True)
+        st.dataframe(get_users_frame(replica=True), use_container_width=True, hide_index=True)
+
+        st.markdown("### 📈 Load Forecast")
+        st.caption(f"Expected hours of open work per day (capacity {PLAN_DAILY_HOURS:g} h); overdue and undated tasks count on today.")
+        forecast = get_load_forecast()
+        forecast.columns = [d.strftime("%a %d") for d in forecast.columns]
+        st.dataframe(forecast.round(1), use_container_width=True)
+
+        st.markdown("### 🕒 Time Clock History")
+        c1, c2 = st.columns(2)
+        log_from = c1.date_input("From", datetime.date.today() - datetime.timedelta(days=30), key="logs_from")
+        log_to = c2.date_input("To", datetime.date.today(), key="logs_to")
+        st.dataframe(get_work_logs(log_from, log_to, replica=True), use_container_width=True, hide_index=True)
 
     elif page == "Inventory & SOPs":
         st.markdown("# 📚 Inventory")
-        st.dataframe(get_inventory(), use_container_width=True)
+        st.dataframe(get_inventory_frame(), use_container_width=True, hide_index=True)
 
     elif page == "Team Calendar":
         st.markdown("# 📅 Calendar")
@@ -1386,3 +733,49 @@ else:
         st.markdown("# 🤖 AI Chat")
         if p := st.chat_input("Ask Titan AI..."):
             st.write("AI Processing...")
+
+    elif page == "Diagnostics 🩺" and user['is_admin']:
+        st.markdown("# 🩺 Diagnostics")
+        runs = profiler.recent_runs()
+
+        st.markdown("### ⏱️ Recent Reruns")
+        if runs:
+            st.dataframe(pd.DataFrame([{
+                'started': datetime.datetime.fromtimestamp(r['started']).strftime("%H:%M:%S"),
+                'page': r['label'],
+                'total_ms': r['total_ms'],
+                'page_ms': sum(r['sections'].values()),
+                'sql_ms': r['sql_ms'],
+                'queries': len(r['queries']),
+                'interrupted': r['interrupted'],
+            } for r in reversed(runs)]), use_container_width=True, hide_index=True)
+        else:
+            st.caption("No reruns recorded yet.")
+
+        st.markdown("### 🐢 Slowest Queries")
+        top_n = st.slider("Top N", 5, 50, 15)
+        order = st.radio("Order by", ["total_ms", "max_ms", "mean_ms", "calls"], horizontal=True)
+        st.dataframe(pd.DataFrame(profiler.top_queries(top_n, order)), use_container_width=True, hide_index=True)
+
+        st.markdown("### 🔁 Possible N+1 Queries")
+        suspects = profiler.n_plus_one(runs)
+        if suspects:
+            st.dataframe(pd.DataFrame(suspects).drop(columns=['started']), use_container_width=True, hide_index=True)
+        else:
+            st.caption("No statement repeated often enough within a single rerun.")
+
+        st.markdown(f"### 📜 Slow Query Log (≥ {SLOW_QUERY_MS:.0f} ms)")
+        slow = profiler.slow_queries()
+        if slow:
+            st.dataframe(pd.DataFrame([{'at': datetime.datetime.fromtimestamp(q['at']).strftime("%Y-%m-%d %H:%M:%S"), 'ms': q['ms'], 'sql': q['sql']}
+                                       for q in reversed(slow)]), use_container_width=True, hide_index=True)
+        else:
+            st.caption("No slow queries logged.")
+
+        if st.button("Reset Statistics", type="secondary"):
+            profiler.reset()
+            safe_rerun()
+
+    profiler.end_section(f"page:{page}")
+
+profiler.end_run()